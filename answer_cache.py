@@ -0,0 +1,121 @@
+import os
+import threading
+from time import time
+from collections import OrderedDict
+
+import numpy as np
+
+from embeddings import embed, similarities, tokenize
+from graph_version import read_graph_version
+
+# Cache of complete answers in front of the question pipeline. A question is looked up by its normalized
+# text first and then among near-duplicates, questions whose key terms embed at least `threshold` similar.
+# Only the key terms are compared, so "can you tell me who knows Azure" matches "who knows Azure".
+# A near-duplicate also has to ask about the same things: the graph entities the caller found in the
+# question (cypher_cache.mask_entities) and the numbers in it have to be the same, in the same order. A
+# long question that differs in one name or number embeds just as similar, "who knows AWS" doesn't get
+# the answer of "who knows Azure" and "projects for AlphaCorp 2" not the one of "projects for AlphaCorp".
+# Entries expire after `ttl` seconds, the least recently used ones are dropped beyond `max_entries`, and
+# everything is dropped when database_gen.py changes the graph.
+
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "256"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.9"))
+
+# Words that don't change what is being asked about
+STOPWORDS = {
+    "a", "about", "all", "an", "and", "any", "anyone", "are", "can", "could", "did", "do", "does", "everyone",
+    "for", "give", "has", "have", "i", "in", "is", "list", "me", "my", "of", "on", "our", "people", "person",
+    "please", "show", "someone", "tell", "the", "there", "to", "us", "what", "which", "who", "whom", "with", "you",
+}
+
+
+def normalize(question):
+    return " ".join(tokenize(question))
+
+
+# Crude suffix stripping so "knows", "knowing" and "know" or "worked" and "works" end up the same
+def stem(token):
+    for suffix in ("ing", "ed", "s"):
+        if len(token) > len(suffix) + 2 and token.endswith(suffix):
+            return token[:-len(suffix)]
+    return token
+
+
+# The content words of a question, in a fixed order
+def key_terms(question):
+    return " ".join(sorted({stem(token) for token in tokenize(question) if token not in STOPWORDS}))
+
+
+# What a near-duplicate has to have in common with the question: its entities, as the {"label", "id"} slots
+# of mask_entities, and its numbers
+def subject(question, entities):
+    return (tuple((entity["label"], str(entity["id"])) for entity in entities),
+            tuple(token for token in tokenize(question) if token.isdigit()))
+
+
+class AnswerCache:
+    def __init__(self, max_entries=ANSWER_CACHE_SIZE, ttl=ANSWER_CACHE_TTL, threshold=ANSWER_CACHE_THRESHOLD):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.version = read_graph_version()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    # Caller holds the lock
+    def check_version(self):
+        version = read_graph_version()
+        if version != self.version:
+            self.entries.clear()
+            self.version = version
+
+    # entities are the graph entities named in the question. count=False looks without touching the
+    # statistics or the recency, e.g. to check whether a question can skip the queue
+    def get(self, question, entities=(), count=True):
+        key = normalize(question)
+        with self.lock:
+            self.check_version()
+            now = time()
+            for stale in [k for k, entry in self.entries.items() if now - entry["created"] > self.ttl]:
+                del self.entries[stale]
+
+            asked = subject(question, entities)
+            keys = [k for k, entry in self.entries.items() if entry["subject"] == asked]
+            if key not in self.entries and keys:
+                scores = similarities(embed(key_terms(question)), np.stack([self.entries[k]["vector"] for k in keys]))
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    key = keys[best]
+                    self.semantic_hits += count
+
+            if key not in self.entries:
+                self.misses += count
+                return None
+            if count:
+                self.hits += 1
+                self.entries.move_to_end(key)
+            return self.entries[key]["value"]
+
+    def put(self, question, value, entities=()):
+        key = normalize(question)
+        entry = {"vector": embed(key_terms(question)), "subject": subject(question, entities), "value": value,
+                 "created": time()}
+        with self.lock:
+            self.check_version()
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            return {"entries": len(self.entries), "hits": self.hits, "semantic_hits": self.semantic_hits,
+                    "misses": self.misses}
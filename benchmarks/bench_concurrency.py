@@ -0,0 +1,127 @@
+import os
+import sys
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+import contextlib
+from timeit import default_timer as timer
+
+# Many users asking at once, answered either directly (every session calls the LLM itself, as main.py used
+# to) or through the shared question scheduler of scheduler.py. The stub LLM stands in for one Ollama
+# server that works on --parallel requests at a time, and the graph is the in-process one, e.g.
+#   python benchmarks/bench_concurrency.py --users 20 --questions 5 --latency 0.5 --parallel 1
+# Users ask from a pool of --distinct questions, so some of them ask the same thing at the same time.
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--users", type=int, default=20)
+parser.add_argument("--questions", type=int, default=5, help="questions per user, asked one after the other")
+parser.add_argument("--distinct", type=int, default=40, help="size of the question pool")
+parser.add_argument("--latency", type=float, default=0.5, help="simulated seconds per LLM call")
+parser.add_argument("--token-latency", type=float, default=0.005, help="simulated seconds per streamed token")
+parser.add_argument("--parallel", type=int, default=1, help="requests the simulated Ollama server serves at once")
+parser.add_argument("--mode", choices=["direct", "scheduled", "both"], default="both")
+parser.add_argument("--seed", type=int, default=0)
+args = parser.parse_args()
+
+work_dir = tempfile.mkdtemp(prefix="bench_concurrency_")
+os.environ.update({
+    "LLM_STUB": "1",
+    "GRAPH_BACKEND": "memory",
+    "STUB_LLM_LATENCY": str(args.latency),
+    "STUB_LLM_TOKEN_LATENCY": str(args.token_latency),
+    "STUB_LLM_PARALLEL": str(args.parallel),
+    "SCHEDULER_WORKERS": str(args.parallel),
+    "EXTRACTION_CACHE": "0",
+    "DATA_DIR": os.path.join(work_dir, "data"),
+    "TRACE_PATH": "",
+})
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo_dir)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# The pipeline writes its caches, manifest and extraction log into the current directory
+os.chdir(work_dir)
+
+from synthetic_corpus import generate  # noqa: E402
+import database_gen  # noqa: E402
+import qa_pipeline  # noqa: E402
+from memory_graph import GRAPH  # noqa: E402
+from scheduler import get_scheduler, QueueFull  # noqa: E402
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))] if values else 0.0
+
+
+def direct(question):
+    return qa_pipeline.answer_question(question)
+
+
+def scheduled(question, session):
+    scheduler = get_scheduler()
+    job = scheduler.submit(question, session=session)
+    for _ in scheduler.follow(job):
+        pass
+    return job.result
+
+
+def run(mode, pool):
+    rng = random.Random(args.seed)
+    plans = [[rng.choice(pool) for _ in range(args.questions)] for _ in range(args.users)]
+    latencies = []
+    first_tokens = []
+    rejected = []
+    lock = threading.Lock()
+
+    def user(i):
+        for question in plans[i]:
+            start = timer()
+            try:
+                response = direct(question) if mode == "direct" else scheduled(question, session=i)
+            except QueueFull:
+                with lock:
+                    rejected.append(question)
+                continue
+            with lock:
+                latencies.append(timer() - start)
+                if response.get("time_to_first_token") is not None:
+                    first_tokens.append(response["time_to_first_token"])
+
+    qa_pipeline.get_answer_cache().clear()
+    start = timer()
+    threads = [threading.Thread(target=user, args=(i,)) for i in range(args.users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = timer() - start
+    print(f"{mode:<10} {len(latencies):>5} {len(rejected):>8} {elapsed:>7.1f}s {len(latencies) / elapsed:>6.2f}/s "
+          f"{percentile(latencies, 0.5):>7.2f}s {percentile(latencies, 0.95):>7.2f}s {percentile(first_tokens, 0.95):>8.2f}s")
+
+
+try:
+    generate(os.environ["DATA_DIR"], people=500, messages=1000, briefs=20, seed=args.seed)
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        database_gen.ingestion_pipeline(database_gen.folders)
+        qa_pipeline.get_resources()
+
+    rng = random.Random(args.seed)
+    names = {label: sorted(props["name"] for props in nodes.values() if "name" in props) for label, nodes in GRAPH.nodes.items()}
+    shapes = [("Person", "What skills does {} have?"), ("Technology", "Who knows {}?"), ("Project", "Who worked on {}?")]
+    pool = []
+    while len(pool) < args.distinct:
+        label, shape = rng.choice(shapes)
+        pool.append(shape.format(rng.choice(names[label])))
+
+    print(f"{args.users} users x {args.questions} questions, {args.latency}s per LLM call, "
+          f"server serves {args.parallel} at a time")
+    print(f"{'mode':<10} {'done':>5} {'rejected':>8} {'wall':>8} {'rate':>8} {'p50':>8} {'p95':>8} {'p95 TTFT':>9}")
+    for mode in (["direct", "scheduled"] if args.mode == "both" else [args.mode]):
+        run(mode, pool)
+    print(f"scheduler: {get_scheduler().stats()}")
+finally:
+    os.chdir(repo_dir)
+    shutil.rmtree(work_dir)
@@ -0,0 +1,145 @@
+import os
+import re
+import sys
+import json
+import random
+import shutil
+import argparse
+import tempfile
+import contextlib
+from timeit import default_timer as timer
+
+# Size, latency and accuracy of the Cypher generation prompt with the whole schema and every example
+# (PROMPT_PRUNING=0) and with the pruned schema and the retrieved examples of prompt_context.py, over the
+# question shapes of cypher_questions.jsonl, e.g.
+#   python benchmarks/bench_cypher_prompt.py --real
+# Entities are filled into the shapes from the graph. A question is answered correctly when the generated
+# query returns the same values as the reference query; schema recall is the share of questions whose
+# prompt schema has every label and relationship type the reference query uses.
+# With --real the Ollama model and the Neo4j graph from neo4j.env are used (run database_gen.py first);
+# otherwise the stub LLM, whose prefill time grows with the prompt, and a synthetic in-process graph. The
+# stub's Cypher doesn't depend on the prompt, so offline the accuracy only checks the pipeline.
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--questions", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "cypher_questions.jsonl"))
+parser.add_argument("--samples", type=int, default=3, help="questions per shape")
+parser.add_argument("--real", action="store_true", help="use Ollama and the Neo4j database from neo4j.env")
+parser.add_argument("--prefill", type=float, default=0.0005, help="simulated seconds per prompt token without --real")
+parser.add_argument("--seed", type=int, default=0)
+args = parser.parse_args()
+
+work_dir = tempfile.mkdtemp(prefix="bench_cypher_prompt_")
+if not args.real:
+    os.environ.update({
+        "LLM_STUB": "1",
+        "STUB_LLM_LATENCY": "0.05",
+        "STUB_LLM_PREFILL_LATENCY": str(args.prefill),
+        "GRAPH_BACKEND": "memory",
+        "EXTRACTION_CACHE": "0",
+        "DATA_DIR": os.path.join(work_dir, "data"),
+        "TRACE_PATH": "",
+    })
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo_dir)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# The pipeline writes its caches, manifest and extraction log into the current directory; neo4j.env is
+# read relative to it
+os.chdir(repo_dir if args.real else work_dir)
+import database_gen  # noqa: E402
+import qa_pipeline  # noqa: E402
+from synthetic_corpus import generate, TOPICS  # noqa: E402
+from stream_reader import estimate_tokens  # noqa: E402
+from cypher_cache import mask_entities  # noqa: E402
+from prompt_context import cypher_prompt_args  # noqa: E402
+from langchain_community.chains.graph_qa.cypher import extract_cypher  # noqa: E402
+
+PLACEHOLDER = re.compile(r"\{(Person|Technology|Project|Client|topic)\}")
+RELATIONSHIP = re.compile(r"\[:(\w+)\]")
+LABEL = re.compile(r":(\w+)\)")
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))] if values else 0.0
+
+
+# The values a query returns, regardless of column names and order
+def values(graph, cypher):
+    try:
+        return {tuple(str(value) for value in row.values()) for row in graph.query(cypher)}
+    except Exception:
+        return None
+
+
+# Shapes with their placeholders filled in, as (question, reference cypher)
+def instances(shapes, names, rng):
+    for shape in shapes:
+        needed = set(PLACEHOLDER.findall(shape["question"]))
+        if any(not names.get(label) for label in needed):
+            continue
+        for _ in range(args.samples if needed else 1):
+            question, cypher = shape["question"], shape["cypher"]
+            for label in needed:
+                name = rng.choice(names[label])
+                question = question.replace("{" + label + "}", name)
+                cypher = cypher.replace("{" + label.lower() + "}", name.lower().replace("'", "\\'"))
+            yield question, cypher
+
+
+def run(mode, items, resources):
+    store = qa_pipeline.get_example_store()
+    graph = resources.graph
+    tokens, latencies, correct, covered = [], [], 0, 0
+    for question, reference, expected in items:
+        masked, slots = mask_entities(question, resources.vocabulary, resources.entity_pattern)
+        prompt_args = cypher_prompt_args(question, masked, slots, graph.get_structured_schema,
+                                         resources.chain.graph_schema, store, pruning=mode == "slim")
+        prompt = qa_pipeline.cypher_prompt.format(question=question, **prompt_args)
+        start = timer()
+        generated = extract_cypher(qa_pipeline.llm.invoke(prompt))
+        latencies.append(timer() - start)
+        tokens.append(estimate_tokens(prompt))
+        correct += values(graph, generated) == expected
+        covered += all(f"{label} {{" in prompt_args["schema"] for label in LABEL.findall(reference)) and \
+            all(f"[:{rs_type}]" in prompt_args["schema"] for rs_type in RELATIONSHIP.findall(reference))
+    total = len(items)
+    print(f"{mode:<6} {sum(tokens) / total:>9.0f} {percentile(tokens, 0.95):>9.0f} {sum(latencies) / total * 1000:>8.0f}ms "
+          f"{percentile(latencies, 0.95) * 1000:>8.0f}ms {correct / total:>9.1%} {covered / total:>13.1%}")
+    return sum(tokens), sum(latencies), correct
+
+
+try:
+    if not args.real:
+        generate(os.environ["DATA_DIR"], people=500, messages=1000, briefs=20, seed=args.seed)
+        with contextlib.redirect_stdout(open(os.devnull, "w")):
+            database_gen.ingestion_pipeline(database_gen.folders)
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        resources = qa_pipeline.get_resources()
+
+    names = {}
+    for entity in resources.vocabulary.values():
+        names.setdefault(entity["label"], []).append(entity["name"])
+    for label in names:
+        names[label].sort()
+    names["topic"] = [topic.split()[-1] for topic in TOPICS]
+    with open(args.questions) as f:
+        shapes = [json.loads(line) for line in f if line.strip()]
+    rng = random.Random(args.seed)
+    items = []
+    for question, reference in instances(shapes, names, rng):
+        expected = values(resources.graph, reference)
+        # Only questions the reference query can answer tell anything about the generated one
+        if expected:
+            items.append((question, reference, expected))
+
+    print(f"{len(items)} questions from {len(shapes)} shapes, "
+          f"{'Ollama and Neo4j' if args.real else f'stub LLM at {args.prefill * 1000:.1f}ms per prompt token'}")
+    print(f"{'prompt':<6} {'tokens':>9} {'p95':>9} {'latency':>10} {'p95':>10} {'accuracy':>9} {'schema recall':>13}")
+    full_tokens, full_seconds, full_correct = run("full", items, resources)
+    slim_tokens, slim_seconds, slim_correct = run("slim", items, resources)
+    print(f"prompt tokens -{1 - slim_tokens / full_tokens:.0%}, generation time -{1 - slim_seconds / full_seconds:.0%}, "
+          f"{slim_correct - full_correct:+d} correct answers")
+finally:
+    os.chdir(repo_dir)
+    shutil.rmtree(work_dir)
@@ -0,0 +1,125 @@
+import os
+import sys
+import random
+import shutil
+import argparse
+import tempfile
+import contextlib
+from timeit import default_timer as timer
+
+# "Who knows X" answered from the expertise index against the traversals the LLM would have to write for
+# it, on a synthetic corpus in the in-process graph, e.g.
+#   python benchmarks/bench_expertise.py --people 20000 --messages 100000
+# Also checks that the index database_gen.py maintains incrementally, after part of the corpus changed,
+# ranks the same as one built from scratch.
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--people", type=int, default=20000)
+parser.add_argument("--messages", type=int, default=50000)
+parser.add_argument("--briefs", type=int, default=100)
+parser.add_argument("--lookups", type=int, default=200)
+parser.add_argument("--latency", type=float, default=0.5, help="simulated seconds per LLM call")
+parser.add_argument("--seed", type=int, default=0)
+args = parser.parse_args()
+
+work_dir = tempfile.mkdtemp(prefix="bench_expertise_")
+os.environ.update({
+    "LLM_STUB": "1",
+    "STUB_LLM_LATENCY": str(args.latency),
+    "GRAPH_BACKEND": "memory",
+    "EXTRACTION_CACHE": "0",
+    "DATA_DIR": os.path.join(work_dir, "data"),
+    "TRACE_PATH": "",
+})
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo_dir)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# The pipeline writes its caches, manifest and extraction log into the current directory
+os.chdir(work_dir)
+import database_gen  # noqa: E402
+import qa_pipeline  # noqa: E402
+from expertise_index import ExpertiseIndex  # noqa: E402
+from synthetic_corpus import generate, SKILLS  # noqa: E402
+
+# What the LLM would have to write to rank people for a technology: skills, project exposure and mentions
+TRAVERSALS = [
+    "CALL db.index.fulltext.queryNodes('entity_names', $search) YIELD node AS t WHERE t:Technology AND toLower(t.name) CONTAINS $search "
+    "MATCH (p:Person)-[:HAS_SKILLS]->(t) RETURN p.name",
+    "CALL db.index.fulltext.queryNodes('entity_names', $search) YIELD node AS t WHERE t:Technology AND toLower(t.name) CONTAINS $search "
+    "MATCH (pr:Project)-[:USES_TECH]->(t) MATCH (pr)-[:HAS_PEOPLE]->(p:Person) RETURN p.name",
+    "CALL db.index.fulltext.queryNodes('slack_text', $search) YIELD node AS m WHERE toLower(m.text) CONTAINS $search "
+    "MATCH (p:Person)-[:SENT]->(m) RETURN p.name",
+]
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))] if values else 0.0
+
+
+def ingest(incremental):
+    start = timer()
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        database_gen.ingestion_pipeline(database_gen.folders, incremental=incremental)
+    return timer() - start
+
+
+try:
+    generate(os.environ["DATA_DIR"], args.people, args.messages, args.briefs, seed=args.seed)
+    seconds = ingest(False)
+    print(f"ingested in {seconds:.1f}s, index {database_gen.expertise.stats()}")
+
+    # The people profiles and project briefs are rewritten with other skills and stacks, and half of the
+    # message files are rewritten with other texts under the same message ids
+    changed_dir = os.path.join(work_dir, "changed")
+    generate(changed_dir, args.people, args.messages // 2, args.briefs, seed=args.seed + 1)
+    shutil.rmtree(os.environ["DATA_DIR"])
+    shutil.copytree(changed_dir, os.environ["DATA_DIR"])
+    seconds = ingest(True)
+    print(f"incremental run in {seconds:.1f}s")
+    incremental = database_gen.expertise
+    database_gen.expertise = ExpertiseIndex(path=None)
+    # A full run writes everything again, which rebuilds a fresh index from the current files
+    ingest(False)
+    rebuilt = database_gen.expertise
+    same = incremental.ranked == rebuilt.ranked
+    print(f"incremental index ranks the same as a rebuilt one: {same}")
+    database_gen.expertise = incremental
+    incremental.save()
+
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        resources = qa_pipeline.get_resources()
+    rng = random.Random(args.seed)
+    technologies = [rng.choice(SKILLS) for _ in range(args.lookups)]
+
+    index_times = []
+    traversal_times = []
+    for technology in technologies:
+        start = timer()
+        assert qa_pipeline.expertise_lookup(f"Who knows {technology}?") is not None, technology
+        index_times.append(timer() - start)
+        start = timer()
+        for query in TRAVERSALS:
+            resources.graph.query(query, {"search": technology.lower()})
+        traversal_times.append(timer() - start)
+    print(f"{'lookup':<24} {'p50':>9} {'p95':>9}")
+    print(f"{'expertise index':<24} {percentile(index_times, 0.5) * 1000:>7.2f}ms {percentile(index_times, 0.95) * 1000:>7.2f}ms")
+    print(f"{'graph traversals':<24} {percentile(traversal_times, 0.5) * 1000:>7.2f}ms {percentile(traversal_times, 0.95) * 1000:>7.2f}ms")
+
+    # End to end, with the simulated LLM writing Cypher and phrasing the answer when the index isn't used
+    for enabled in (False, True):
+        qa_pipeline.EXPERTISE_INDEX = enabled
+        qa_pipeline.get_answer_cache().clear()
+        times = []
+        for technology in technologies[:10]:
+            start = timer()
+            with contextlib.redirect_stdout(open(os.devnull, "w")):
+                qa_pipeline.answer_question(f"Who knows {technology}?")
+            times.append(timer() - start)
+            qa_pipeline.get_answer_cache().clear()
+        print(f"{'question, ' + ('index' if enabled else 'LLM Cypher'):<24} {percentile(times, 0.5) * 1000:>7.0f}ms "
+              f"{percentile(times, 0.95) * 1000:>7.0f}ms")
+finally:
+    os.chdir(repo_dir)
+    shutil.rmtree(work_dir)
@@ -0,0 +1,63 @@
+import os
+import sys
+import glob
+import shutil
+import argparse
+import tempfile
+from timeit import default_timer as timer
+
+# Offline throughput benchmark for the extraction stage of database_gen.py.
+# Runs against the stub chat endpoint unless --real is given, e.g.
+#   python benchmarks/bench_extraction.py --copies 20 --workers 1 2 4 8 --latency 0.5
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--copies", type=int, default=10, help="how many times the data/ folder is replicated")
+parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+parser.add_argument("--latency", type=float, default=0.5, help="simulated seconds per stub LLM call")
+parser.add_argument("--real", action="store_true", help="use the local Ollama server instead of the stub")
+args = parser.parse_args()
+
+# Every run has to reach the (stub) model, not the extraction cache
+os.environ["EXTRACTION_CACHE"] = "0"
+os.environ["FAST_PATH"] = "0"
+if not args.real:
+    os.environ["LLM_STUB"] = "1"
+    os.environ["STUB_LLM_LATENCY"] = str(args.latency)
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo_dir)
+import database_gen  # noqa: E402
+
+# Replicate the sample corpus so there is enough work to keep the pool busy
+work_dir = tempfile.mkdtemp(prefix="bench_extraction_")
+for folder in database_gen.folders:
+    os.makedirs(os.path.join(work_dir, "data", folder))
+    for path in glob.glob(os.path.join(repo_dir, "data", folder, "*")):
+        name, ext = os.path.splitext(os.path.basename(path))
+        for i in range(args.copies):
+            # Append a marker so every copy has different content and a different canned reply
+            with open(path) as src, open(os.path.join(work_dir, "data", folder, f"{name}_{i}{ext}"), "w") as dst:
+                dst.write(src.read() + f"\n\n{i}")
+
+# The extraction cache and log go into the current directory
+os.chdir(work_dir)
+try:
+    print(f"{'workers':>8} {'files':>6} {'seconds':>8} {'files/s':>8}")
+    baseline = None
+    for workers in args.workers:
+        files = 0
+        start = timer()
+        results = []
+        for folder, template in database_gen.folders.items():
+            results.append(list(database_gen.extract_entities_relationships(
+                folder, template, workers=workers, data_dir=os.path.join(work_dir, "data"))))
+            files += len(results[-1])
+        elapsed = timer() - start
+        # Output must not depend on the amount of parallelism
+        if baseline is None:
+            baseline = results
+        assert results == baseline, f"results with {workers} workers differ from the first run"
+        print(f"{workers:>8} {files:>6} {elapsed:>8.2f} {files / elapsed:>8.2f}")
+finally:
+    os.chdir(repo_dir)
+    shutil.rmtree(work_dir)
@@ -0,0 +1,82 @@
+import os
+import sys
+import argparse
+import tempfile
+from timeit import default_timer as timer
+
+# Compares the rule-based parsers in structured_parsers.py with LLM extraction on the structured sources:
+# throughput of both paths, and how much of the LLM's output the parser reproduces. Entities are compared
+# on (label, name) and relationships on the names of their endpoints, since the LLM doesn't always pick
+# the same ids. Uses the stub model unless --real is given, e.g.
+#   python benchmarks/bench_fast_path.py --real
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--repeat", type=int, default=100, help="parser runs per file, for a stable timing")
+parser.add_argument("--latency", type=float, default=0.5, help="simulated seconds per stub LLM call")
+parser.add_argument("--real", action="store_true", help="use the local Ollama server instead of the stub")
+args = parser.parse_args()
+
+os.environ["EXTRACTION_CACHE"] = "0"
+if not args.real:
+    os.environ["LLM_STUB"] = "1"
+    os.environ["STUB_LLM_LATENCY"] = str(args.latency)
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo_dir)
+# The extraction cache and log go into the current directory
+os.chdir(tempfile.mkdtemp(prefix="bench_fast_path_"))
+import database_gen  # noqa: E402
+from structured_parsers import STRUCTURED_PARSERS  # noqa: E402
+
+
+# Id-independent view of an extraction
+def comparable(json_obj):
+    names = {}
+    entities = set()
+    for entity in json_obj.get("entities", []):
+        name = str(entity.get("name") or entity.get("text") or entity.get("id")).strip().lower()
+        names[database_gen.clean_id(str(entity.get("id")))] = name
+        entities.add((entity.get("label"), name))
+    relationships = set()
+    for rs in json_obj.get("relationships", []):
+        parts = rs.split("|")
+        if len(parts) == 3:
+            src, rs_type, tgt = (database_gen.clean_id(part) for part in parts)
+            relationships.add((names.get(src, src), rs_type, names.get(tgt, tgt)))
+    return entities, relationships
+
+
+def overlap(parsed, reference):
+    if not parsed and not reference:
+        return 1.0, 1.0
+    common = len(parsed & reference)
+    precision = common / len(parsed) if parsed else 0.0
+    recall = common / len(reference) if reference else 0.0
+    return precision, recall
+
+
+print(f"{'file':<40} {'parser/s':>10} {'llm/s':>8} {'speedup':>9} {'ent P/R':>11} {'rel P/R':>11}")
+for folder, parse in STRUCTURED_PARSERS.items():
+    template = database_gen.folders[folder]
+    for file in database_gen.list_files(folder, os.path.join(repo_dir, "data")):
+        start = timer()
+        for _ in range(args.repeat):
+            parsed = parse(file)
+        parser_rate = args.repeat / (timer() - start)
+        if parsed is None:
+            print(f"{os.path.basename(file):<40} layout not recognised, would fall back to the LLM")
+            continue
+
+        start = timer()
+        llm_objs = list(database_gen.extract_entities_relationships(folder, template, files=[file], fast_path=False))
+        llm_rate = 1 / (timer() - start)
+        if not llm_objs:
+            print(f"{os.path.basename(file):<40} LLM extraction failed")
+            continue
+
+        parsed_entities, parsed_rels = comparable(parsed)
+        llm_entities, llm_rels = comparable(llm_objs[0])
+        ent_p, ent_r = overlap(parsed_entities, llm_entities)
+        rel_p, rel_r = overlap(parsed_rels, llm_rels)
+        print(f"{os.path.basename(file):<40} {parser_rate:>10.0f} {llm_rate:>8.3f} {parser_rate / llm_rate:>8.0f}x "
+              f"{ent_p:>5.2f}/{ent_r:<5.2f} {rel_p:>5.2f}/{rel_r:<5.2f}")
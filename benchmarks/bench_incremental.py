@@ -0,0 +1,111 @@
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import contextlib
+from timeit import default_timer as timer
+
+# An incremental run of database_gen.py after files were edited, deleted and added, against building the
+# graph from scratch out of the same files, on a synthetic corpus in the in-process graph, e.g.
+#   python benchmarks/bench_incremental.py --people 20000 --messages 50000
+# The edits are the cases retraction has to get right: messages whose text changes under the same id, one
+# of them also in an export that didn't change, people profiles with other skills, a deleted export and a
+# new one. Reports the time of both runs and every node and relationship on which the two graphs differ.
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--people", type=int, default=5000)
+parser.add_argument("--messages", type=int, default=20000)
+parser.add_argument("--briefs", type=int, default=50)
+parser.add_argument("--seed", type=int, default=0)
+args = parser.parse_args()
+
+work_dir = tempfile.mkdtemp(prefix="bench_incremental_")
+data_dir = os.path.join(work_dir, "data")
+os.environ.update({
+    "LLM_STUB": "1",
+    "STUB_LLM_LATENCY": "0",
+    "GRAPH_BACKEND": "memory",
+    "EXTRACTION_CACHE": "0",
+    "DATA_DIR": data_dir,
+    "TRACE_PATH": "",
+})
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo_dir)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# The pipeline writes its caches, manifest and extraction log into the current directory
+os.chdir(work_dir)
+import database_gen  # noqa: E402
+from memory_graph import GRAPH, MemoryGraph, MemoryDriver  # noqa: E402
+from entity_resolution import EntityResolver  # noqa: E402
+from synthetic_corpus import generate  # noqa: E402
+
+
+def ingest(incremental):
+    start = timer()
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        database_gen.ingestion_pipeline(database_gen.folders, incremental=incremental)
+    return timer() - start
+
+
+def contents(graph):
+    nodes = {(label, id): props for label, by_id in graph.nodes.items() for id, props in by_id.items()}
+    edges = {(rs_type,) + edge for rs_type, by_type in graph.edges.items() for edge in by_type}
+    return nodes, edges
+
+
+def read_messages(name):
+    with open(os.path.join(data_dir, "slack_messages", name)) as f:
+        return json.load(f)
+
+
+def write_messages(name, messages):
+    with open(os.path.join(data_dir, "slack_messages", name), "w") as f:
+        json.dump(messages, f, indent=4)
+
+
+try:
+    generate(data_dir, args.people, args.messages, args.briefs, seed=args.seed)
+    first, second = read_messages("slack_messages1.json"), read_messages("slack_messages2.json")
+    # The same message in two exports
+    write_messages("slack_messages2.json", second + [dict(first[0])])
+    seconds = ingest(False)
+    print(f"full run:        {seconds:.2f}s")
+
+    for message in first[:10]:
+        message["text"] = "Edited: " + message["text"]
+    write_messages("slack_messages1.json", first)
+    changed_dir = os.path.join(work_dir, "changed")
+    generate(changed_dir, args.people, 0, 0, seed=args.seed + 1)
+    shutil.copy(os.path.join(changed_dir, "people_profiles", "people-profiles1.md"),
+                os.path.join(data_dir, "people_profiles", "people-profiles1.md"))
+    exports = sorted(os.listdir(os.path.join(data_dir, "slack_messages")))
+    os.remove(os.path.join(data_dir, "slack_messages", exports[-1]))
+    write_messages("slack_messages_new.json", [{**first[1], "id": "msgnew1", "text": "A new message about Azure"}])
+    seconds = ingest(True)
+    print(f"incremental run: {seconds:.2f}s")
+    incremental = contents(GRAPH)
+
+    # From scratch, with nothing the earlier runs left behind
+    rebuilt_graph = MemoryGraph()
+    database_gen.gds = MemoryDriver(rebuilt_graph)
+    database_gen.resolver = EntityResolver(path=None)
+    database_gen.expertise = None
+    seconds = ingest(False)
+    print(f"rebuild:         {seconds:.2f}s")
+    rebuilt = contents(rebuilt_graph)
+
+    nodes = [key for key in set(incremental[0]) | set(rebuilt[0]) if incremental[0].get(key) != rebuilt[0].get(key)]
+    edges = incremental[1] ^ rebuilt[1]
+    print(f"graph:           {len(rebuilt[0])} nodes, {len(rebuilt[1])} relationships")
+    print(f"differences:     {len(nodes)} nodes, {len(edges)} relationships")
+    for key in sorted(nodes)[:5]:
+        print(f"  {key}: incremental {incremental[0].get(key)}, rebuilt {rebuilt[0].get(key)}")
+    for edge in sorted(edges)[:5]:
+        print(f"  {edge} only {'incremental' if edge in incremental[1] else 'rebuilt'}")
+    assert not nodes and not edges, "the incremental run differs from a rebuild"
+finally:
+    os.chdir(repo_dir)
+    shutil.rmtree(work_dir)
@@ -0,0 +1,111 @@
+import os
+import re
+import sys
+import random
+import shutil
+import argparse
+import tempfile
+import contextlib
+from timeit import default_timer as timer
+
+# Latency of the entity lookups the app's Cypher does, written the old way (toLower(...) CONTAINS over every
+# node of a label) and through the full-text indexes database_gen.py creates, e.g.
+#   python benchmarks/bench_lookup.py --neo4j
+# With --neo4j the graph in neo4j.env is used as it is (run database_gen.py first); otherwise a synthetic
+# corpus is ingested into the in-process graph of memory_graph.py.
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--neo4j", action="store_true", help="query the Neo4j database from neo4j.env")
+parser.add_argument("--people", type=int, default=20000, help="size of the synthetic corpus without --neo4j")
+parser.add_argument("--messages", type=int, default=50000)
+parser.add_argument("--briefs", type=int, default=200)
+parser.add_argument("--lookups", type=int, default=200, help="lookups per kind")
+parser.add_argument("--seed", type=int, default=0)
+args = parser.parse_args()
+
+work_dir = tempfile.mkdtemp(prefix="bench_lookup_")
+if not args.neo4j:
+    os.environ.update({
+        "LLM_STUB": "1",
+        "STUB_LLM_LATENCY": "0",
+        "GRAPH_BACKEND": "memory",
+        "EXTRACTION_CACHE": "0",
+        "DATA_DIR": os.path.join(work_dir, "data"),
+        "TRACE_PATH": "",
+    })
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo_dir)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+if args.neo4j:
+    # neo4j.env is read relative to the current directory
+    os.chdir(repo_dir)
+import database_gen  # noqa: E402
+from synthetic_corpus import generate, TOPICS  # noqa: E402
+
+LUCENE_SPECIAL = re.compile(r'([+\-!(){}\[\]^"~*?:\\/]|&&|\|\|)')
+
+# (kind, label, property, full-text index)
+KINDS = [
+    ("person", "Person", "name", "entity_names"),
+    ("technology", "Technology", "name", "entity_names"),
+    ("project", "Project", "name", "project_summaries"),
+    ("message", "SlackMessage", "text", "slack_text"),
+]
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))] if values else 0.0
+
+
+try:
+    if not args.neo4j:
+        # The pipeline writes its caches, manifest and extraction log into the current directory
+        os.chdir(work_dir)
+        generate(os.environ["DATA_DIR"], args.people, args.messages, args.briefs, seed=args.seed)
+        with contextlib.redirect_stdout(open(os.devnull, "w")):
+            database_gen.ingestion_pipeline(database_gen.folders)
+    else:
+        database_gen.create_schema()
+
+    rng = random.Random(args.seed)
+    with database_gen.get_driver().session() as session:
+        if args.neo4j:
+            session.run("CALL db.awaitIndexes()").consume()
+        print(f"{'lookup':<12} {'rows':>7} {'scan p50':>10} {'scan p95':>10} {'index p50':>10} {'index p95':>10} {'speedup':>8}")
+        for kind, label, key, index in KINDS:
+            if kind == "message":
+                terms = [rng.choice(TOPICS).split()[-1] for _ in range(args.lookups)]
+            else:
+                names = [record["name"] for record in session.run(
+                    f"MATCH (n:{label}) RETURN n.name AS name LIMIT 10000") if record["name"]]
+                if not names:
+                    continue
+                terms = [rng.choice(names).lower() for _ in range(args.lookups)]
+
+            scan = f"MATCH (n:{label}) WHERE toLower(n.{key}) CONTAINS $term RETURN n.id AS id"
+            fulltext = (f"CALL db.index.fulltext.queryNodes($index, $search) YIELD node AS n "
+                        f"WHERE n:{label} AND toLower(n.{key}) CONTAINS $term RETURN n.id AS id")
+            scan_times = []
+            index_times = []
+            rows = 0
+            for term in terms:
+                start = timer()
+                expected = sorted(record["id"] for record in session.run(scan, term=term))
+                scan_times.append(timer() - start)
+                start = timer()
+                found = sorted(record["id"] for record in session.run(
+                    fulltext, index=index, search=LUCENE_SPECIAL.sub(r"\\\1", term), term=term))
+                index_times.append(timer() - start)
+                # The index may only make the lookup faster, not change what it finds
+                assert found == expected, f"{kind} lookup of {term!r} differs: {len(found)} vs {len(expected)} rows"
+                rows += len(found)
+
+            scan_p50, index_p50 = percentile(scan_times, 0.5), percentile(index_times, 0.5)
+            print(f"{kind:<12} {rows / len(terms):>7.1f} {scan_p50 * 1000:>8.2f}ms {percentile(scan_times, 0.95) * 1000:>8.2f}ms "
+                  f"{index_p50 * 1000:>8.2f}ms {percentile(index_times, 0.95) * 1000:>8.2f}ms "
+                  f"{scan_p50 / max(index_p50, 1e-9):>7.1f}x")
+finally:
+    os.chdir(repo_dir)
+    shutil.rmtree(work_dir)
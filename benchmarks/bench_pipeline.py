@@ -0,0 +1,142 @@
+import os
+import sys
+import json
+import random
+import shutil
+import argparse
+import resource
+import tempfile
+import contextlib
+from timeit import default_timer as timer
+
+# End-to-end offline benchmark: generates a synthetic corpus, ingests it with database_gen.py and asks the
+# question pipeline of qa_pipeline.py a mix of questions, with the stub LLM (stub_llm.py) in place of Ollama
+# and the in-process graph (memory_graph.py) in place of Neo4j. What it measures is the overhead of our own
+# code around the model and the database, e.g.
+#   python benchmarks/bench_pipeline.py --people 100000 --messages 1000000 --briefs 1000 --questions 500
+# Reports files/s, statements/s, p50/p95 question latency and the peak RSS of the process.
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--people", type=int, default=10000)
+parser.add_argument("--messages", type=int, default=10000)
+parser.add_argument("--briefs", type=int, default=100)
+parser.add_argument("--questions", type=int, default=200)
+parser.add_argument("--latency", type=float, default=0.0, help="simulated seconds per stub LLM call")
+parser.add_argument("--token-latency", type=float, default=0.0, help="simulated seconds per streamed token")
+parser.add_argument("--workers", type=int, default=4, help="extraction workers")
+parser.add_argument("--answer-cache", action="store_true", help="keep the answer cache on while asking questions")
+parser.add_argument("--seed", type=int, default=0)
+parser.add_argument("--verbose", action="store_true", help="show the output of the ingestion pipeline")
+parser.add_argument("--keep", action="store_true", help="keep the working folder with the corpus and the traces")
+args = parser.parse_args()
+
+work_dir = tempfile.mkdtemp(prefix="bench_pipeline_")
+os.environ.update({
+    "LLM_STUB": "1",
+    "GRAPH_BACKEND": "memory",
+    "STUB_LLM_LATENCY": str(args.latency),
+    "STUB_LLM_TOKEN_LATENCY": str(args.token_latency),
+    "EXTRACTION_CACHE": "0",
+    "EXTRACTION_WORKERS": str(args.workers),
+    "DATA_DIR": os.path.join(work_dir, "data"),
+    "TRACE_PATH": os.path.join(work_dir, "traces.jsonl"),
+})
+if not args.answer_cache:
+    os.environ["ANSWER_CACHE_SIZE"] = "0"
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo_dir)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# The pipeline writes its caches, manifest and extraction log into the current directory
+os.chdir(work_dir)
+
+from synthetic_corpus import generate, TOPICS  # noqa: E402
+import database_gen  # noqa: E402
+import qa_pipeline  # noqa: E402
+from memory_graph import GRAPH  # noqa: E402
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))] if values else 0.0
+
+
+try:
+    start = timer()
+    generate(os.environ["DATA_DIR"], args.people, args.messages, args.briefs, seed=args.seed)
+    files = sum(len(files) for _, _, files in os.walk(os.environ["DATA_DIR"]))
+    print(f"corpus: {files} files, {args.people} people, {args.messages} messages, {args.briefs} briefs "
+          f"({timer() - start:.1f}s to generate)")
+
+    start = timer()
+    with contextlib.redirect_stdout(sys.stdout if args.verbose else open(os.devnull, "w")):
+        database_gen.ingestion_pipeline(database_gen.folders)
+    ingest_seconds = timer() - start
+    with open(os.environ["TRACE_PATH"]) as f:
+        trace = [json.loads(line) for line in f if line.strip()][-1]
+    stages = {}
+    for span in trace["spans"]:
+        stages[span["name"]] = stages.get(span["name"], 0.0) + span["duration"]
+    write_seconds = stages.get("write_batch", 0.0)
+    ingest_rss = peak_rss_mb()
+
+    print(f"ingestion:  {ingest_seconds:.2f}s, {files / ingest_seconds:.1f} files/s")
+    print(f"writes:     {GRAPH.statements} statements, {GRAPH.rows_written} rows in {write_seconds:.2f}s, "
+          f"{GRAPH.statements / max(write_seconds, 1e-9):.0f} statements/s, "
+          f"{GRAPH.rows_written / max(write_seconds, 1e-9):.0f} rows/s")
+    print("stages:     " + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in stages.items()))
+    print(f"graph:      {sum(len(nodes) for nodes in GRAPH.nodes.values())} nodes, "
+          f"{sum(len(edges) for edges in GRAPH.edges.values())} relationships, "
+          f"{GRAPH.unsupported} unsupported statements")
+    print(f"peak RSS after ingestion: {ingest_rss:.0f} MB")
+
+    # A mix of the question shapes the stub LLM has Cypher for, about entities that are in the graph
+    rng = random.Random(args.seed)
+    names = {label: [props["name"] for props in nodes.values() if "name" in props] for label, nodes in GRAPH.nodes.items()}
+    shapes = [
+        ("Person", "What skills does {} have?"),
+        ("Technology", "Who knows {}?"),
+        ("Project", "Who worked on {}?"),
+        ("Project", "Which technologies does {} use?"),
+        (None, "Show me messages about {}"),
+        (None, "Hello, how are you?"),
+    ]
+    questions = []
+    for _ in range(args.questions):
+        label, shape = rng.choice(shapes)
+        if label and names.get(label):
+            questions.append(shape.format(rng.choice(names[label])))
+        elif label is None:
+            questions.append(shape.format(rng.choice(TOPICS)))
+
+    latencies = []
+    first_tokens = []
+    routes = {}
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        qa_pipeline.get_resources()
+    for question in questions:
+        start = timer()
+        with contextlib.redirect_stdout(sys.stdout if args.verbose else open(os.devnull, "w")):
+            response = qa_pipeline.answer_question(question)
+        latencies.append(timer() - start)
+        if response["time_to_first_token"] is not None:
+            first_tokens.append(response["time_to_first_token"])
+        route = "cached" if response["cached"] else response["route"]
+        routes[route] = routes.get(route, 0) + 1
+
+    print(f"questions:  {len(questions)}, routes {routes}")
+    print(f"latency:    p50 {percentile(latencies, 0.5) * 1000:.1f} ms, p95 {percentile(latencies, 0.95) * 1000:.1f} ms")
+    print(f"first token: p50 {percentile(first_tokens, 0.5) * 1000:.1f} ms, p95 {percentile(first_tokens, 0.95) * 1000:.1f} ms")
+    print(f"templates:  {qa_pipeline.get_template_cache().stats()}")
+    print(f"peak RSS:   {peak_rss_mb():.0f} MB")
+finally:
+    os.chdir(repo_dir)
+    if args.keep:
+        print(f"working folder kept in {work_dir}")
+    else:
+        shutil.rmtree(work_dir)
@@ -0,0 +1,97 @@
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import contextlib
+import tracemalloc
+from timeit import default_timer as timer
+
+# The extraction log of database_gen.py on a synthetic corpus in the in-process graph, e.g.
+#   python benchmarks/bench_record_log.py --people 20000 --messages 100000
+# Reports the peak Python memory of an ingestion run, without what the in-process graph itself holds, the size of the log against the indented
+# *_output.json files the pipeline used to write, and how much of an interrupted run a resumed one redoes:
+# the first run is stopped when it starts writing to the graph, after everything was extracted.
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--people", type=int, default=20000)
+parser.add_argument("--messages", type=int, default=50000)
+parser.add_argument("--briefs", type=int, default=200)
+parser.add_argument("--latency", type=float, default=0.05, help="simulated seconds per LLM call")
+parser.add_argument("--seed", type=int, default=0)
+args = parser.parse_args()
+
+work_dir = tempfile.mkdtemp(prefix="bench_record_log_")
+os.environ.update({
+    "LLM_STUB": "1",
+    "STUB_LLM_LATENCY": str(args.latency),
+    "GRAPH_BACKEND": "memory",
+    "EXTRACTION_CACHE": "0",
+    "DATA_DIR": os.path.join(work_dir, "data"),
+    "TRACE_PATH": "",
+})
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo_dir)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# The pipeline writes its caches, manifest and extraction log into the current directory
+os.chdir(work_dir)
+import database_gen  # noqa: E402
+from synthetic_corpus import generate  # noqa: E402
+
+extract_text = database_gen.extract_text
+write_batches = database_gen.write_batches
+calls = []
+
+
+def counted_extract_text(*args, **kwargs):
+    calls.append(args[0])
+    return extract_text(*args, **kwargs)
+
+
+def interrupted_write_batches(*args, **kwargs):
+    raise KeyboardInterrupt
+
+
+def ingest():
+    calls.clear()
+    tracemalloc.start()
+    start = timer()
+    try:
+        with contextlib.redirect_stdout(open(os.devnull, "w")):
+            database_gen.ingestion_pipeline(database_gen.folders)
+        completed = True
+    except KeyboardInterrupt:
+        completed = False
+    seconds = timer() - start
+    # What the graph holds would be in Neo4j
+    graph = sum(stat.size for stat in tracemalloc.take_snapshot().statistics("filename")
+                if stat.traceback[0].filename.endswith("memory_graph.py"))
+    peak = tracemalloc.get_traced_memory()[1] - graph
+    tracemalloc.stop()
+    return completed, seconds, peak
+
+
+try:
+    generate(os.environ["DATA_DIR"], args.people, args.messages, args.briefs, seed=args.seed)
+    database_gen.extract_text = counted_extract_text
+
+    database_gen.write_batches = interrupted_write_batches
+    completed, seconds, peak = ingest()
+    first_calls = len(calls)
+    log_bytes = database_gen.get_extraction_log().size()
+    indented = sum(len(json.dumps({k: v for k, v in record.items() if k not in ("source", "hash")}, indent=2))
+                   for record in database_gen.get_extraction_log().read())
+    print(f"interrupted run: {seconds:.1f}s, {first_calls} LLM extractions, peak {peak / 1e6:.0f} MB traced")
+    print(f"extraction log:  {log_bytes / 1e6:.1f} MB, indented *_output.json: {indented / 1e6:.1f} MB "
+          f"({indented / max(log_bytes, 1):.1f}x)")
+
+    database_gen.write_batches = write_batches
+    completed, seconds, peak = ingest()
+    print(f"resumed run:     {seconds:.1f}s, {len(calls)} LLM extractions, peak {peak / 1e6:.0f} MB traced, "
+          f"log {database_gen.get_extraction_log().stats()}")
+    assert completed and not calls, "the resumed run extracted files again"
+finally:
+    os.chdir(repo_dir)
+    shutil.rmtree(work_dir)
@@ -0,0 +1,93 @@
+import os
+import sys
+import random
+import argparse
+from timeit import default_timer as timer
+
+# Throughput and accuracy of entity_resolution.py on synthetic names. Every distinct person and project
+# name is resolved as written, then again as the LLM tends to vary it (camelCase id, lowercase id without
+# spaces, a dropped letter in long names), e.g.
+#   python benchmarks/bench_resolution.py --entities 200000
+# Recall is the share of variants resolved to the id of their original, and merged the number of
+# distinct names that were wrongly collapsed into another one. Technologies are checked on their own:
+# vendor-prefixed names that are the same product, and products of different vendors that are not. Long
+# names that differ by a whole word have a high trigram similarity and are checked as well.
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--entities", type=int, default=100000, help="distinct names, half people and half projects")
+parser.add_argument("--seed", type=int, default=0)
+args = parser.parse_args()
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from entity_resolution import EntityResolver  # noqa: E402
+from structured_parsers import camel_case  # noqa: E402
+from synthetic_corpus import person_name, project_name  # noqa: E402
+
+rng = random.Random(args.seed)
+
+SAME_TECHNOLOGIES = [("Azure", "Microsoft Azure"), ("Spark", "Apache Spark"), ("BigQuery", "Google BigQuery"),
+                     ("Kafka", "Apache Kafka"), ("S3", "Amazon S3"), ("Power BI", "Microsoft Power BI")]
+DISTINCT_TECHNOLOGIES = ["Google Cloud", "IBM Cloud", "Cloud", "Oracle Cloud", "Google Analytics", "Adobe Analytics",
+                         "Amazon Web Services", "Web Services", "Microsoft Dynamics", "Google Sheets", "Apache",
+                         "Microsoft", "Google", "Amazon", "Oracle Database", "IBM Db2"]
+DISTINCT_NAMES = [
+    ("Project", "BetaHealth Secure Healthcare Data Analytics Platform on Azure",
+     "BetaHealth Secure Healthcare Data Analytics Platform on AWS"),
+    ("Project", "AlphaCorp Customer Support Chatbot", "AlphaCorp Customer Support Chatbots"),
+    ("Project", "AlphaCorp AWS-Powered Sales Analytics Dashboard", "AlphaCorp AWS-Powered Sales Analytics Dashboards"),
+    ("Project", "BetaHealth AI-Driven Patient Care Enhancement Platform on Azure",
+     "BetaHealth AI-Driven Patient Care Enhancement Platform on GCP"),
+    ("Project", "AlphaCorp Supply Chain Optimization Platform", "AlphaCorp Supply Chain Optimization Platform Team"),
+    ("Client", "AlphaCorp Healthcare Solutions", "AlphaCorp Healthcare Solution"),
+]
+
+
+def variants(name):
+    yield camel_case(name)
+    yield "".join(name.split()).lower()
+    if len(name) >= 20:
+        i = rng.randrange(5, len(name) - 5)
+        if name[i].isalpha() and name[i - 1] != " " and name[i + 1] != " ":
+            yield name[:i] + name[i + 1:]
+
+
+names = [("Person", person_name(i)) for i in range(args.entities // 2)]
+names += [("Project", project_name(i)) for i in range(args.entities - len(names))]
+
+resolver = EntityResolver(path=None)
+start = timer()
+originals = {}
+for label, name in names:
+    originals[(label, name)] = resolver.resolve(label, name)[0]
+original_seconds = timer() - start
+
+start = timer()
+found = total = 0
+for label, name in names:
+    for variant in variants(name):
+        total += 1
+        found += resolver.resolve(label, variant)[0] == originals[(label, name)]
+variant_seconds = timer() - start
+
+ids = {}
+for (label, name), id in originals.items():
+    ids.setdefault((label, id), []).append(name)
+merged = sum(len(group) - 1 for group in ids.values())
+
+print(f"names:      {len(names)} resolved in {original_seconds:.2f}s ({len(names) / original_seconds:.0f}/s)")
+print(f"variants:   {total} resolved in {variant_seconds:.2f}s ({total / variant_seconds:.0f}/s)")
+print(f"recall:     {found / max(total, 1):.1%} of the variants resolved to their original")
+print(f"merged:     {merged} distinct names collapsed into another one")
+tech_resolver = EntityResolver(path=None)
+tech_ids = {name: tech_resolver.resolve("Technology", name)[0] for name in DISTINCT_TECHNOLOGIES}
+tech_merged = len(DISTINCT_TECHNOLOGIES) - len(set(tech_ids.values()))
+tech_found = sum(tech_resolver.resolve("Technology", a)[0] == tech_resolver.resolve("Technology", b)[0]
+                 for a, b in SAME_TECHNOLOGIES)
+print(f"vendors:    {tech_found}/{len(SAME_TECHNOLOGIES)} vendor-prefixed products resolved to the product, "
+      f"{tech_merged} of {len(DISTINCT_TECHNOLOGIES)} different products merged")
+names_resolver = EntityResolver(path=None)
+names_merged = sum(names_resolver.resolve(label, a)[0] == names_resolver.resolve(label, b)[0] for label, a, b in DISTINCT_NAMES)
+print(f"words:      {names_merged} of {len(DISTINCT_NAMES)} pairs of names a word apart merged")
+print(f"stats:      {resolver.stats()}, "
+      f"{resolver.stats()['comparisons'] / max(resolver.stats()['resolved'], 1):.1f} comparisons per name")
@@ -0,0 +1,94 @@
+import os
+import sys
+import shutil
+import argparse
+import tempfile
+import contextlib
+import tracemalloc
+from timeit import default_timer as timer
+
+# Reading the results of broad queries in full, as query_graph used to, against the LIMIT injection, row and
+# byte budgets and ranking of result_budget.py, e.g.
+#   python benchmarks/bench_results.py --neo4j
+# Reports per query the rows read, time and peak Python memory of reading them, the size of the context the
+# QA prompt gets and the time to fetch a later page for the UI. With --neo4j the graph in neo4j.env is used
+# as it is (run database_gen.py first); otherwise a synthetic corpus is ingested into the in-process graph.
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--neo4j", action="store_true", help="query the Neo4j database from neo4j.env")
+parser.add_argument("--people", type=int, default=20000, help="size of the synthetic corpus without --neo4j")
+parser.add_argument("--messages", type=int, default=100000)
+parser.add_argument("--briefs", type=int, default=200)
+parser.add_argument("--page", type=int, default=10, help="page to fetch, counted from 0")
+parser.add_argument("--seed", type=int, default=0)
+args = parser.parse_args()
+
+work_dir = tempfile.mkdtemp(prefix="bench_results_")
+if not args.neo4j:
+    os.environ.update({
+        "LLM_STUB": "1",
+        "STUB_LLM_LATENCY": "0",
+        "GRAPH_BACKEND": "memory",
+        "EXTRACTION_CACHE": "0",
+        "DATA_DIR": os.path.join(work_dir, "data"),
+        "TRACE_PATH": "",
+    })
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo_dir)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# The pipeline writes its caches, manifest and extraction log into the current directory; neo4j.env is
+# read relative to it
+os.chdir(repo_dir if args.neo4j else work_dir)
+import database_gen  # noqa: E402
+import qa_pipeline  # noqa: E402
+from synthetic_corpus import generate  # noqa: E402
+from result_budget import fetch_rows, qa_context, row_bytes, RESULT_PAGE_SIZE  # noqa: E402
+
+# (question, query), the kind of Cypher broad questions get
+QUERIES = [
+    ("Show me the Slack messages about the deadline", "MATCH (m:SlackMessage) RETURN m.text"),
+    ("Who knows what?", "MATCH (p:Person)-[:HAS_SKILLS]->(t:Technology) RETURN p.name, t.name"),
+    ("Who worked on which projects?", "MATCH (pr:Project)-[:HAS_PEOPLE]->(p:Person) RETURN pr.name, p.name"),
+]
+
+
+def measure(fn):
+    tracemalloc.start()
+    start = timer()
+    result = fn()
+    seconds = timer() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, seconds, peak
+
+
+try:
+    if not args.neo4j:
+        generate(os.environ["DATA_DIR"], args.people, args.messages, args.briefs, seed=args.seed)
+        with contextlib.redirect_stdout(open(os.devnull, "w")):
+            database_gen.ingestion_pipeline(database_gen.folders)
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        resources = qa_pipeline.get_resources()
+    graph = resources.graph
+    top_k = resources.chain.top_k
+
+    print(f"{'query':<16} {'mode':<7} {'rows':>7} {'read':>9} {'peak MB':>8} {'QA bytes':>9} {f'page {args.page}':>9}")
+    for question, cypher in QUERIES:
+        name = cypher.split("RETURN")[0].split("MATCH ")[1].strip()[:16]
+        rows, seconds, peak = measure(lambda: graph.query(cypher))
+        context = rows[:top_k]
+        _, page_seconds, _ = measure(
+            lambda: graph.query(cypher)[args.page * RESULT_PAGE_SIZE:(args.page + 1) * RESULT_PAGE_SIZE])
+        print(f"{name:<16} {'full':<7} {len(rows):>7} {seconds * 1000:>7.1f}ms {peak / 1e6:>8.1f} "
+              f"{row_bytes(context):>9} {page_seconds * 1000:>7.1f}ms")
+        del rows
+
+        (rows, truncated), seconds, peak = measure(lambda: fetch_rows(graph, cypher))
+        context, summary = qa_context(question, rows, truncated)
+        _, page_seconds, _ = measure(lambda: qa_pipeline.result_page(cypher, args.page))
+        print(f"{'':<16} {'budget':<7} {len(rows):>7} {seconds * 1000:>7.1f}ms {peak / 1e6:>8.1f} "
+              f"{row_bytes(context) + len(summary or ''):>9} {page_seconds * 1000:>7.1f}ms")
+finally:
+    os.chdir(repo_dir)
+    shutil.rmtree(work_dir)
@@ -0,0 +1,65 @@
+import os
+import sys
+import glob
+import json
+import argparse
+from timeit import default_timer as timer
+
+# Accuracy of the local intent router against the labelled questions in router_questions.jsonl and, with
+# --llm, against the QUERY/NOQUERY classifier chain of the app (needs Ollama), e.g.
+#   python benchmarks/bench_router.py --llm
+# Entity names are taken from the rule-based parse of data/, so no database is needed.
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--questions", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "router_questions.jsonl"))
+parser.add_argument("--llm", action="store_true", help="also run the LLM classifier for comparison")
+args = parser.parse_args()
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo_dir)
+from intent_router import IntentRouter, ROUTER_THRESHOLD  # noqa: E402
+from cypher_cache import entity_pattern  # noqa: E402
+from structured_parsers import STRUCTURED_PARSERS  # noqa: E402
+
+vocabulary = {}
+for folder, parse in STRUCTURED_PARSERS.items():
+    for file in sorted(glob.glob(os.path.join(repo_dir, "data", folder, "*"))):
+        for entity in (parse(file) or {"entities": []})["entities"]:
+            if entity.get("name"):
+                vocabulary.setdefault(entity["name"].lower(), entity)
+pattern = entity_pattern(vocabulary)
+
+with open(args.questions) as f:
+    questions = [json.loads(line) for line in f if line.strip()]
+
+router = IntentRouter()
+if args.llm:
+    from qa_pipeline import classifier_chain
+
+rows = []
+for item in questions:
+    start = timer()
+    intent, confidence, reason = router.route(item["question"], pattern)
+    router_ms = (timer() - start) * 1000
+    llm_intent = llm_ms = None
+    if args.llm:
+        start = timer()
+        llm_intent = classifier_chain.run(item["question"]).strip().upper()
+        llm_ms = (timer() - start) * 1000
+    rows.append((item, intent, confidence, reason, router_ms, llm_intent, llm_ms))
+    flag = "" if intent == item["label"] else "  <-- wrong"
+    print(f"{item['label']:>8} {intent:>8} {confidence:.2f} {reason:<11} {item['question']}{flag}")
+
+total = len(rows)
+confident = [row for row in rows if row[2] >= ROUTER_THRESHOLD]
+print()
+print(f"router accuracy:             {sum(row[1] == row[0]['label'] for row in rows) / total:.1%}")
+print(f"routed locally (>= {ROUTER_THRESHOLD}):    {len(confident) / total:.1%}, "
+      f"accuracy {sum(row[1] == row[0]['label'] for row in confident) / max(len(confident), 1):.1%}")
+print(f"router latency:              {sum(row[4] for row in rows) / total:.3f} ms/question")
+if args.llm:
+    combined = [row[1] if row[2] >= ROUTER_THRESHOLD else row[5] for row in rows]
+    print(f"LLM classifier accuracy:     {sum(row[5] == row[0]['label'] for row in rows) / total:.1%}")
+    print(f"router + LLM fallback:       {sum(c == row[0]['label'] for c, row in zip(combined, rows)) / total:.1%}")
+    print(f"agreement with LLM:          {sum(row[1] == row[5] for row in rows) / total:.1%}")
+    print(f"LLM latency:                 {sum(row[6] for row in rows) / total:.0f} ms/question")
@@ -0,0 +1,117 @@
+import os
+import sys
+import shutil
+import argparse
+import tempfile
+import contextlib
+
+# Cypher templates reused for another entity than the one they were generated for, on the files in data/
+# in the in-process graph with the stub LLM, e.g.
+#   python benchmarks/bench_templates.py
+# Every pair seeds the template cache with the first question and asks the second, which binds its own
+# entity into that template. Its rows have to be the ones the query generated for it directly returns, also
+# when the entity of the first question is a single word whose id is its lowercase name ("python") and the
+# one of the second isn't ("Machine Learning", id machineLearning). Templates the stub doesn't write are
+# checked on the parameters they bind: ids, and full-text search strings for names with characters the
+# full-text syntax doesn't take ("C++", "CI/CD") or that the LLM left out ("aws powered").
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--data", default=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data"))
+args = parser.parse_args()
+
+work_dir = tempfile.mkdtemp(prefix="bench_templates_")
+os.environ.update({
+    "LLM_STUB": "1",
+    "STUB_LLM_LATENCY": "0",
+    "STUB_LLM_TOKEN_LATENCY": "0",
+    "GRAPH_BACKEND": "memory",
+    "EXTRACTION_CACHE": "0",
+    "EXPERTISE_INDEX": "0",
+    "ANSWER_CACHE_SIZE": "0",
+    "DATA_DIR": os.path.abspath(args.data),
+    "TRACE_PATH": "",
+})
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo_dir)
+# The pipeline writes its caches, manifest and extraction log into the current directory
+os.chdir(work_dir)
+import database_gen  # noqa: E402
+import qa_pipeline  # noqa: E402
+from cypher_cache import mask_entities, entity_pattern  # noqa: E402
+
+PAIRS = [
+    ("Who knows Python?", "Who knows Machine Learning?"),
+    ("Who knows AWS?", "Who knows Data Warehousing?"),
+    ("Who knows Machine Learning?", "Who knows Python?"),
+    ("What skills does Sarah Johnson have?", "What skills does Liam Thompson have?"),
+    ("Show me messages about compliance", "Show me messages about data analytics"),
+]
+
+SKILLED = ("CALL db.index.fulltext.queryNodes('entity_names', 'python') YIELD node AS t WHERE t:Technology AND "
+           "toLower(t.name) CONTAINS 'python' MATCH (p:Person)-[:HAS_SKILLS]->(t) RETURN p.name, t.name")
+# (first question, the query stored for it, second question, the parameters the second one binds)
+BOUND = [
+    ("Who knows Python?", "MATCH (p:Person)-[:HAS_SKILLS]->(t:Technology {id: 'python'}) RETURN p.name",
+     "Who knows Machine Learning?", {"slot0_id": "machineLearning"}),
+    ("Who knows Python?", "MATCH (p:Person)-[:HAS_SKILLS]->(t:Technology) WHERE t.id = 'python' RETURN p.name",
+     "Who knows Data Warehousing?", {"slot0_id": "dataWarehousing"}),
+    ("Who knows Python?", SKILLED, "Who knows C++?", {"slot0_fulltext": "c", "slot0_lower": "c++"}),
+    ("Who knows Python?", SKILLED, "Who knows CI/CD?", {"slot0_fulltext": "ci cd", "slot0_lower": "ci/cd"}),
+    ("Who worked on AlphaCorp AWS-Powered Sales Analytics Dashboard?",
+     "CALL db.index.fulltext.queryNodes('project_summaries', 'alphacorp aws powered sales analytics dashboard') "
+     "YIELD node AS pr WHERE toLower(pr.name) CONTAINS 'alphacorp aws-powered sales analytics dashboard' "
+     "MATCH (pr)-[:HAS_PEOPLE]->(p:Person) RETURN pr.name, p.name",
+     "Who worked on DeltaEdu Virtual Classroom Platform on AWS?",
+     {"slot0_fulltext": "deltaedu virtual classroom platform on aws", "slot0_lower": "deltaedu virtual classroom platform on aws"}),
+]
+
+
+def rows(question):
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        result = qa_pipeline.query_graph(question, plain=True)
+    return result["intermediate_steps"][1]["context"], result["intermediate_steps"][0]["query"]
+
+
+try:
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        database_gen.ingestion_pipeline(database_gen.folders)
+        resources = qa_pipeline.get_resources()
+    templates = qa_pipeline.get_template_cache()
+    templates.path = None
+    # Technologies whose names the full-text syntax doesn't take as they are
+    for name, id in [("C++", "cpp"), ("CI/CD", "ciCd")]:
+        resources.vocabulary[name.lower()] = {"label": "Technology", "id": id, "name": name}
+    resources.entity_pattern = entity_pattern(resources.vocabulary)
+
+    failures = 0
+    for seed, question in PAIRS:
+        templates.templates.clear()
+        expected, _ = rows(question)
+        templates.templates.clear()
+        rows(seed)
+        hits = templates.hits
+        found, cypher = rows(question)
+        reused = templates.hits > hits
+        ok = reused and found == expected
+        failures += not ok
+        print(f"{'ok' if ok else 'FAIL':<5} {seed!r} -> {question!r}: {len(found)} rows, {len(expected)} expected"
+              f"{'' if reused else ', template not reused'}")
+        if not ok:
+            print(f"      {cypher}")
+
+    for seed, cypher, question, bound in BOUND:
+        templates.templates.clear()
+        masked, slots = mask_entities(seed, resources.vocabulary, resources.entity_pattern)
+        templates.put(masked, slots, cypher)
+        masked, slots = mask_entities(question, resources.vocabulary, resources.entity_pattern)
+        template = templates.get(masked, slots)
+        ok = template is not None and template[1] == bound
+        failures += not ok
+        print(f"{'ok' if ok else 'FAIL':<5} {seed!r} -> {question!r}: bound {template and template[1]}")
+
+    print(f"{failures} of {len(PAIRS) + len(BOUND)} reused templates wrong")
+    assert not failures, "a reused template binds its entity the wrong way"
+finally:
+    os.chdir(repo_dir)
+    shutil.rmtree(work_dir)
@@ -0,0 +1,126 @@
+import os
+import json
+import random
+import argparse
+
+# Generates a synthetic data/ folder in the layouts of the sample data: people profiles (both layouts),
+# Slack message exports and project briefs, at any scale, e.g.
+#   python benchmarks/synthetic_corpus.py /tmp/corpus --people 100000 --messages 1000000 --briefs 1000
+# Output only depends on the sizes and --seed. Files are written one at a time, so memory stays flat.
+
+FIRST_NAMES = [
+    "Sarah", "David", "Amanda", "Ella", "Lucas", "Liam", "Olivia", "Noah", "Emma", "James", "Sophia", "Mason",
+    "Ava", "Ethan", "Mia", "Logan", "Isabella", "Aiden", "Harper", "Elijah", "Amelia", "Oliver", "Evelyn",
+    "Jacob", "Abigail", "Michael", "Emily", "Daniel", "Charlotte", "Henry", "Grace", "Samuel", "Chloe",
+    "Benjamin", "Zoe", "Matthew", "Lily", "Jack", "Nora", "Owen",
+]
+LAST_NAMES = [
+    "Johnson", "Patel", "Rodriguez", "Smith", "Taylor", "Thompson", "Brown", "Garcia", "Miller", "Davis",
+    "Martinez", "Lopez", "Wilson", "Anderson", "Thomas", "Moore", "Jackson", "Martin", "Lee", "Perez",
+    "White", "Harris", "Clark", "Lewis", "Robinson", "Walker", "Young", "Allen", "King", "Wright", "Scott",
+    "Torres", "Nguyen", "Hill", "Flores", "Green", "Adams", "Nelson", "Baker", "Hall",
+]
+SKILLS = [
+    "Python", "Azure", "AWS", "Machine Learning", "Data Analytics", "DevOps", "Cloud Computing", "Kubernetes",
+    "Docker", "React", "Java", "Data Security", "Compliance", "Healthcare Regulations", "Data Warehousing",
+    "Natural Language Processing", "Computer Vision", "IoT", "Terraform", "PostgreSQL", "Spark", "Go",
+    "TypeScript", "Power BI", "Neo4j", "Salesforce", "SAP", "Networking", "Blockchain", "Rust",
+]
+CLIENTS = ["AlphaCorp", "BetaHealth", "GammaTech", "DeltaEdu", "EpsilonBank", "ZetaLogistics", "EtaRetail", "ThetaEnergy"]
+INDUSTRIES = ["Retail", "Healthcare", "Manufacturing", "Education", "Finance", "Logistics", "Retail", "Energy"]
+PRODUCTS = [
+    "Sales Analytics Dashboard", "Customer Support Chatbot", "Supply Chain Optimization Platform",
+    "Patient Care Enhancement Platform", "Manufacturing Monitoring System", "Student Performance Analytics",
+    "Virtual Classroom Platform", "Fraud Detection Engine", "Fleet Tracking Portal", "Demand Forecasting Service",
+    "Energy Usage Optimizer", "Document Search Assistant",
+]
+CLOUDS = ["AWS", "Azure", "Google Cloud"]
+TOPICS = ["the deadline", "the demo", "the client workshop", "the data migration", "code review", "the release",
+          "the outage", "onboarding", "the architecture", "testing"]
+
+
+# Unique, readable names; past the FIRST_NAMES x LAST_NAMES combinations a number is appended
+def person_name(i):
+    combos = len(FIRST_NAMES) * len(LAST_NAMES)
+    name = f"{FIRST_NAMES[i % len(FIRST_NAMES)]} {LAST_NAMES[(i // len(FIRST_NAMES)) % len(LAST_NAMES)]}"
+    return name if i < combos else f"{name} {i // combos + 1}"
+
+
+def project_name(i):
+    client = CLIENTS[i % len(CLIENTS)]
+    product = PRODUCTS[(i // len(CLIENTS)) % len(PRODUCTS)]
+    cloud = CLOUDS[i % len(CLOUDS)]
+    base = f"{client} {product} on {cloud}"
+    cycle = len(CLIENTS) * len(PRODUCTS)
+    return base if i < cycle else f"{base} {i // cycle + 1}"
+
+
+def write_people(out_dir, people, projects, per_file, rng):
+    folder = os.path.join(out_dir, "people_profiles")
+    os.makedirs(folder, exist_ok=True)
+    for file_no, start in enumerate(range(0, people, per_file)):
+        blocks = []
+        for i in range(start, min(start + per_file, people)):
+            skills = rng.sample(SKILLS, rng.randint(2, 6))
+            worked_on = [project_name(rng.randrange(projects)) for _ in range(rng.randint(0, 3))] if projects else []
+            # Alternate between the two layouts of the sample files
+            if file_no % 2 == 0:
+                blocks.append(f"Full Name: {person_name(i)}\nSkills: {', '.join(skills)}\nProjects: {', '.join(worked_on)}")
+            else:
+                lines = [person_name(i), f"Skills: {', '.join(skills)}", "Projects:"] + [f"- {name}" for name in worked_on]
+                blocks.append("\n".join(lines))
+        with open(os.path.join(folder, f"people-profiles{file_no + 1}.md"), "w") as f:
+            f.write("\n\n".join(blocks) + "\n")
+
+
+def write_messages(out_dir, messages, people, projects, per_file, rng):
+    folder = os.path.join(out_dir, "slack_messages")
+    os.makedirs(folder, exist_ok=True)
+    for file_no, start in enumerate(range(0, messages, per_file)):
+        batch = []
+        for i in range(start, min(start + per_file, messages)):
+            project = project_name(rng.randrange(projects)) if projects else "the project"
+            text = (f"Working on {project} with {rng.choice(SKILLS)}. "
+                    f"Quick update on {rng.choice(TOPICS)}: {rng.choice(['all good', 'blocked', 'needs review', 'done'])}.")
+            batch.append({"id": f"msg{i:08d}", "type": "message", "user": person_name(rng.randrange(max(people, 1))), "text": text})
+        with open(os.path.join(folder, f"slack_messages{file_no + 1}.json"), "w") as f:
+            json.dump(batch, f, indent=4)
+
+
+def write_briefs(out_dir, briefs, rng):
+    folder = os.path.join(out_dir, "project_briefs")
+    os.makedirs(folder, exist_ok=True)
+    for i in range(briefs):
+        name = project_name(i)
+        client = CLIENTS[i % len(CLIENTS)]
+        techs = rng.sample(SKILLS, 4)
+        text = (
+            f"Brief: {name}\n\n"
+            f"Customer Need:\n{client}, a company in {INDUSTRIES[i % len(INDUSTRIES)]}, needed a "
+            f"{PRODUCTS[(i // len(CLIENTS)) % len(PRODUCTS)].lower()} to keep up with growing demand.\n\n"
+            f"Delivered Solution:\nWe built the platform on {CLOUDS[i % len(CLOUDS)]}.\n\n"
+            f"Technologies Involved:\nThe solution uses {', '.join(techs[:-1])} and {techs[-1]}.\n\n"
+            f"Timeline & Customer Experience:\nThe project spanned {rng.randint(2, 12)} months.\n"
+        )
+        with open(os.path.join(folder, f"{name}.md"), "w") as f:
+            f.write(text)
+
+
+def generate(out_dir, people=10000, messages=10000, briefs=100, people_per_file=100, messages_per_file=1000, seed=0):
+    rng = random.Random(seed)
+    write_briefs(out_dir, briefs, rng)
+    write_people(out_dir, people, briefs, people_per_file, rng)
+    write_messages(out_dir, messages, people, briefs, messages_per_file, rng)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("out_dir", help="folder to write people_profiles/, slack_messages/ and project_briefs/ into")
+    parser.add_argument("--people", type=int, default=10000)
+    parser.add_argument("--messages", type=int, default=10000)
+    parser.add_argument("--briefs", type=int, default=100)
+    parser.add_argument("--people-per-file", type=int, default=100)
+    parser.add_argument("--messages-per-file", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    generate(args.out_dir, args.people, args.messages, args.briefs, args.people_per_file, args.messages_per_file, args.seed)
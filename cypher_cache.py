@@ -0,0 +1,189 @@
+import os
+import re
+import json
+import threading
+from collections import OrderedDict
+
+from answer_cache import normalize
+
+# Cache of generated Cypher, keyed on the question with its entities masked. "which skills does Liam Thompson
+# have" and "which skills does Sarah Johnson have" both become "which skills does <Person1> have", and the
+# Cypher generated for the first one is stored with the entity literal replaced by a $slot parameter. The
+# next question of that shape binds its own entity and skips the Cypher LLM call.
+#
+# Entities are recognised from the names and ids of the nodes in the graph. A template is only stored when
+# every masked entity shows up as a literal in the query and the query returned rows. An entity can be
+# written several ways in one query, e.g. as a full-text search string and in a CONTAINS check, and every
+# way gets its own parameter.
+
+TEMPLATE_CACHE_PATH = os.getenv("CYPHER_TEMPLATE_PATH", ".cache/cypher_templates.json")
+TEMPLATE_CACHE_SIZE = int(os.getenv("CYPHER_TEMPLATE_CACHE_SIZE", "512"))
+
+# Labels whose names are looked for in questions
+ENTITY_LABELS = ["Person", "Project", "Technology", "Client"]
+
+LITERAL = re.compile(r"'((?:[^'\\]|\\.)*)'|\"((?:[^\"\\]|\\.)*)\"")
+# A literal compared against an id property, e.g. {id: '...'} or n.id = '...'
+ID_CONTEXT = re.compile(r"\bid\s*(?::|=|IN\s*\[)\s*$", re.I)
+# The search string of a full-text query, queryNodes('entity_names', '...')
+FULLTEXT_CONTEXT = re.compile(r"queryNodes\s*\(\s*(?:'[^']*'|\"[^\"]*\"|\$\w+)\s*,\s*$", re.I)
+# Characters the full-text query syntax gives a meaning to. Rule 4 of the Cypher prompt has the LLM leave
+# them out of search strings, "C++" would fail to parse
+FULLTEXT_SPECIAL = re.compile(r'[+\-!(){}\[\]^"~*?:\\/&|]')
+
+
+# lowercase name -> {"label", "id", "name"} for every named entity in the graph
+def load_entity_vocabulary(graph):
+    rows = graph.query(
+        "MATCH (n) WHERE any(label IN labels(n) WHERE label IN $labels) AND n.name IS NOT NULL "
+        "RETURN [label IN labels(n) WHERE label IN $labels][0] AS label, n.id AS id, n.name AS name",
+        {"labels": ENTITY_LABELS},
+    )
+    vocabulary = {}
+    for row in rows:
+        name = str(row["name"]).strip()
+        if len(name) >= 2:
+            vocabulary.setdefault(name.lower(), {"label": row["label"], "id": row["id"], "name": name})
+    return vocabulary
+
+
+# Matches any of the names (the keys of a vocabulary) as a whole word
+def entity_pattern(vocabulary, flags=re.IGNORECASE):
+    if not vocabulary:
+        return None
+    # Longest names first so "AlphaCorp Customer Support Chatbot" wins over "AlphaCorp"
+    names = sorted(vocabulary, key=len, reverse=True)
+    return re.compile(r"(?<![0-9A-Za-z])(" + "|".join(re.escape(name) for name in names) + r")(?![0-9A-Za-z])", flags)
+
+
+# Replace the known entities in a question by <Label1>, <Label2>, ... and return the masked, normalized
+# question together with the entities in order of appearance
+def mask_entities(question, vocabulary, pattern=None):
+    pattern = pattern or entity_pattern(vocabulary)
+    slots = []
+    counts = {}
+
+    def mask(match):
+        entity = vocabulary[match.group(1).lower()]
+        counts[entity["label"]] = counts.get(entity["label"], 0) + 1
+        slots.append(entity)
+        return f" {entity['label'].lower()}slot{counts[entity['label']]} "
+
+    masked = pattern.sub(mask, question) if pattern else question
+    return normalize(masked), slots
+
+
+# A name as a full-text search string: lowercase, without the special characters ("ci/cd" -> "ci cd")
+def fulltext_form(name):
+    return " ".join(FULLTEXT_SPECIAL.sub(" ", name.lower()).split())
+
+
+# How an entity was written in the query, so another entity can be written the same way. before is the
+# query up to the literal. "python" is both the id and the lowercase name of Python, it is only taken for
+# the id when it is compared against one, otherwise "Machine Learning" would be bound as machineLearning.
+# Likewise the search string of a full-text query is always bound in the full-text form
+def literal_form(value, entity, before=""):
+    name = entity["name"]
+    if entity["id"] is not None and value == str(entity["id"]) and (
+            value.lower() != name.lower() or ID_CONTEXT.search(before[-64:])):
+        return "id"
+    if FULLTEXT_CONTEXT.search(before[-64:]) and value.lower() in (name.lower(), fulltext_form(name)):
+        return "fulltext"
+    if value == name.lower():
+        return "lower"
+    if value.lower() == name.lower():
+        return "name"
+    if value == fulltext_form(name):
+        return "fulltext"
+    return None
+
+
+def bind(entity, form):
+    if form == "id":
+        return str(entity["id"])
+    if form == "lower":
+        return entity["name"].lower()
+    if form == "fulltext":
+        return fulltext_form(entity["name"])
+    return entity["name"]
+
+
+# Turn a generated query into a template: the literals that spell a masked entity become $slotN_form
+# parameters, one per slot and way it is written. Returns None when an entity doesn't appear in the query,
+# the template wouldn't generalize then.
+def make_template(cypher, slots):
+    params = {}
+
+    def parameterize(match):
+        value = match.group(1) if match.group(1) is not None else match.group(2)
+        for i, entity in enumerate(slots):
+            form = literal_form(value, entity, cypher[:match.start()])
+            if form:
+                params[f"slot{i}_{form}"] = [i, form]
+                return f"$slot{i}_{form}"
+        return match.group(0)
+
+    template = LITERAL.sub(parameterize, cypher)
+    if {i for i, _ in params.values()} != set(range(len(slots))):
+        return None
+    return {"cypher": template, "slots": len(slots), "params": params}
+
+
+# The template with the parameters written out, for display
+def render(cypher, params):
+    for name, value in sorted(params.items(), reverse=True):
+        cypher = cypher.replace(f"${name}", "'" + str(value).replace("'", "\\'") + "'")
+    return cypher
+
+
+class CypherTemplateCache:
+    def __init__(self, path=TEMPLATE_CACHE_PATH, max_entries=TEMPLATE_CACHE_SIZE):
+        self.path = path
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.templates = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        if path and os.path.exists(path):
+            with open(path, "r") as f:
+                self.templates.update(json.load(f))
+
+    # (cypher, params) for a masked question, or None
+    def get(self, masked, slots):
+        with self.lock:
+            template = self.templates.get(masked)
+            # Templates saved before the parameters were named by form don't have "slots", they are replaced
+            if template is None or template.get("slots") != len(slots):
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.templates.move_to_end(masked)
+        params = {name: bind(slots[i], form) for name, (i, form) in template["params"].items()}
+        return template["cypher"], params
+
+    def put(self, masked, slots, cypher):
+        template = make_template(cypher, slots)
+        if template is None:
+            return False
+        with self.lock:
+            self.templates[masked] = template
+            self.templates.move_to_end(masked)
+            while len(self.templates) > self.max_entries:
+                self.templates.popitem(last=False)
+            self.save()
+        return True
+
+    # Caller holds the lock
+    def save(self):
+        if not self.path:
+            return
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.templates, f, indent=1)
+        os.replace(tmp_path, self.path)
+
+    def stats(self):
+        with self.lock:
+            return {"templates": len(self.templates), "hits": self.hits, "misses": self.misses}
@@ -1,128 +1,549 @@
 import os
+import re
+import random
+import threading
 from string import Template
 import json
 from neo4j import GraphDatabase
 import glob
+from collections import deque
+from itertools import groupby
+from concurrent.futures import ThreadPoolExecutor
 from timeit import default_timer as timer
 from dotenv import load_dotenv
 from time import sleep
-from ollama import chat
+import argparse
+from extraction_cache import ExtractionCache, make_key
+from manifest import file_hash, load_manifest, save_manifest, plan_delta, retractions
+from stream_reader import iter_json_array, pack_chunks
+from structured_parsers import STRUCTURED_PARSERS
+from graph_version import bump_graph_version
+from stream_reader import estimate_tokens
+from tracing import Trace, export_jsonl
+from entity_resolution import EntityResolver
+from expertise_index import ExpertiseIndex
+from record_log import RecordLog
 
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv("neo4j.env")
 
+# LLM_STUB=1 swaps Ollama for a canned, offline chat endpoint so the pipeline can be benchmarked without a model
+if os.getenv("LLM_STUB"):
+    from stub_llm import stub_chat as chat
+else:
+    from ollama import chat
+
 #Neo4j configuration
 neo4j_url = os.getenv("NEO4J_CONNECTION_URL")
 neo4j_user = os.getenv("NEO4J_USER")
 neo4j_password = os.getenv("NEO4J_PASSWORD")
-gds = GraphDatabase.driver(neo4j_url, auth=(neo4j_user, neo4j_password))
+# GRAPH_BACKEND=memory writes to the in-process graph of memory_graph.py instead of Neo4j, for offline benchmarks
+GRAPH_BACKEND = os.getenv("GRAPH_BACKEND", "neo4j")
+gds = None
 
-def process_llama(file_prompt, system_msg):
-    conversation = [
-        {"role": "system", "content": system_msg},
-        {"role": "user", "content": file_prompt}
-    ]
 
-    # No streaming — get full response at once
-    reply = chat(model='phi4', messages=conversation, format="json")
-    response_text = reply.message.content
+# The driver is only created once something is written, extraction alone doesn't need a database
+def get_driver():
+    global gds
+    if gds is None:
+        if GRAPH_BACKEND == "memory":
+            from memory_graph import GRAPH, MemoryDriver
+            gds = MemoryDriver(GRAPH)
+        else:
+            gds = GraphDatabase.driver(neo4j_url, auth=(neo4j_user, neo4j_password))
+    return gds
 
-    sleep(8)  # Optional delay
-    return response_text
 
+# Extraction configuration
+LLM_MODEL = "phi4"
+DATA_DIR = os.getenv("DATA_DIR", "./data")
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", "2"))
+LLM_RETRIES = int(os.getenv("LLM_RETRIES", "5"))
+# Token budget for the messages packed into one prompt when a JSON message export is split up
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "3000"))
+# FAST_PATH=0 sends the structured sources (people profiles, Slack exports) through the LLM as well
+FAST_PATH = os.getenv("FAST_PATH", "1") != "0"
 
 
-def extract_entities_relationships(folder, prompt_template):
-    start = timer()
-    files = glob.glob(f"./data/{folder}/*")
-    system_msg = "You are a helpful IT-project and account management expert who extracts information from documents."
-    print(f"Running pipeline for {len(files)} files in {folder} folder")
-    results = []
-    for i, file in enumerate(files):
-        print(f"Extracting entities and relationships for {file}")
-        try:
-            with open(file, "r") as f:
-                text = f.read().rstrip()
-                prompt = Template(prompt_template).substitute(ctext=text)
-                result = process_llama(prompt, system_msg=system_msg)
-                json_obj = json.loads(result)
-                results.append(json_obj)
+# Delay shared by all extraction workers: it grows while Ollama keeps failing and decays again on success,
+# so we only slow down when the server is actually overloaded
+class AdaptiveBackoff:
+    def __init__(self, initial=0.5, maximum=60.0):
+        self.initial = initial
+        self.maximum = maximum
+        self.delay = 0.0
+        self.lock = threading.Lock()
 
-                # Save each JSON object to a file in the root directory
-                base_filename = os.path.basename(file)
-                json_filename = f"{os.path.splitext(base_filename)[0]}_output.json"
-                with open(json_filename, "w") as json_file:
-                    json.dump(json_obj, json_file, indent=2)
+    def wait(self):
+        if self.delay:
+            # Jitter so the workers don't all hit the server again at the same moment
+            sleep(self.delay * random.uniform(0.5, 1.0))
 
-        except Exception as e:
-            print(f"Error processing {file}: {e}")
-    end = timer()
-    print(f"Pipeline completed in {end-start} seconds")
-    return results
+    def success(self):
+        with self.lock:
+            self.delay = self.delay / 2 if self.delay > self.initial else 0.0
 
+    def failure(self):
+        with self.lock:
+            self.delay = min(self.maximum, max(self.initial, self.delay * 2))
 
 
+backoff = AdaptiveBackoff()
 
-# Function to take a json-object of entitites and relationships and generate cypher query for creating those entities
-def generate_cypher(json_obj):
-    e_statements = []
-    r_statements = []
+# EXTRACTION_CACHE=0 turns the on-disk extraction cache off, e.g. for benchmarking the LLM itself
+cache = ExtractionCache() if os.getenv("EXTRACTION_CACHE", "1") != "0" else None
 
-    e_label_map = {}
-
-    # loop through our json object
-    for i, obj in enumerate(json_obj):
-        print(f"Generating cypher for file {i+1} of {len(json_obj)}")
-        for entity in obj["entities"]:
-            label = entity["label"]
-            id = entity["id"]
-            id = id.replace("-", "").replace("_", "")
-            properties = {k: v for k, v in entity.items() if k not in ["label", "id"]}
-
-            cypher = f'MERGE (n:{label} {{id: "{id}"}})'
-            if properties:
-                props_str = ", ".join(
-                    [f'n.{key} = "{val}"' for key, val in properties.items()]
-                )
-                cypher += f" ON CREATE SET {props_str}"
-            e_statements.append(cypher)
-            e_label_map[id] = label
 
-        for rs in obj["relationships"]:
-            src_id, rs_type, tgt_id = rs.split("|")
-            src_id = src_id.replace("-", "").replace("_", "")
-            tgt_id = tgt_id.replace("-", "").replace("_", "")
+# ENTITY_RESOLUTION=0 writes the entities with the ids the LLM gave them, without merging duplicates
+resolver = EntityResolver() if os.getenv("ENTITY_RESOLUTION", "1") != "0" else None
 
-            src_label = e_label_map[src_id]
-            tgt_label = e_label_map[tgt_id]
+# EXPERTISE_INDEX=0 doesn't maintain the ranked people per technology the app answers "who knows X" from
+expertise = ExpertiseIndex() if os.getenv("EXPERTISE_INDEX", "1") != "0" else None
 
-            cypher = f'MERGE (a:{src_label} {{id: "{src_id}"}}) MERGE (b:{tgt_label} {{id: "{tgt_id}"}}) MERGE (a)-[:{rs_type}]->(b)'
-            r_statements.append(cypher)
+# Extraction results of the current run, appended as files are extracted and read back by the write stage.
+# Opened on first use like the driver, so importing this module doesn't create it in the current directory
+extraction_log = None
 
-    with open("cyphers.txt", "w") as outfile:
-        outfile.write("\n".join(e_statements + r_statements))
 
-    return e_statements + r_statements
+def get_extraction_log():
+    global extraction_log
+    if extraction_log is None:
+        extraction_log = RecordLog()
+    return extraction_log
 
 
-# Final function to bring all the steps together
-def ingestion_pipeline(folders):
-    # Extrating the entites and relationships from each folder, append into one json_object
-    entities_relationships = []
-    for key, value in folders.items():
-        entities_relationships.extend(extract_entities_relationships(key, value))
+# Token counts reported by Ollama are added to span when one is given
+def process_llama(file_prompt, system_msg, retries=LLM_RETRIES, span=None):
+    conversation = [
+        {"role": "system", "content": system_msg},
+        {"role": "user", "content": file_prompt}
+    ]
 
-    # Generate and execute cypher statements
-    cypher_statements = generate_cypher(entities_relationships)
-    for i, stmt in enumerate(cypher_statements):
-        print(f"Executing cypher statement {i+1} of {len(cypher_statements)}")
+    for attempt in range(retries + 1):
+        backoff.wait()
+        try:
+            # No streaming — get full response at once
+            reply = chat(model=LLM_MODEL, messages=conversation, format="json")
+        except Exception as e:
+            backoff.failure()
+            if attempt == retries:
+                raise
+            print(f"LLM call failed ({e}), retrying with {backoff.delay:.1f}s backoff")
+            continue
+        backoff.success()
+        if span is not None:
+            span["attempts"] = attempt + 1
+            span["prompt_tokens"] = getattr(reply, "prompt_eval_count", None) or estimate_tokens(file_prompt)
+            span["output_tokens"] = getattr(reply, "eval_count", None) or estimate_tokens(reply.message.content)
+        return reply.message.content
+
+
+# Extract one piece of text; a whole document, or one chunk of a large message export
+def extract_text(file, text, prompt_template, system_msg, trace):
+    try:
+        with trace.span("extract", file=file) as span:
+            # Unchanged documents are answered from the cache without calling the LLM
+            key = make_key(text, prompt_template, LLM_MODEL)
+            json_obj = cache.get(key) if cache else None
+            span["cache_hit"] = json_obj is not None
+            if json_obj is None:
+                prompt = Template(prompt_template).substitute(ctext=text)
+                result = process_llama(prompt, system_msg=system_msg, span=span)
+                json_obj = json.loads(result)
+                if cache:
+                    cache.put(key, json_obj)
+            span["entities"] = len(json_obj.get("entities", []))
+        return json_obj
+
+    except Exception as e:
+        print(f"Error processing {file}: {e}")
+        return None
+
+
+# Split the files into (file, text, parsed) work items. Files the rule-based parser understands come out
+# already extracted in parsed. Otherwise JSON message exports are streamed and packed into chunks of at
+# most CHUNK_TOKENS and every other document is sent whole. A file that can't be read yields an item
+# with neither text nor parsed, which fails the whole file.
+def iter_texts(files, trace, parser=None):
+    for file in files:
+        print(f"Extracting entities and relationships for {file}")
         try:
-            gds.execute_query(stmt)
+            parsed = None
+            if parser:
+                with trace.span("parse", file=file) as span:
+                    parsed = parser(file)
+                    span["entities"] = len(parsed["entities"]) if parsed else 0
+            if parsed is not None:
+                yield file, None, parsed
+            elif file.endswith(".json"):
+                for chunk in pack_chunks(iter_json_array(file), CHUNK_TOKENS):
+                    yield file, json.dumps(chunk, indent=4), None
+            else:
+                with open(file, "r") as f:
+                    yield file, f.read().rstrip(), None
         except Exception as e:
-            with open("failed_statements.txt", "w") as f:
-                f.write(f"{stmt} - Exception: {e}\n")
+            print(f"Error processing {file}: {e}")
+            yield file, None, None
+
+
+# Like pool.map, but with at most window tasks submitted at a time, so a lazy iterable of chunks is never
+# read further ahead than the workers can keep up with. Results come back in input order.
+def bounded_map(pool, fn, items, window):
+    pending = deque()
+    for item in items:
+        pending.append((item, pool.submit(fn, item)))
+        if len(pending) >= window:
+            item, future = pending.popleft()
+            yield item, future.result()
+    while pending:
+        item, future = pending.popleft()
+        yield item, future.result()
+
+
+# Combine the extractions of the chunks of one file, entities are deduplicated on (label, id)
+def merge_extractions(json_objs):
+    if len(json_objs) == 1:
+        return json_objs[0]
+    entities = {}
+    relationships = {}
+    for json_obj in json_objs:
+        for entity in json_obj.get("entities", []):
+            entities.setdefault((entity.get("label"), entity.get("id")), entity)
+        for rs in json_obj.get("relationships", []):
+            relationships.setdefault(rs, None)
+    return {"entities": list(entities.values()), "relationships": list(relationships)}
+
+
+def list_files(folder, data_dir=DATA_DIR):
+    return sorted(glob.glob(f"{data_dir}/{folder}/*"))
+
+
+# Yields the extraction of every file as soon as all of it is done, in the order of files
+def extract_entities_relationships(folder, prompt_template, workers=EXTRACTION_WORKERS, data_dir=DATA_DIR, files=None,
+                                   fast_path=FAST_PATH, trace=None):
+    trace = trace or Trace("extraction", folder=folder)
+    start = timer()
+    if files is None:
+        files = list_files(folder, data_dir)
+    system_msg = "You are a helpful IT-project and account management expert who extracts information from documents."
+    print(f"Running pipeline for {len(files)} files in {folder} folder with {workers} workers")
+
+    def extract(item):
+        file, text, parsed = item
+        if parsed is not None:
+            return parsed
+        return None if text is None else extract_text(file, text, prompt_template, system_msg, trace)
+
+    parser = STRUCTURED_PARSERS.get(folder) if fast_path else None
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # Chunks of one file come back consecutively and in order, so they can be merged file by file
+        extracted = bounded_map(pool, extract, iter_texts(files, trace, parser), window=workers * 2)
+        for file, group in groupby(extracted, key=lambda pair: pair[0][0]):
+            json_objs = [json_obj for _, json_obj in group]
+            if any(json_obj is None for json_obj in json_objs):
+                print(f"Skipping {file}, not every part of it could be extracted")
+                continue
+            json_obj = merge_extractions(json_objs)
+
+            # Remember which file the facts came from, the ingest manifest is keyed on it
+            json_obj["source"] = file
+            yield json_obj
+    end = timer()
+    print(f"Pipeline completed in {end-start} seconds ({len(files) / max(end - start, 1e-9):.2f} files/s)")
+    if cache:
+        print(f"Extraction cache: {cache.stats()}")
+
+
+
+
+# Number of rows sent to Neo4j per UNWIND batch; each batch is written in its own transaction
+BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "500"))
+
+# Labels and relationship types can't be passed as parameters, so only plain identifiers are spliced into the query
+IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+# Uniqueness constraints on id turn every MERGE into an index lookup instead of a label scan. The full-text
+# indexes back the name, summary and message lookups of the Cypher the app generates
+CONSTRAINED_LABELS = ["Person", "Project", "Technology", "Client", "SlackMessage"]
+SCHEMA_STATEMENTS = [
+    f"CREATE CONSTRAINT {label.lower()}_id IF NOT EXISTS FOR (n:{label}) REQUIRE n.id IS UNIQUE"
+    for label in CONSTRAINED_LABELS
+] + [
+    "CREATE FULLTEXT INDEX entity_names IF NOT EXISTS FOR (n:Person|Project|Technology|Client) ON EACH [n.name]",
+    "CREATE FULLTEXT INDEX project_summaries IF NOT EXISTS FOR (n:Project) ON EACH [n.name, n.summary]",
+    "CREATE FULLTEXT INDEX slack_text IF NOT EXISTS FOR (n:SlackMessage) ON EACH [n.text]",
+]
+
+
+# Create the constraints and indexes that don't exist yet. Schema changes can't share a transaction with
+# writes, so each one is run on its own
+def create_schema(trace=None):
+    trace = trace or Trace("schema")
+    with get_driver().session() as session:
+        for statement in SCHEMA_STATEMENTS:
+            try:
+                with trace.span("schema", statement=statement[:80]):
+                    session.run(statement).consume()
+            except Exception as e:
+                # e.g. an existing graph that already has two nodes with the same id
+                print(f"Could not run {statement!r}: {e}")
+
+
+def clean_id(id):
+    return id.replace("-", "").replace("_", "")
+
+
+# Turns a stream of json-objects of entities and relationships into parameterized cypher and writes it.
+# Entities are grouped by label and relationships by (src_label, type, tgt_label), every group becomes one
+# UNWIND statement that is written as soon as it holds batch_size rows, so only one batch per group is held
+# at a time. Before a relationship batch, all pending entities are written, so the MERGEs find their
+# endpoints with their properties. Of the run so far only the label of every node id is kept: relationship
+# endpoints are looked up in it, and the first occurrence of a node in the run wins. Every object comes from
+# a new or changed file, so its properties replace the ones an earlier run wrote
+class CypherWriter:
+    def __init__(self, batch_size=BATCH_SIZE, trace=None):
+        self.batch_size = batch_size
+        self.trace = trace
+        self.e_rows = {}
+        self.r_rows = {}
+        self.e_label_map = {}
+        self.statements = 0
+        self.rows = 0
+        self.written = 0
+
+    # Add one object, returns the nodes and relationships it produced
+    def add(self, obj):
+        nodes = set()
+        relationships = set()
+        for entity in obj["entities"]:
+            label = entity["label"]
+            if not IDENTIFIER.match(label):
+                print(f"Skipping entity with invalid label {label!r}")
+                continue
+            id = clean_id(entity["id"])
+            properties = {k: str(v) for k, v in entity.items() if k not in ["label", "id"]}
+
+            if self.e_label_map.get(id) != label:
+                self.e_label_map[id] = label
+                rows = self.e_rows.setdefault(label, {})
+                rows.setdefault(id, {"id": id, "props": properties})
+                if len(rows) >= self.batch_size:
+                    self.flush_entities(label)
+            nodes.add((label, id))
+
+        for rs in obj["relationships"]:
+            src_id, rs_type, tgt_id = rs.split("|")
+            src_id = clean_id(src_id)
+            tgt_id = clean_id(tgt_id)
+
+            if src_id not in self.e_label_map or tgt_id not in self.e_label_map or not IDENTIFIER.match(rs_type):
+                print(f"Skipping relationship {rs!r}")
+                continue
+            src_label = self.e_label_map[src_id]
+            tgt_label = self.e_label_map[tgt_id]
+
+            key = (src_label, rs_type, tgt_label)
+            rows = self.r_rows.setdefault(key, {})
+            rows[(src_id, tgt_id)] = {"src": src_id, "tgt": tgt_id}
+            relationships.add((src_label, src_id, rs_type, tgt_label, tgt_id))
+            if len(rows) >= self.batch_size:
+                self.flush_relationships(key)
+        return nodes, relationships
+
+    def write(self, query, rows):
+        self.statements += 1
+        self.rows += len(rows)
+        self.written += write_batches([(query, rows)], self.batch_size, self.trace)
+
+    def flush_entities(self, label):
+        rows = self.e_rows.pop(label, {})
+        if rows:
+            self.write(f"UNWIND $rows AS row MERGE (n:{label} {{id: row.id}}) SET n += row.props",
+                       list(rows.values()))
+
+    def flush_relationships(self, key):
+        for label in list(self.e_rows):
+            self.flush_entities(label)
+        src_label, rs_type, tgt_label = key
+        rows = self.r_rows.pop(key, {})
+        if rows:
+            self.write(f"UNWIND $rows AS row MERGE (a:{src_label} {{id: row.src}}) MERGE (b:{tgt_label} {{id: row.tgt}}) "
+                       f"MERGE (a)-[:{rs_type}]->(b)", list(rows.values()))
+
+    # Write what is left, entities first
+    def flush(self):
+        for label in list(self.e_rows):
+            self.flush_entities(label)
+        for key in list(self.r_rows):
+            self.flush_relationships(key)
+
+
+# Statements that remove the given nodes and relationships, as (query, rows) pairs for write_batches
+def retraction_cypher(nodes, relationships):
+    r_rows = {}
+    for src_label, src_id, rs_type, tgt_label, tgt_id in relationships:
+        r_rows.setdefault((src_label, rs_type, tgt_label), []).append({"src": src_id, "tgt": tgt_id})
+    e_rows = {}
+    for label, id in nodes:
+        e_rows.setdefault(label, []).append({"id": id})
+
+    r_statements = [
+        (f"UNWIND $rows AS row MATCH (a:{src_label} {{id: row.src}})-[r:{rs_type}]->(b:{tgt_label} {{id: row.tgt}}) DELETE r", rows)
+        for (src_label, rs_type, tgt_label), rows in r_rows.items()
+    ]
+    e_statements = [
+        (f"UNWIND $rows AS row MATCH (n:{label} {{id: row.id}}) DETACH DELETE n", rows)
+        for label, rows in e_rows.items()
+    ]
+    return r_statements + e_statements
+
+
+def run_batch(tx, query, rows):
+    return tx.run(query, rows=rows).consume()
+
+
+# Write every (query, rows) group in batches of batch_size, one explicit write transaction per batch.
+# Returns the number of rows written
+def write_batches(statements, batch_size=BATCH_SIZE, trace=None):
+    trace = trace or Trace("write")
+    total_rows = sum(len(rows) for _, rows in statements)
+    written = 0
+    with get_driver().session() as session:
+        for query, rows in statements:
+            for offset in range(0, len(rows), batch_size):
+                batch = rows[offset:offset + batch_size]
+                batch_start = timer()
+                try:
+                    with trace.span("write_batch", query=query[:80], rows=len(batch)):
+                        session.execute_write(run_batch, query, batch)
+                except Exception as e:
+                    with open("failed_statements.txt", "a") as f:
+                        f.write(f"{query} - rows {offset}-{offset + len(batch)} - Exception: {e}\n")
+                    continue
+                elapsed = timer() - batch_start
+                written += len(batch)
+                print(f"Wrote {written}/{total_rows} rows, batch of {len(batch)} in {elapsed:.2f}s "
+                      f"({len(batch) / max(elapsed, 1e-9):.0f} rows/s): {query[:60]}")
+    return written
+
+
+# The records of the log from start to end that belong to this run, resolved to canonical ids, one at a time.
+# A file can have a record from an interrupted run as well as a newer one, only the first record with its
+# current hash counts. The technologies whose experts the records change are added to touched
+def iter_facts(log, start, end, hashes, changed, touched):
+    seen = set()
+    for record in log.read(start, end):
+        source = record["source"]
+        if source in seen or source not in changed or record.get("hash") != hashes[source]:
+            continue
+        seen.add(source)
+        if resolver:
+            record = resolver.canonicalize(record, clean_id)
+        # Rescored once all records are in
+        if expertise:
+            touched.update(expertise.add([record], clean_id, rescore=False))
+        yield record
+
+
+# Final function to bring all the steps together.
+# With incremental=True only new or changed files are extracted and written, and the facts of changed or
+# deleted files that no unchanged file still produces are retracted first. Both modes refresh the manifest.
+# Extractions go to the extraction log; a run that was interrupted before it committed is resumed from it.
+def ingestion_pipeline(folders, incremental=False):
+    trace = Trace("ingestion", incremental=incremental)
+    manifest = load_manifest() if incremental else {"files": {}}
+
+    hashes = {}
+    files_by_folder = {}
+    for key in folders:
+        files_by_folder[key] = list_files(key)
+        hashes.update({file: file_hash(file) for file in files_by_folder[key]})
+    changed, removed = plan_delta(manifest, hashes)
+    changed = set(changed)
+    print(f"{len(changed)} new or changed files, {len(removed)} deleted files, "
+          f"{len(hashes) - len(changed)} unchanged files")
+
+    # Files an interrupted run already extracted and that haven't changed since
+    log = get_extraction_log()
+    start = log.committed
+    resumed = {record["source"] for record in log.read(start)
+               if record["source"] in changed and record.get("hash") == hashes[record["source"]]}
+    if resumed:
+        print(f"Resuming {len(resumed)} extracted files from the extraction log")
+    else:
+        log.reset()
+        start = 0
+
+    # Extrating the entites and relationships from each folder, appended to the extraction log file by file
+    extracted = set(resumed)
+    for key, value in folders.items():
+        delta = [file for file in files_by_folder[key] if file in changed and file not in resumed]
+        if delta:
+            for json_obj in extract_entities_relationships(key, value, files=delta, trace=trace):
+                log.append({**json_obj, "hash": hashes[json_obj["source"]]})
+                extracted.add(json_obj["source"])
+    end = log.size()
+
+    # Before the first write, so the MERGEs below already use the constraints
+    create_schema(trace)
+
+    # The facts of changed or deleted files that no unchanged file claims are retracted from the manifest
+    # alone, the ones the changed files still produce are written again below. Files that failed to extract
+    # keep their old facts and manifest entry, so the next run retries them
+    stale = removed + [file for file in extracted if file in manifest["files"]]
+    nodes, relationships = retractions(manifest, stale, {})
+    touched = set()
+    if nodes or relationships:
+        print(f"Retracting {len(nodes)} nodes and {len(relationships)} relationships of {len(stale)} files")
+        write_batches(retraction_cypher(nodes, relationships), trace=trace)
+        # Same changes as the graph, in the same order
+        if expertise:
+            touched |= expertise.remove(nodes, relationships, rescore=False)
+
+    # Stream the records back from the log into batched cypher and remember which facts every file produced.
+    # The different names of the same person, project, technology or client are collapsed into one node on the way
+    facts = {}
+    writer = CypherWriter(trace=trace)
+    start_write = timer()
+    with trace.span("write_facts") as span:
+        for obj in iter_facts(log, start, end, hashes, changed, touched):
+            file_nodes, file_relationships = writer.add(obj)
+            facts[obj["source"]] = {"nodes": sorted(file_nodes), "relationships": sorted(file_relationships)}
+        writer.flush()
+        span.update(statements=writer.statements, rows=writer.rows, log_bytes=end - start)
+    print(f"Wrote {writer.written} rows in {writer.statements} statements in {timer() - start_write:.2f} seconds")
+    if resolver:
+        print(f"Entity resolution: {resolver.stats()}")
+
+    # Saved before the version bump so the app reloads it
+    if expertise:
+        with trace.span("expertise_index") as span:
+            expertise.rescore(touched)
+            expertise.save()
+            span.update(rescored=len(touched), **expertise.stats())
+        print(f"Expertise index: {len(touched)} technologies rescored, {expertise.stats()}")
+
+    # Lets the app drop cached answers that were based on the old graph
+    if writer.statements or nodes or relationships:
+        bump_graph_version()
+
+    for file in removed:
+        del manifest["files"][file]
+    for file, file_facts in facts.items():
+        manifest["files"][file] = {"hash": hashes[file], **file_facts}
+    save_manifest(manifest)
+    if resolver:
+        resolver.save()
+    log.commit(end)
+
+    # Where the time went, per stage; the full trace goes to TRACE_PATH
+    export_jsonl(trace.finish())
+    for stage, seconds in trace.durations().items():
+        print(f"{stage}: {seconds:.2f}s")
 
 # Prompt for processing project briefs
 project_prompt_template = """
@@ -295,5 +716,10 @@ folders = {
 }
 
 
-ingestion_pipeline(folders)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the knowledge graph from the documents in data/")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only ingest new or changed files and retract the facts of changed or deleted ones")
+    args = parser.parse_args()
+    ingestion_pipeline(folders, incremental=args.incremental)
 
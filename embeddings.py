@@ -0,0 +1,34 @@
+import re
+import zlib
+
+import numpy as np
+
+# Small local text embedding: word tokens and character trigrams hashed into a fixed-size vector. It doesn't
+# know about meaning, but it is deterministic, needs no model and costs microseconds, which is enough to
+# spot rephrasings of the same question.
+
+DIM = 512
+TOKEN = re.compile(r"[0-9a-z]+")
+
+
+def tokenize(text):
+    return TOKEN.findall(text.lower())
+
+
+def embed(text, dim=DIM):
+    vector = np.zeros(dim, dtype=np.float32)
+    for token in tokenize(text):
+        # Whole words weigh more than the trigrams they are made of
+        vector[zlib.crc32(token.encode()) % dim] += 2.0
+        padded = f" {token} "
+        for i in range(len(padded) - 2):
+            vector[zlib.crc32(padded[i:i + 3].encode()) % dim] += 1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+# Cosine similarity of one vector against the rows of a matrix of (normalized) vectors
+def similarities(vector, matrix):
+    if len(matrix) == 0:
+        return np.zeros(0, dtype=np.float32)
+    return np.asarray(matrix) @ vector
@@ -0,0 +1,251 @@
+import os
+import re
+import json
+import zlib
+import random
+import threading
+
+import numpy as np
+
+from structured_parsers import camel_case
+
+# Canonicalization of extracted entities before they are turned into Cypher. The LLM names the same thing
+# differently from one document to the next ("sarahJohnson", "sarahjohnson", "p001" named Sarah Johnson;
+# "Azure" and "Microsoft Azure"), which would otherwise become separate nodes.
+#
+# Every Person, Project, Technology and Client is resolved on its name (or its id when it has no name):
+#   1. the name is normalized to a key: camelCase split, lowercased, punctuation dropped and, for
+#      technologies, a leading vendor name removed when the rest is one of its products ("Microsoft Azure",
+#      but not "Google Cloud", which isn't the same as "IBM Cloud")
+#   2. a key seen before maps to its canonical id through the alias table
+#   3. otherwise the most similar canonical key of the same label is looked up: keys are compared on the
+#      Jaccard similarity of their character trigrams, but only with the keys that share a band of their
+#      MinHash signature (locality-sensitive hashing). Keys above the threshold almost always share a band,
+#      dissimilar ones rarely do, so the cost per name doesn't grow with the number of entities. Names
+#      whose numbers differ are never merged, and neither are names that differ by more than a typo: a
+#      long name stays similar when a whole word is added or replaced ("... Platform on Azure" and
+#      "... Platform on AWS"), so a match has to have the same words but for one letter added, dropped or
+#      changed in one of them, and not a plural ("Chatbot" and "Chatbots")
+#   4. a key without a match becomes a new canonical entity
+# Relationship endpoints are rewritten to the canonical ids. The alias table is kept in ALIAS_TABLE_PATH so
+# later runs resolve to the same ids.
+
+ALIAS_TABLE_PATH = os.getenv("ALIAS_TABLE_PATH", ".cache/entity_aliases.json")
+RESOLUTION_THRESHOLD = float(os.getenv("RESOLUTION_THRESHOLD", "0.85"))
+
+RESOLVED_LABELS = ["Person", "Project", "Technology", "Client"]
+# Vendor -> the keys of the products that are named with or without it
+VENDOR_PRODUCTS = {
+    "microsoft": {"azure", "excel", "teams", "sharepoint", "powerbi", "sqlserver", "dynamics", "outlook", "office"},
+    "amazon": {"s3", "ec2", "dynamodb", "redshift", "sagemaker", "kinesis", "aurora"},
+    "google": {"bigquery", "firebase", "tensorflow", "kubernetesengine", "dataflow", "looker"},
+    "apache": {"spark", "kafka", "hadoop", "airflow", "cassandra", "flink", "tomcat", "maven", "hive", "beam"},
+    "ibm": {"watson", "db2", "cognos"},
+    "oracle": {"mysql", "weblogic"},
+    "adobe": {"photoshop", "illustrator", "acrobat", "premiere"},
+}
+
+CAMEL_BOUNDARY = re.compile(r"(?<=[a-z0-9])(?=[A-Z])")
+WORD = re.compile(r"[0-9a-z]+")
+DIGITS = re.compile(r"[0-9]+")
+
+# MinHash signature of BANDS * ROWS hashes. Two keys with trigram similarity 0.85 share a band with a
+# probability of 1 - (1 - 0.85 ** ROWS) ** BANDS, about 99.7%
+BANDS = 8
+ROWS = 4
+# a * h + b stays below 2 ** 64 with a, b < 2 ** 31 and h < 2 ** 32
+PRIME = (1 << 31) - 1
+_rng = random.Random(0)
+HASH_A = np.array([_rng.randrange(1, PRIME) for _ in range(BANDS * ROWS)], dtype=np.uint64)[:, None]
+HASH_B = np.array([_rng.randrange(PRIME) for _ in range(BANDS * ROWS)], dtype=np.uint64)[:, None]
+
+
+# camel=False keeps camelCase words together, as they were written
+def normalize(label, text, camel=True):
+    text = str(text)
+    words = WORD.findall((CAMEL_BOUNDARY.sub(" ", text) if camel else text).lower())
+    # "Microsoft Azure" -> "azure", but "Microsoft" stays "microsoft" and "Google Analytics" "googleanalytics"
+    if label == "Technology" and len(words) > 1 and "".join(words[1:]) in VENDOR_PRODUCTS.get(words[0], ()):
+        words = words[1:]
+    return words
+
+
+# Canonical ids follow the id conventions of the prompts and structured_parsers.py
+def make_id(label, words):
+    if label == "Project":
+        return "".join(words)
+    return camel_case(" ".join(words))
+
+
+def trigrams(key):
+    padded = f"^{key}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+# a and b are the same or one letter apart
+def one_edit(a, b):
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    return a[i + (len(a) == len(b)):] == b[i + 1:]
+
+
+# Whether two names, as normalize(camel=False) words, can be typos of each other. Names written as one word
+# ("sarahjonson", "alphaCorpChatbot") are compared as a whole, names in words word by word
+def typo_of(words, other):
+    if len(words) > 1 and len(other) > 1:
+        if len(words) != len(other):
+            return False
+        different = [(a, b) for a, b in zip(words, other) if a != b]
+        if len(different) > 1:
+            return False
+        words, other = different[0] if different else ([], [])
+    a, b = "".join(words), "".join(other)
+    return one_edit(a, b) and a + "s" != b and b + "s" != a
+
+
+# The blocks a key is indexed and looked up under: one per band of its MinHash signature, together with the
+# numbers in the key since keys with different numbers are never merged anyway
+def blocking_keys(key, grams):
+    hashed = np.array([zlib.crc32(gram.encode("utf-8")) for gram in grams], dtype=np.uint64)
+    signature = ((HASH_A * hashed + HASH_B) % PRIME).min(axis=1)
+    digits = tuple(DIGITS.findall(key))
+    return [(digits, band, signature[band * ROWS:(band + 1) * ROWS].tobytes()) for band in range(BANDS)]
+
+
+class EntityResolver:
+    def __init__(self, path=ALIAS_TABLE_PATH, threshold=RESOLUTION_THRESHOLD):
+        self.path = path
+        self.threshold = threshold
+        self.lock = threading.Lock()
+        # label -> key -> canonical id, and label -> canonical id -> (key, name) for the canonical entities
+        self.aliases = {label: {} for label in RESOLVED_LABELS}
+        self.canonical = {label: {} for label in RESOLVED_LABELS}
+        # label -> blocking key -> canonical keys
+        self.blocks = {label: {} for label in RESOLVED_LABELS}
+        self.resolved = 0
+        self.known = 0
+        self.fuzzy = 0
+        self.comparisons = 0
+        if path and os.path.exists(path):
+            with open(path, "r") as f:
+                table = json.load(f)
+            for label in RESOLVED_LABELS:
+                self.aliases[label].update(table["aliases"].get(label, {}))
+                for id, (key, name) in table["canonical"].get(label, {}).items():
+                    self.add_canonical(label, id, key, name)
+
+    def add_canonical(self, label, id, key, name, blocks=None):
+        self.canonical[label][id] = (key, name)
+        self.aliases[label][key] = id
+        for block in blocks or blocking_keys(key, trigrams(key)):
+            self.blocks[label].setdefault(block, set()).add(key)
+
+    # The most similar canonical key of the label that the name can be a typo of, or None when nothing
+    # reaches the threshold
+    def closest(self, label, key, text, grams, blocks):
+        words = normalize(label, text, camel=False)
+        candidates = set()
+        for block in blocks:
+            candidates.update(self.blocks[label].get(block, ()))
+        best, best_score = None, self.threshold
+        for candidate in candidates:
+            # Keys of very different lengths can't be similar enough
+            if min(len(key), len(candidate)) < self.threshold * max(len(key), len(candidate)):
+                continue
+            self.comparisons += 1
+            score = jaccard(grams, trigrams(candidate))
+            if score >= best_score and typo_of(words, normalize(label, self.canonical[label][self.aliases[label][candidate]][1], camel=False)):
+                best, best_score = candidate, score
+        return best
+
+    # Canonical (id, name) for an entity name
+    def resolve(self, label, text):
+        words = normalize(label, text)
+        if not words:
+            return None, None
+        key = "".join(words)
+        with self.lock:
+            self.resolved += 1
+            id = self.aliases[label].get(key)
+            if id is None:
+                grams = trigrams(key)
+                blocks = blocking_keys(key, grams)
+                match = self.closest(label, key, text, grams, blocks)
+                if match is not None:
+                    self.fuzzy += 1
+                    id = self.aliases[label][match]
+                    self.aliases[label][key] = id
+                else:
+                    id = make_id(label, words)
+                    # Keys that normalize to the same id are the same entity
+                    if id in self.canonical[label]:
+                        self.aliases[label][key] = id
+                    else:
+                        self.add_canonical(label, id, key, str(text), blocks)
+                        return id, str(text)
+            self.known += 1
+            return id, self.canonical[label][id][1]
+
+    # Rewrite one extraction object to canonical ids. Entities that turn out to be the same are merged, the
+    # first one keeps its properties and later ones only fill in the ones it doesn't have
+    def canonicalize(self, json_obj, clean=lambda id: id):
+        ids = {}
+        entities = {}
+        for entity in json_obj.get("entities", []):
+            label = entity.get("label")
+            if label in RESOLVED_LABELS and entity.get("id") is not None:
+                id, name = self.resolve(label, entity.get("name") or entity["id"])
+                if id is not None:
+                    ids[clean(str(entity["id"]))] = id
+                    entity = {**entity, "id": id, "name": name}
+            key = (label, entity.get("id"))
+            if key in entities:
+                for prop, value in entity.items():
+                    entities[key].setdefault(prop, value)
+            else:
+                entities[key] = dict(entity)
+
+        relationships = {}
+        for rs in json_obj.get("relationships", []):
+            parts = rs.split("|")
+            if len(parts) != 3:
+                relationships.setdefault(rs, None)
+                continue
+            src, rs_type, tgt = parts
+            src, tgt = ids.get(clean(src), src), ids.get(clean(tgt), tgt)
+            # Two ends that were merged into one entity
+            if src == tgt and clean(parts[0]) != clean(parts[2]):
+                continue
+            relationships.setdefault(f"{src}|{rs_type}|{tgt}", None)
+        return {**json_obj, "entities": list(entities.values()), "relationships": list(relationships)}
+
+    def save(self):
+        if not self.path:
+            return
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self.lock:
+            table = {"aliases": self.aliases, "canonical": self.canonical}
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(table, f)
+        os.replace(tmp_path, self.path)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "resolved": self.resolved,
+                "known": self.known,
+                "fuzzy": self.fuzzy,
+                "canonical": sum(len(ids) for ids in self.canonical.values()),
+                "comparisons": self.comparisons,
+            }
@@ -0,0 +1,309 @@
+import os
+import json
+import threading
+
+from entity_resolution import normalize
+from cypher_cache import entity_pattern
+from graph_version import read_graph_version
+
+# Materialized answer to "who knows X". For every technology, the people connected to it are scored on
+#   - skill: the technology is one of their skills (Person-HAS_SKILLS->Technology)
+#   - projects: the projects they are on that use it (Project-HAS_PEOPLE->Person, Project-USES_TECH->Technology)
+#   - mentions: their Slack messages that name it (Person-SENT->SlackMessage)
+# and kept ranked, so the app can answer expertise questions with a lookup instead of having the LLM write
+# a traversal over three relationship types.
+#
+# database_gen.py keeps the index in step with the graph: it adds the entities and relationships of every
+# run as it reads them, removes what it retracts, and only rescores the technologies that were touched.
+# Messages are matched against the technologies known when they are ingested (again when they change), so a
+# technology that shows up later only counts mentions from then on. The index is kept in EXPERTISE_INDEX_PATH, and the app reloads it when the graph
+# version changes.
+
+EXPERTISE_INDEX_PATH = os.getenv("EXPERTISE_INDEX_PATH", ".cache/expertise_index.json")
+EXPERTISE_SKILL_WEIGHT = float(os.getenv("EXPERTISE_SKILL_WEIGHT", "3"))
+EXPERTISE_PROJECT_WEIGHT = float(os.getenv("EXPERTISE_PROJECT_WEIGHT", "1"))
+EXPERTISE_MENTION_WEIGHT = float(os.getenv("EXPERTISE_MENTION_WEIGHT", "0.5"))
+
+# Names this short ("Go", "R", "AWS") are only matched in messages as they are capitalized, so "let's go"
+# isn't a mention of Go
+SHORT_NAME = 3
+
+
+def score(skill, projects, mentions):
+    return EXPERTISE_SKILL_WEIGHT * skill + EXPERTISE_PROJECT_WEIGHT * projects + EXPERTISE_MENTION_WEIGHT * mentions
+
+
+class ExpertiseIndex:
+    def __init__(self, path=EXPERTISE_INDEX_PATH):
+        self.path = path
+        self.lock = threading.RLock()
+        self.version = read_graph_version()
+        self.load()
+
+    def load(self):
+        state = {}
+        if self.path and os.path.exists(self.path):
+            with open(self.path, "r") as f:
+                state = json.load(f)
+        # label -> id -> name, for Person and Technology
+        self.names = {label: dict(state.get("names", {}).get(label, {})) for label in ("Person", "Technology")}
+        # technology -> people who have it as a skill, project -> people on it, project -> technologies it
+        # uses, technology -> projects using it
+        self.skilled = {key: set(value) for key, value in state.get("skilled", {}).items()}
+        self.members = {key: set(value) for key, value in state.get("members", {}).items()}
+        self.stack = {key: set(value) for key, value in state.get("stack", {}).items()}
+        self.tech_projects = {key: set(value) for key, value in state.get("tech_projects", {}).items()}
+        # message -> technologies it names and its sender, only for messages that name one
+        self.mentions = {key: list(value) for key, value in state.get("mentions", {}).items()}
+        self.sender = dict(state.get("sender", {}))
+        self.tech_messages = {key: set(value) for key, value in state.get("tech_messages", {}).items()}
+        # technology -> [[person, score, skill, projects, mentions], ...], best first, and technology -> person -> row
+        self.ranked = {key: value for key, value in state.get("ranked", {}).items()}
+        self.rows = {tech: {row[0]: row for row in ranked} for tech, ranked in self.ranked.items()}
+        self.lookup_names()
+        self.patterns = None
+
+    # label -> lowercase name, lowercase id and normalized name of every person and technology -> its id
+    def lookup_names(self):
+        self.ids = {"Technology": {}, "Person": {}}
+        for label in self.ids:
+            for id, name in self.names[label].items():
+                self.lookup_name(label, id, name)
+
+    def lookup_name(self, label, id, name):
+        for key in (name.lower(), id.lower(), "".join(normalize(label, name))):
+            self.ids[label].setdefault(key, id)
+
+    def mention_patterns(self):
+        if self.patterns is None:
+            names = self.names["Technology"].values()
+            self.patterns = (entity_pattern([name for name in names if len(name) > SHORT_NAME]),
+                             entity_pattern([name for name in names if len(name) <= SHORT_NAME], flags=0))
+        return self.patterns
+
+    def mentioned(self, text):
+        found = set()
+        for pattern in self.mention_patterns():
+            if pattern is not None:
+                found.update(match.lower() for match in pattern.findall(text))
+        return sorted({self.ids["Technology"][name] for name in found if name in self.ids["Technology"]})
+
+    # Add the entities and relationships of extraction objects, with ids cleaned the way the graph has them.
+    # Like generate_cypher, objs is read once and a relationship only links entities of its own or an earlier
+    # object. Returns the technologies whose scores change, which are rescored unless rescore is False
+    def add(self, objs, clean=lambda id: id, rescore=True):
+        touched = set()
+        with self.lock:
+            labels = {}
+            for obj in objs:
+                messages = {}
+                for entity in obj.get("entities", []):
+                    label, id = entity.get("label"), entity.get("id")
+                    if id is None:
+                        continue
+                    id = clean(str(id))
+                    labels.setdefault(id, label)
+                    # Names and texts of changed files replace the old ones, as in the graph
+                    if label in self.names and entity.get("name"):
+                        if self.names[label].get(id) != str(entity["name"]):
+                            self.names[label][id] = str(entity["name"])
+                            self.lookup_name(label, id, self.names[label][id])
+                            if label == "Technology":
+                                self.patterns = None
+                    elif label == "SlackMessage" and entity.get("text"):
+                        messages.setdefault(id, str(entity["text"]))
+
+                for id, text in messages.items():
+                    techs = self.mentioned(text)
+                    old = self.mentions.pop(id, [])
+                    if old != techs and id in self.sender:
+                        touched.update(old, techs)
+                    for tech in old:
+                        self.tech_messages.get(tech, set()).discard(id)
+                    if techs:
+                        self.mentions[id] = techs
+                        for tech in techs:
+                            self.tech_messages.setdefault(tech, set()).add(id)
+
+                for rs in obj.get("relationships", []):
+                    parts = rs.split("|")
+                    if len(parts) != 3:
+                        continue
+                    src, rs_type, tgt = clean(parts[0]), parts[1], clean(parts[2])
+                    touched.update(self.link(labels.get(src), src, rs_type, labels.get(tgt), tgt))
+            if rescore:
+                self.rescore(touched)
+        return touched
+
+    # Record one relationship, returns the technologies whose scores it changes
+    def link(self, src_label, src, rs_type, tgt_label, tgt):
+        if (src_label, rs_type, tgt_label) == ("Person", "HAS_SKILLS", "Technology"):
+            self.skilled.setdefault(tgt, set()).add(src)
+            return {tgt}
+        if (src_label, rs_type, tgt_label) == ("Project", "HAS_PEOPLE", "Person"):
+            self.members.setdefault(src, set()).add(tgt)
+            return set(self.stack.get(src, ()))
+        if (src_label, rs_type, tgt_label) == ("Project", "USES_TECH", "Technology"):
+            self.stack.setdefault(src, set()).add(tgt)
+            self.tech_projects.setdefault(tgt, set()).add(src)
+            return {tgt}
+        if (src_label, rs_type, tgt_label) == ("Person", "SENT", "SlackMessage") and tgt in self.mentions:
+            self.sender[tgt] = src
+            return set(self.mentions[tgt])
+        return set()
+
+    def unlink(self, src_label, src, rs_type, tgt_label, tgt):
+        if (src_label, rs_type, tgt_label) == ("Person", "HAS_SKILLS", "Technology"):
+            self.skilled.get(tgt, set()).discard(src)
+            return {tgt}
+        if (src_label, rs_type, tgt_label) == ("Project", "HAS_PEOPLE", "Person"):
+            self.members.get(src, set()).discard(tgt)
+            return set(self.stack.get(src, ()))
+        if (src_label, rs_type, tgt_label) == ("Project", "USES_TECH", "Technology"):
+            self.stack.get(src, set()).discard(tgt)
+            self.tech_projects.get(tgt, set()).discard(src)
+            return {tgt}
+        if (src_label, rs_type, tgt_label) == ("Person", "SENT", "SlackMessage") and self.sender.get(tgt) == src:
+            del self.sender[tgt]
+            return set(self.mentions.get(tgt, ()))
+        return set()
+
+    # Take out what the graph retracts: [label, id] nodes, with all their relationships, and
+    # [src_label, src_id, type, tgt_label, tgt_id] relationships
+    def remove(self, nodes, relationships, rescore=True):
+        touched = set()
+        with self.lock:
+            for relationship in relationships:
+                touched.update(self.unlink(*relationship))
+            for label, id in nodes:
+                touched.update(self.drop(label, id))
+            self.lookup_names()
+            if rescore:
+                self.rescore(touched)
+        return touched
+
+    def drop(self, label, id):
+        touched = set()
+        if label == "Person":
+            self.names["Person"].pop(id, None)
+            for tech, people in self.skilled.items():
+                if id in people:
+                    people.discard(id)
+                    touched.add(tech)
+            for project, people in self.members.items():
+                if id in people:
+                    people.discard(id)
+                    touched.update(self.stack.get(project, ()))
+            for message in [message for message, person in self.sender.items() if person == id]:
+                del self.sender[message]
+                touched.update(self.mentions.get(message, ()))
+        elif label == "Technology":
+            self.names["Technology"].pop(id, None)
+            self.patterns = None
+            self.skilled.pop(id, None)
+            for project in self.tech_projects.pop(id, set()):
+                self.stack.get(project, set()).discard(id)
+            # The mentions come from the messages, which are still there, and count again when the technology is
+            # written anew, as it is when a changed file still has it
+            touched.add(id)
+        elif label == "Project":
+            people = self.members.pop(id, set())
+            for tech in self.stack.pop(id, set()):
+                self.tech_projects.get(tech, set()).discard(id)
+                if people:
+                    touched.add(tech)
+        elif label == "SlackMessage":
+            self.sender.pop(id, None)
+            for tech in self.mentions.pop(id, ()):
+                self.tech_messages.get(tech, set()).discard(id)
+                touched.add(tech)
+        return touched
+
+    # The lock is reentrant, add and remove rescore while holding it
+    def rescore(self, techs):
+        with self.lock:
+            for tech in techs:
+                counts = {}
+                for person in self.skilled.get(tech, ()):
+                    counts.setdefault(person, [0, 0, 0])[0] = 1
+                for project in self.tech_projects.get(tech, ()):
+                    for person in self.members.get(project, ()):
+                        counts.setdefault(person, [0, 0, 0])[1] += 1
+                for message in self.tech_messages.get(tech, ()):
+                    person = self.sender.get(message)
+                    if person is not None:
+                        counts.setdefault(person, [0, 0, 0])[2] += 1
+                ranked = sorted(([person, score(*parts)] + parts for person, parts in counts.items()),
+                                key=lambda row: (-row[1], row[0]))
+                if ranked and tech in self.names["Technology"]:
+                    self.ranked[tech] = ranked
+                    self.rows[tech] = {row[0]: row for row in ranked}
+                else:
+                    self.ranked.pop(tech, None)
+                    self.rows.pop(tech, None)
+
+    def save(self):
+        if not self.path:
+            return
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self.lock:
+            state = {
+                "names": self.names,
+                "skilled": {key: sorted(value) for key, value in self.skilled.items() if value},
+                "members": {key: sorted(value) for key, value in self.members.items() if value},
+                "stack": {key: sorted(value) for key, value in self.stack.items() if value},
+                "tech_projects": {key: sorted(value) for key, value in self.tech_projects.items() if value},
+                "mentions": self.mentions,
+                "sender": self.sender,
+                "tech_messages": {key: sorted(value) for key, value in self.tech_messages.items() if value},
+                "ranked": self.ranked,
+            }
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(state, f)
+        os.replace(tmp_path, self.path)
+
+    # Reload when database_gen.py has changed the graph since the index was read
+    def check_version(self):
+        version = read_graph_version()
+        if version != self.version:
+            with self.lock:
+                self.load()
+                self.version = version
+
+    def resolve(self, label, text):
+        ids = self.ids[label]
+        text = str(text)
+        return ids.get(text.lower()) or ids.get("".join(normalize(label, text)))
+
+    # The k people who know a technology best, as rows for the UI, or None for a technology the index doesn't know
+    def experts(self, technology, k=10):
+        self.check_version()
+        with self.lock:
+            tech = self.resolve("Technology", technology)
+            if tech is None:
+                return None
+            return [{"person": self.names["Person"].get(person, person), "score": round(points, 2), "skill": bool(skill),
+                     "projects": projects, "mentions": mentions}
+                    for person, points, skill, projects, mentions in self.ranked.get(tech, [])[:k]]
+
+    # The k technologies a person knows best, or None for a person the index doesn't know
+    def expertise(self, person, k=10):
+        self.check_version()
+        with self.lock:
+            id = self.resolve("Person", person)
+            if id is None:
+                return None
+            rows = []
+            for tech, people in self.rows.items():
+                if id in people:
+                    _, points, skill, projects, mentions = people[id]
+                    rows.append({"technology": self.names["Technology"].get(tech, tech), "score": round(points, 2),
+                                 "skill": bool(skill), "projects": projects, "mentions": mentions})
+            return sorted(rows, key=lambda row: (-row["score"], row["technology"]))[:k]
+
+    def stats(self):
+        with self.lock:
+            return {"technologies": len(self.ranked), "people": len(self.names["Person"]),
+                    "entries": sum(len(ranked) for ranked in self.ranked.values()), "mentions": len(self.mentions)}
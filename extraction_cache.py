@@ -0,0 +1,78 @@
+import os
+import json
+import sqlite3
+import hashlib
+import threading
+from time import time
+
+# Persistent cache of LLM extraction results, so re-running database_gen.py on documents that haven't
+# changed doesn't send them through the model again. Entries are keyed on the document content, the prompt
+# template and the model name; the least recently used entries are evicted once the cache outgrows max_bytes.
+
+CACHE_PATH = os.getenv("EXTRACTION_CACHE_PATH", ".cache/extractions.sqlite")
+CACHE_MAX_BYTES = int(float(os.getenv("EXTRACTION_CACHE_MB", "512")) * 1024 * 1024)
+
+
+def make_key(text, prompt_template, model):
+    digest = hashlib.sha256()
+    for part in (model, prompt_template, text):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class ExtractionCache:
+    def __init__(self, path=CACHE_PATH, max_bytes=CACHE_MAX_BYTES):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # The extraction workers share one connection, the lock keeps them from interleaving
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS extractions "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS extractions_last_used ON extractions (last_used)")
+        self.conn.commit()
+
+    def get(self, key):
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM extractions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.conn.execute("UPDATE extractions SET last_used = ? WHERE key = ?", (time(), key))
+            self.conn.commit()
+        return json.loads(row[0])
+
+    def put(self, key, json_obj):
+        value = json.dumps(json_obj, separators=(",", ":"))
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO extractions (key, value, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, value, len(value), time()),
+            )
+            self.evict()
+            self.conn.commit()
+
+    # Drop least recently used entries until the cache fits in max_bytes again; caller holds the lock
+    def evict(self):
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM extractions").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self.conn.execute("SELECT key, size FROM extractions ORDER BY last_used").fetchall():
+            if total <= self.max_bytes:
+                break
+            self.conn.execute("DELETE FROM extractions WHERE key = ?", (key,))
+            total -= size
+            self.evictions += 1
+
+    def stats(self):
+        with self.lock:
+            entries, size = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM extractions").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "entries": entries, "bytes": size}
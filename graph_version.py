@@ -0,0 +1,22 @@
+import os
+import uuid
+
+# Marker that database_gen.py rewrites whenever it changes the graph, so that caches in the app which
+# depend on the graph contents know when to drop their entries.
+
+GRAPH_VERSION_PATH = os.getenv("GRAPH_VERSION_PATH", ".cache/graph_version")
+
+
+def bump_graph_version(path=GRAPH_VERSION_PATH):
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(uuid.uuid4().hex)
+
+
+def read_graph_version(path=GRAPH_VERSION_PATH):
+    try:
+        with open(path, "r") as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return ""
@@ -0,0 +1,91 @@
+import os
+import re
+
+import numpy as np
+
+from embeddings import embed, tokenize
+
+# Local replacement for the QUERY/NOQUERY classification LLM call. A question is routed to the graph when it
+# names an entity from the graph or uses the vocabulary of the domain, and to a conversational reply when it
+# is small talk. When neither rule is clear, a nearest-centroid classifier over the embeddings of a few
+# example questions decides. Every route comes with a confidence; below ROUTER_THRESHOLD the caller should
+# fall back to the LLM classifier. A name on its own isn't clear: technologies are in the graph, but "how do
+# I write a for loop in Python" isn't about who uses Python, so an entity is only confident together with
+# the vocabulary of the domain and without small talk.
+
+ROUTER_THRESHOLD = float(os.getenv("ROUTER_THRESHOLD", "0.7"))
+
+# One of these scores ROUTER_THRESHOLD on its own, so words as common outside the domain as "knowledge",
+# "work", "build" or "using" ("can you summarize what a knowledge graph is") aren't among them
+QUERY_WORDS = {
+    "client", "clients", "colleague", "colleagues", "developer", "developers", "engineer", "engineers", "expert",
+    "experts", "expertise", "experience", "experienced", "familiar", "knows", "know", "message",
+    "messages", "people", "project", "projects", "skill", "skills", "skilled", "slack", "stack", "team",
+    "technologies", "technology", "tech", "used", "uses", "who", "whom", "worked", "working", "works",
+}
+
+CHAT_PATTERNS = [re.compile(pattern) for pattern in [
+    r"^(hi|hello|hey|yo|greetings|good (morning|afternoon|evening))\b",
+    r"\b(thanks|thank you|thx|cheers)\b",
+    r"\bhow are you\b",
+    r"^(bye|goodbye|see you)\b",
+    r"\bwho are you\b",
+    r"\bwhat (can|do) you do\b",
+    r"\b(joke|poem|story|weather)\b",
+    r"\bwhat is your name\b",
+]]
+
+# Seed questions for the embedding classifier
+QUERY_EXAMPLES = [
+    "who knows python", "who has experience with azure", "which projects use aws",
+    "what technologies does the project use", "who worked on the chatbot project",
+    "what skills does she have", "show me slack messages about the deadline",
+    "which clients do we have", "who is on the team for the analytics dashboard",
+    "find someone with machine learning skills", "list all projects for the client",
+]
+NOQUERY_EXAMPLES = [
+    "hello there", "how are you today", "thanks for the help", "tell me a joke",
+    "what can you do", "who are you", "good morning", "what is the capital of france",
+    "explain what a knowledge graph is", "goodbye",
+]
+
+
+class IntentRouter:
+    def __init__(self, use_embeddings=True):
+        self.centroids = None
+        if use_embeddings:
+            self.centroids = {
+                "QUERY": self.centroid(QUERY_EXAMPLES),
+                "NOQUERY": self.centroid(NOQUERY_EXAMPLES),
+            }
+
+    @staticmethod
+    def centroid(examples):
+        vector = np.mean([embed(example) for example in examples], axis=0)
+        return vector / np.linalg.norm(vector)
+
+    # (intent, confidence, reason) for a question; entity_pattern matches the entity names in the graph
+    def route(self, question, entity_pattern=None):
+        text = question.lower().strip()
+        query_hits = len(set(tokenize(text)) & QUERY_WORDS)
+        chat_hits = sum(1 for pattern in CHAT_PATTERNS if pattern.search(text))
+        if entity_pattern is not None and entity_pattern.search(question):
+            if query_hits and not chat_hits:
+                return "QUERY", 0.95, "entity"
+            # Left to the LLM classifier
+            if chat_hits and not query_hits:
+                return "NOQUERY", 0.5, "entity"
+            return "QUERY", 0.6, "entity"
+
+        if chat_hits and query_hits <= 1:
+            return "NOQUERY", min(0.95, 0.7 + 0.1 * chat_hits), "small talk"
+        if query_hits and not chat_hits:
+            return "QUERY", min(0.95, 0.55 + 0.15 * query_hits), "keywords"
+
+        if self.centroids is not None:
+            vector = embed(text)
+            query_score = float(vector @ self.centroids["QUERY"])
+            chat_score = float(vector @ self.centroids["NOQUERY"])
+            intent = "QUERY" if query_score >= chat_score else "NOQUERY"
+            return intent, min(0.95, 0.5 + abs(query_score - chat_score)), "embeddings"
+        return "QUERY", 0.5, "default"
@@ -1,159 +1,12 @@
+import uuid
 import streamlit as st
 from streamlit_chat import message
 from timeit import default_timer as timer
 
-from langchain_community.graphs import Neo4jGraph
-from langchain.chains import GraphCypherQAChain
-from langchain.prompts.prompt import PromptTemplate
-from langchain.chains.llm import LLMChain
-from langchain_ollama import OllamaLLM
-import os
-
-# Initialize LLM
-llm = OllamaLLM(model="llama3.2")
-
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv("neo4j.env")
-
-#Neo4j configuration
-neo4j_url = os.getenv("NEO4J_CONNECTION_URL")
-neo4j_user = os.getenv("NEO4J_USER")
-neo4j_password = os.getenv("NEO4J_PASSWORD")
-
-# Classification prompt
-classification_prompt = PromptTemplate(
-    input_variables=["question"],
-    template="""
-You are a classifier that determines whether a user's question requires querying a Neo4j database.
-If the question is about people, projects, technologies, skills, or Slack messages in the workplace, respond with "QUERY".
-If the question is general, conversational, or doesn't require data lookup, respond with "NOQUERY".
-Only respond with "QUERY" or "NOQUERY".
-
-Question: {question}
-Answer:"""
-)
-classifier_chain = LLMChain(llm=llm, prompt=classification_prompt)
-
-# Cypher generation prompt
-cypher_generation_template = """
-You are an expert Neo4j Cypher translator who converts English to Cypher based on the Neo4j Schema provided, following the instructions below:
-
-DO NOT ANSWER WITH CONVERSATIONAL TEXT IT SHOULD ONLY BE CYPHER QUERIES
-
-1. Generate Cypher query compatible ONLY for Neo4j Version 5
-2. Do not use EXISTS, SIZE, or HAVING keywords in the cypher. Use alias when using the WITH keyword
-3. Use only Nodes and relationships mentioned in the schema
-4. Always do a case-insensitive and fuzzy search for any properties related search. Eg: to search for a Client, use `toLower(client.id) contains 'neo4j'`. To search for Slack Messages, use 'toLower(SlackMessage.text) contains 'neo4j'`. To search for a project, use `toLower(project.summary) contains 'logistics platform' OR toLower(project.name) contains 'logistics platform'`.)
-5. Never use relationships that are not mentioned in the given schema
-6. When asked about projects, Match the properties using case-insensitive matching and the OR-operator, E.g, to find a logistics platform -project, use `toLower(project.summary) contains 'logistics platform' OR toLower(project.name) contains 'logistics platform'`.
-7. When writing `MATCH` or `OPTIONAL MATCH` clauses, always wrap nodes in parentheses. For example:
-    INVALID: OPTIONAL MATCH p<-[:HAS_SKILLS]-(t:Technology)
-    VALID:   OPTIONAL MATCH (p)<-[:HAS_SKILLS]-(t:Technology)
-
-   This applies to all directions of relationships:
-   - (a)-[:REL]->(b)
-   - (a)<-[:REL]-(b)
-   - (a)-[:REL]-(b)
-
-   Never leave a node unwrapped in a pattern.
-
-   8. Ensure all queries ALWAYS end with a RETURN clause like the examples below
-   9. if you are every refering to a name always use the "id" property and not name
-
-schema: {schema}
-
-Use the following examples to guide your Cypher query generation:
-
-If you are going to Query for people's names make sure that for anywhere u are writing the persons name for the cypher query both their first name and last name's first letters are capitalized
-
-2. Projects and Their People/Clients
-------------------------------------
-MATCH (pr:Project)-[:HAS_PEOPLE]->(p:Person)
-RETURN pr.name, p.name
-
-MATCH (pr:Project)-[:HAS_CLIENT]->(c:Client)
-RETURN pr.name, c.name
-
-3. Technologies Used in Projects (Indirectly via People)
----------------------------------------------------------
-MATCH (pr:Project)-[:HAS_PEOPLE]->(p:Person)-[:USES_TECH]->(t:Technology)
-RETURN pr.name, t.name
-
-4. Slack Messages
------------------
-MATCH (m:SlackMessage)
-RETURN m.text
-LIMIT 10
-
-MATCH (m:SlackMessage)
-WHERE toLower(m.text) CONTAINS 'deadline'
-RETURN m.text
-
-5. Clients and Their Projects
------------------------------
-MATCH (c:Client)<-[:HAS_CLIENT]-(pr:Project)
-RETURN c.name, pr.name
-
-6. Advanced Filtering
----------------------
-use this when asked to find technologies or skills for a specific person (e.g., by name for a person named Liam Thompson):
-MATCH (p:Person)-[:HAS_SKILLS]->(t:Technology)
-WHERE toLower(p.name) CONTAINS 'liam thompson'
-RETURN p.name, t.name
-
-if you want to find technologies for a specific project:
-MATCH (p:Project)-[:USES_TECH]->(t:Technology)
-WHERE toLower(p.name) CONTAINS 'api gateway'
-RETURN p.name, t.name
-
-and do not return anything but the cypher query!
-
-
-
-
-
-
-Question: {question}
-"""
-
-
-
-
-cypher_prompt = PromptTemplate(
-    template=cypher_generation_template,
-    input_variables=["schema", "question"]
-)
-
-#QA Prompt
-qa_prompt = PromptTemplate(
-    input_variables=["context", "question"],
-    template="""
-You are an assistant that helps to form nice and human understandable answers based on the question: {question}.
-
-this is a response:
-{context}
-
-your job is to deliver this answer in a human readable way. 
-
-"""
-)
-
-
-# Query function
-def query_graph(user_input):
-    graph = Neo4jGraph(url=neo4j_url, username=neo4j_user, password=neo4j_password)
-    chain = GraphCypherQAChain.from_llm(
-        llm=llm,
-        graph=graph,
-        verbose=True,
-        return_intermediate_steps=True,
-        cypher_prompt=cypher_prompt,
-        qa_prompt=qa_prompt,
-        allow_dangerous_requests=True
-    )
-    return chain(user_input)
+from qa_pipeline import get_resources, get_answer_cache, get_template_cache, get_expertise_index, result_page
+from result_budget import RESULT_PAGE_SIZE
+from scheduler import get_scheduler, QueueFull
+from tracing import Trace, metrics
 
 # Streamlit UI
 st.set_page_config(layout="wide")
@@ -162,6 +15,17 @@ if "user_msgs" not in st.session_state:
     st.session_state.user_msgs = []
 if "system_msgs" not in st.session_state:
     st.session_state.system_msgs = []
+# Questions of one session are queued fairly against those of the others
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+# Page of the last question's database results shown, 0 for the first
+if "result_page" not in st.session_state:
+    st.session_state.result_page = 0
+
+
+def turn_page(step):
+    st.session_state.result_page = max(0, st.session_state.result_page + step)
+
 
 title_col, _, img_col = st.columns([2, 1, 2])
 with title_col:
@@ -169,31 +33,86 @@ with title_col:
 with img_col:
     st.image("haqathon.png", width=500)
 
+# The schema is re-read from Neo4j every SCHEMA_TTL seconds, and on the next question after database_gen.py
+# has changed the graph
+with st.sidebar:
+    if st.button("Refresh graph schema"):
+        get_resources().refresh_schema(force=True)
+        st.success("Schema refreshed")
+    if st.button("Clear answer cache"):
+        get_answer_cache().clear()
+    st.caption(f"Answer cache: {get_answer_cache().stats()}")
+    st.caption(f"Cypher templates: {get_template_cache().stats()}")
+    st.caption(f"Question queue: {get_scheduler().stats()}")
+    # Straight from the expertise index that database_gen.py maintains, no LLM involved
+    technology = st.text_input("Who knows...", placeholder="a technology, e.g. Azure", key="expert_lookup")
+    if technology:
+        experts = get_expertise_index().experts(technology)
+        if experts is None:
+            st.caption(f"No technology called {technology!r} in the graph")
+        else:
+            st.dataframe(experts)
+    st.caption(f"Expertise index: {get_expertise_index().stats()}")
+
 user_input = st.text_input("Enter your question", key="input")
-if user_input:
+# Buttons like the result pager rerun the script, the question is only asked again when it changed
+if user_input and user_input != st.session_state.get("answered_input"):
+    # The answer is shown here token by token while it is generated, then moves into the chat history
+    stream_box = st.empty()
+    streamed = []
+
+    def show_token(token):
+        streamed.append(token)
+        stream_box.markdown("".join(streamed) + "▌")
+
     with st.spinner("Processing your question..."):
         st.session_state.user_msgs.append(user_input)
         start = timer()
+        trace = Trace("question", question=user_input)
+        response = {}
+        job = None
 
         try:
-            classification = classifier_chain.run(user_input).strip().upper()
-            if classification == "QUERY":
-                result = query_graph(user_input)
-                intermediate_steps = result["intermediate_steps"]
-                cypher_query = intermediate_steps[0]["query"]
-                database_results = intermediate_steps[1]["context"]
-                answer = result["result"]
-            else:
-                cypher_query = ""
-                database_results = ""
-                answer = llm.invoke(f"Respond conversationally to: {user_input}")
-
-            st.session_state.system_msgs.append(answer)
+            # All sessions share one queue in front of the LLM; while this question waits, show where it is
+            scheduler = get_scheduler()
+            job = scheduler.submit(user_input, session=st.session_state.session_id)
+            trace = job.trace
+            for kind, value in scheduler.follow(job):
+                if kind == "queued":
+                    stream_box.info(f"Waiting for the assistant: number {value} in the queue")
+                else:
+                    show_token(value)
+            response = job.result
+            st.session_state.system_msgs.append(response["answer"])
+            st.session_state.answered_input = user_input
+            st.session_state.result_page = 0
+        except QueueFull as e:
+            st.session_state.user_msgs.pop()
+            st.warning(f"The assistant is busy right now ({e.waiting} questions waiting). Please try again in a moment.")
         except Exception as e:
             st.write("Failed to process question. Please try again.")
             print(e)
-
-    st.write(f"Time taken: {timer() - start:.2f}s")
+        stream_box.empty()
+
+    time_taken = f"Time taken: {timer() - start:.2f}s"
+    if response.get("time_to_first_token") is not None:
+        time_taken += f" · first token after {response['time_to_first_token']:.2f}s"
+    if job is not None and job.queue_seconds() >= 0.1:
+        time_taken += f" · waited {job.queue_seconds():.2f}s in the queue"
+    st.session_state.last_answer = {"response": response, "trace": trace,
+                                    "time_taken": time_taken + (" (cached answer)" if response.get("cached") else "")}
+
+if user_input and "last_answer" in st.session_state:
+    response = st.session_state.last_answer["response"]
+    trace = st.session_state.last_answer["trace"]
+    cypher_query = response.get("cypher_query")
+    database_results = response.get("database_results")
+    st.write(st.session_state.last_answer["time_taken"])
+    if response.get("route"):
+        st.caption(f"Routed by: {response['route']}")
+    timings = trace.durations()
+    if timings:
+        st.caption(" · ".join(f"{stage} {seconds:.2f}s" for stage, seconds in timings.items()))
 
     col1, col2, col3 = st.columns([1, 1, 1])
     with col1:
@@ -201,8 +120,22 @@ if user_input:
             message(st.session_state["system_msgs"][i], key=str(i) + "_assistant")
             message(st.session_state["user_msgs"][i], is_user=True, key=str(i) + "_user")
     with col2:
-        if 'cypher_query' in locals() and cypher_query:
+        if cypher_query:
             st.text_area("Last Cypher Query", cypher_query, key="_cypher", height=240)
+        # Where the time of the last question went, and the totals of this app process
+        with st.expander("Trace"):
+            st.json(trace.to_dict())
+            st.code(metrics.to_openmetrics(), language="text")
     with col3:
-        if 'database_results' in locals() and database_results:
-            st.text_area("Last Database Results", database_results, key="_database", height=240)
+        if database_results:
+            # The first page came with the answer, later ones are queried when they are asked for
+            page = st.session_state.result_page
+            rows = database_results if page == 0 else result_page(cypher_query, page)
+            first = page * RESULT_PAGE_SIZE + 1
+            st.text_area(f"Last Database Results (rows {first}-{first + len(rows) - 1})", rows, key="_database", height=240)
+            prev_col, next_col = st.columns([1, 1])
+            with prev_col:
+                st.button("Previous", on_click=turn_page, args=(-1,), disabled=page == 0)
+            with next_col:
+                more = response.get("more_results") if page == 0 else len(rows) == RESULT_PAGE_SIZE
+                st.button("Next", on_click=turn_page, args=(1,), disabled=not more)
@@ -0,0 +1,68 @@
+import os
+import json
+import hashlib
+
+# Manifest of what database_gen.py has written to the graph: for every ingested file its content hash
+# and the nodes and relationships it produced. Incremental runs use it to only extract new or changed
+# files and to retract the facts of files that were changed or deleted.
+#
+# Nodes are stored as [label, id] and relationships as [src_label, src_id, type, tgt_label, tgt_id].
+
+MANIFEST_PATH = os.getenv("INGEST_MANIFEST_PATH", ".cache/ingest_manifest.json")
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_manifest(path=MANIFEST_PATH):
+    if not os.path.exists(path):
+        return {"files": {}}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write to a temporary file first so an interrupted run never leaves a half-written manifest
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+# Split the current files into the ones that need extracting and the manifest entries that no longer exist
+def plan_delta(manifest, hashes):
+    changed = [path for path, digest in hashes.items() if manifest["files"].get(path, {}).get("hash") != digest]
+    removed = [path for path in manifest["files"] if path not in hashes]
+    return changed, removed
+
+
+# Facts of the stale files that no other file still claims. A node counts as claimed by a file when the file
+# produced it or one of its relationships points at it, so retracting never cuts another file's relationships.
+def retractions(manifest, stale, new_facts):
+    claimed_nodes = set()
+    claimed_rels = set()
+    owners = [entry for path, entry in manifest["files"].items() if path not in stale] + list(new_facts.values())
+    for entry in owners:
+        claimed_nodes.update(tuple(node) for node in entry["nodes"])
+        for rel in entry["relationships"]:
+            rel = tuple(rel)
+            claimed_rels.add(rel)
+            claimed_nodes.add((rel[0], rel[1]))
+            claimed_nodes.add((rel[3], rel[4]))
+
+    nodes = set()
+    rels = set()
+    for path in stale:
+        entry = manifest["files"].get(path)
+        if entry is None:
+            continue
+        nodes.update(tuple(node) for node in entry["nodes"])
+        rels.update(tuple(rel) for rel in entry["relationships"])
+    return sorted(nodes - claimed_nodes), sorted(rels - claimed_rels)
@@ -0,0 +1,401 @@
+import re
+import threading
+
+from langchain_community.graphs.graph_store import GraphStore
+
+# In-process stand-in for Neo4j, used when GRAPH_BACKEND=memory so ingestion and the question pipeline can be
+# benchmarked without a database. It understands the parameterized UNWIND statements database_gen.py writes,
+# the constraints and full-text indexes it creates, and a small read subset of Cypher:
+#   [CALL db.index.fulltext.queryNodes(index, query) YIELD node AS x[, score]]
+#   [MATCH (a[:Label])[-[:TYPE]->(b[:Label])]] [WHERE ...] ... RETURN [DISTINCT] a.prop [AS alias], ... [SKIP n] [LIMIT n]
+# where a WHERE is made of `x:Label` and `toLower(x.prop) CONTAINS '...'` tests joined by AND/OR. Anything
+# else is counted in `unsupported` and returns no rows.
+
+VALUE = r"(\$\w+|'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\")"
+
+NODE_MERGE = re.compile(r"^UNWIND \$rows AS row MERGE \(n:(\w+) \{id: row\.id\}\)(?: (ON CREATE )?SET n \+= row\.props)?")
+REL_MERGE = re.compile(
+    r"^UNWIND \$rows AS row MERGE \(a:(\w+) \{id: row\.src\}\) MERGE \(b:(\w+) \{id: row\.tgt\}\) MERGE \(a\)-\[:(\w+)\]->\(b\)"
+)
+REL_DELETE = re.compile(
+    r"^UNWIND \$rows AS row MATCH \(a:(\w+) \{id: row\.src\}\)-\[r:(\w+)\]->\(b:(\w+) \{id: row\.tgt\}\) DELETE r"
+)
+NODE_DELETE = re.compile(r"^UNWIND \$rows AS row MATCH \(n:(\w+) \{id: row\.id\}\) DETACH DELETE n")
+CREATE_CONSTRAINT = re.compile(r"^CREATE CONSTRAINT (\w+)(?: IF NOT EXISTS)? FOR \(\w+:(\w+)\) REQUIRE \w+\.(\w+) IS UNIQUE", re.I)
+CREATE_FULLTEXT = re.compile(r"^CREATE FULLTEXT INDEX (\w+)(?: IF NOT EXISTS)? FOR \(\w+:([\w|]+)\) ON EACH \[(.+?)\]", re.I)
+
+CALL_FULLTEXT = re.compile(
+    r"CALL db\.index\.fulltext\.queryNodes\(\s*" + VALUE + r"\s*,\s*" + VALUE + r"\s*\)\s*YIELD node AS (\w+)(?:\s*,\s*score)?\s*",
+    re.I,
+)
+MATCH = re.compile(r"MATCH \((\w+)(?::(\w+))?\)(?:(<)?-\[:(\w+)\]-(>)?\((\w+)(?::(\w+))?\))?\s*", re.I)
+WHERE = re.compile(r"WHERE (.+?)\s*(?=\bMATCH\b|\bRETURN\b)", re.I | re.S)
+RETURN = re.compile(r"RETURN (DISTINCT )?(.+?)(?:\s+SKIP (\d+))?(?:\s+LIMIT (\d+))?\s*;?\s*$", re.I | re.S)
+LABEL_TEST = re.compile(r"^(\w+):(\w+)$")
+CONTAINS_TEST = re.compile(r"^toLower\((\w+)\.(\w+)\)\s+CONTAINS\s+" + VALUE + "$", re.I)
+TOKEN = re.compile(r"[0-9a-z]+")
+
+
+class Unsupported(Exception):
+    pass
+
+
+def tokens(text):
+    return TOKEN.findall(str(text).lower())
+
+
+class MemoryGraph(GraphStore):
+    def __init__(self):
+        self.lock = threading.Lock()
+        # label -> id -> properties
+        self.nodes = {}
+        # type -> {(src_label, src_id, tgt_label, tgt_id)}, with adjacency by type and (label, id) both ways
+        self.edges = {}
+        self.outgoing = {}
+        self.incoming = {}
+        self.constraints = {}
+        # index name -> (labels, properties), and index name -> token -> {(label, id)}
+        self.fulltext = {}
+        self.postings = {}
+        self.statements = 0
+        self.rows_written = 0
+        self.unsupported = 0
+        self.structured_schema = {}
+        self.schema = ""
+        self.refresh_schema()
+
+    # Write side, called by MemorySession
+
+    def add_node(self, label, id, props):
+        self.nodes.setdefault(label, {})[id] = props
+        for name, (labels, keys) in self.fulltext.items():
+            if label in labels:
+                for key in keys:
+                    for token in tokens(props.get(key, "")):
+                        self.postings[name].setdefault(token, set()).add((label, id))
+
+    def update_node(self, label, id, props):
+        old = self.nodes[label][id]
+        for name, (labels, keys) in self.fulltext.items():
+            if label in labels:
+                for key in keys:
+                    for token in tokens(old.get(key, "")):
+                        self.postings[name].get(token, set()).discard((label, id))
+        self.add_node(label, id, {**old, **props})
+
+    def remove_node(self, label, id):
+        props = self.nodes.get(label, {}).pop(id, None)
+        if props is None:
+            return
+        for name, (labels, keys) in self.fulltext.items():
+            if label in labels:
+                for key in keys:
+                    for token in tokens(props.get(key, "")):
+                        self.postings[name].get(token, set()).discard((label, id))
+        for rs_type in list(self.edges):
+            for tgt in self.outgoing[rs_type].pop((label, id), set()):
+                self.incoming[rs_type][tgt].discard((label, id))
+                self.edges[rs_type].discard((label, id) + tgt)
+            for src in self.incoming[rs_type].pop((label, id), set()):
+                self.outgoing[rs_type][src].discard((label, id))
+                self.edges[rs_type].discard(src + (label, id))
+
+    def write(self, query, rows):
+        with self.lock:
+            self.statements += 1
+            self.rows_written += len(rows)
+            match = NODE_MERGE.match(query)
+            if match:
+                label, on_create = match.group(1), match.group(2)
+                sets = match.group(0).endswith("row.props")
+                for row in rows:
+                    props = (row.get("props") or {}) if sets else {}
+                    if row["id"] not in self.nodes.get(label, {}):
+                        self.add_node(label, row["id"], {"id": row["id"], **props})
+                    elif sets and not on_create:
+                        self.update_node(label, row["id"], props)
+                return
+            match = REL_MERGE.match(query)
+            if match:
+                src_label, tgt_label, rs_type = match.groups()
+                edges = self.edges.setdefault(rs_type, set())
+                outgoing = self.outgoing.setdefault(rs_type, {})
+                incoming = self.incoming.setdefault(rs_type, {})
+                for row in rows:
+                    for label, id in ((src_label, row["src"]), (tgt_label, row["tgt"])):
+                        if id not in self.nodes.get(label, {}):
+                            self.add_node(label, id, {"id": id})
+                    edges.add((src_label, row["src"], tgt_label, row["tgt"]))
+                    outgoing.setdefault((src_label, row["src"]), set()).add((tgt_label, row["tgt"]))
+                    incoming.setdefault((tgt_label, row["tgt"]), set()).add((src_label, row["src"]))
+                return
+            match = REL_DELETE.match(query)
+            if match:
+                src_label, rs_type, tgt_label = match.groups()
+                for row in rows:
+                    src, tgt = (src_label, row["src"]), (tgt_label, row["tgt"])
+                    self.edges.get(rs_type, set()).discard(src + tgt)
+                    self.outgoing.get(rs_type, {}).get(src, set()).discard(tgt)
+                    self.incoming.get(rs_type, {}).get(tgt, set()).discard(src)
+                return
+            match = NODE_DELETE.match(query)
+            if match:
+                for row in rows:
+                    self.remove_node(match.group(1), row["id"])
+                return
+            self.unsupported += 1
+
+    # Schema statements, run outside of write transactions as in Neo4j
+    def create(self, query):
+        with self.lock:
+            self.statements += 1
+            match = CREATE_CONSTRAINT.match(query)
+            if match:
+                name, label, key = match.groups()
+                self.constraints.setdefault(name, (label, key))
+                return
+            match = CREATE_FULLTEXT.match(query)
+            if match and match.group(1) not in self.fulltext:
+                name, labels, keys = match.group(1), match.group(2).split("|"), [key.strip().split(".")[-1] for key in match.group(3).split(",")]
+                self.fulltext[name] = (labels, keys)
+                self.postings[name] = {}
+                for label in labels:
+                    for id, props in self.nodes.get(label, {}).items():
+                        for key in keys:
+                            for token in tokens(props.get(key, "")):
+                                self.postings[name].setdefault(token, set()).add((label, id))
+                return
+            if not match:
+                self.unsupported += 1
+
+    # Read side, the parts of Neo4jGraph the question pipeline uses
+
+    def query(self, query, params=None):
+        params = params or {}
+        query = " ".join(query.split())
+        with self.lock:
+            if "labels(n)" in query and "labels" in params:
+                return [{"label": label, "id": props.get("id"), "name": props["name"]}
+                        for label in params["labels"] for props in self.nodes.get(label, {}).values() if "name" in props]
+            try:
+                return self.run_read(query, params)
+            except Unsupported:
+                self.unsupported += 1
+                return []
+
+    @staticmethod
+    def value(token, params):
+        if token.startswith("$"):
+            return params.get(token[1:])
+        return token[1:-1].replace("\\'", "'").replace('\\"', '"').replace("\\\\", "\\")
+
+    # Index hits ranked like Lucene's OR query: the more query tokens a node has, the higher it scores
+    def search(self, index, text):
+        if index not in self.postings:
+            raise Unsupported(index)
+        scores = {}
+        for token in set(tokens(text)):
+            for key in self.postings[index].get(token, ()):
+                scores[key] = scores.get(key, 0) + 1
+        return sorted(scores, key=lambda key: -scores[key])
+
+    def condition(self, text, params):
+        alternatives = []
+        for alternative in re.split(r"\s+OR\s+", text.strip().strip("()"), flags=re.I):
+            tests = []
+            for test in re.split(r"\s+AND\s+", alternative.strip().strip("()"), flags=re.I):
+                test = test.strip().strip("()")
+                label_test = LABEL_TEST.match(test)
+                contains_test = CONTAINS_TEST.match(test)
+                if label_test:
+                    tests.append(("label",) + label_test.groups())
+                elif contains_test:
+                    var, key, needle = contains_test.groups()
+                    tests.append(("contains", var, key, str(self.value(needle, params)).lower()))
+                else:
+                    raise Unsupported(test)
+            alternatives.append(tests)
+
+        def keep(bindings):
+            for tests in alternatives:
+                ok = True
+                for kind, var, a, *b in tests:
+                    if var not in bindings:
+                        raise Unsupported(var)
+                    label, _, props = bindings[var]
+                    if kind == "label" and label != a or kind == "contains" and b[0] not in str(props.get(a, "")).lower():
+                        ok = False
+                        break
+                if ok:
+                    return True
+            return False
+        return keep
+
+    def expand(self, bindings, match):
+        a_var, a_label, left, rs_type, right, b_var, b_label = match.groups()
+        if rs_type is None:
+            if a_var in bindings:
+                if a_label is None or bindings[a_var][0] == a_label:
+                    yield bindings
+                return
+            for id, props in self.nodes.get(a_label, {}).items():
+                yield {**bindings, a_var: (a_label, id, props)}
+            return
+        # (a)<-[:T]-(b) is the same as (b)-[:T]->(a)
+        src_var, src_label, tgt_var, tgt_label = (b_var, b_label, a_var, a_label) if left else (a_var, a_label, b_var, b_label)
+
+        def node(var, label, id):
+            return var, (label, id, self.nodes.get(label, {}).get(id, {}))
+
+        if src_var in bindings:
+            src = bindings[src_var][:2]
+            pairs = ((src, tgt) for tgt in self.outgoing.get(rs_type, {}).get(src, ()))
+        elif tgt_var in bindings:
+            tgt = bindings[tgt_var][:2]
+            pairs = ((src, tgt) for src in self.incoming.get(rs_type, {}).get(tgt, ()))
+        else:
+            pairs = (((sl, sid), (tl, tid)) for sl, sid, tl, tid in self.edges.get(rs_type, ()))
+        for (sl, sid), (tl, tid) in pairs:
+            if (src_label and sl != src_label) or (tgt_label and tl != tgt_label):
+                continue
+            if src_var in bindings and bindings[src_var][:2] != (sl, sid) or tgt_var in bindings and bindings[tgt_var][:2] != (tl, tid):
+                continue
+            yield {**bindings, **dict([node(src_var, sl, sid), node(tgt_var, tl, tid)])}
+
+    def expand_all(self, rows, match):
+        for bindings in rows:
+            yield from self.expand(bindings, match)
+
+    def run_read(self, query, params):
+        rows = iter([{}])
+        position = 0
+        match = CALL_FULLTEXT.match(query, position)
+        if match:
+            index, text, var = self.value(match.group(1), params), self.value(match.group(2), params), match.group(3)
+            hits = [(label, id, self.nodes[label][id]) for label, id in self.search(index, text)]
+            rows = iter([{var: hit} for hit in hits])
+            position = match.end()
+        while True:
+            match = MATCH.match(query, position)
+            if match:
+                rows = self.expand_all(rows, match)
+                position = match.end()
+                continue
+            match = WHERE.match(query, position)
+            if match:
+                keep = self.condition(match.group(1), params)
+                rows = filter(keep, rows)
+                position = match.end()
+                continue
+            break
+        match = RETURN.match(query, position)
+        if not match:
+            raise Unsupported(query[position:])
+        distinct, returns, skip, limit = match.groups()
+        skip = int(skip or 0)
+        items = []
+        for item in returns.split(","):
+            expression, _, alias = item.strip().partition(" AS ")
+            var, _, key = expression.strip().partition(".")
+            items.append((alias.strip() or item.strip(), var, key))
+
+        results = []
+        seen = set()
+        for bindings in rows:
+            row = {}
+            for name, var, key in items:
+                if var not in bindings:
+                    raise Unsupported(var)
+                row[name] = bindings[var][2].get(key) if key else bindings[var][2]
+            if distinct:
+                marker = repr(sorted(row.items()))
+                if marker in seen:
+                    continue
+                seen.add(marker)
+            if skip:
+                skip -= 1
+                continue
+            results.append(row)
+            if limit and len(results) >= int(limit):
+                break
+        return results
+
+    def refresh_schema(self):
+        with self.lock:
+            node_props = {
+                label: [{"property": key, "type": "STRING"} for key in sorted({key for props in nodes.values() for key in props})]
+                for label, nodes in self.nodes.items()
+            }
+            relationships = sorted({(src_label, rs_type, tgt_label)
+                                    for rs_type, edges in self.edges.items() for src_label, _, tgt_label, _ in edges})
+            constraints = [{"name": name, "labelsOrTypes": [label], "properties": [key]}
+                           for name, (label, key) in self.constraints.items()]
+            indexes = [{"name": name, "type": "FULLTEXT", "labelsOrTypes": labels, "properties": keys}
+                       for name, (labels, keys) in self.fulltext.items()]
+        self.structured_schema = {
+            "node_props": node_props,
+            "rel_props": {},
+            "relationships": [{"start": start, "type": rs_type, "end": end} for start, rs_type, end in relationships],
+            "metadata": {"constraint": constraints, "index": indexes},
+        }
+        self.schema = "\n".join(
+            ["Node properties:"]
+            + [f"{label} {{{', '.join(prop['property'] + ': STRING' for prop in props)}}}" for label, props in node_props.items()]
+            + ["Relationship properties:", "", "The relationships:"]
+            + [f"(:{start})-[:{rs_type}]->(:{end})" for start, rs_type, end in relationships]
+        )
+
+    @property
+    def get_schema(self):
+        return self.schema
+
+    @property
+    def get_structured_schema(self):
+        return self.structured_schema
+
+    def add_graph_documents(self, graph_documents, include_source=False):
+        raise NotImplementedError
+
+
+# Driver, session and result with the same shape as the neo4j ones database_gen.py uses
+class MemoryResult:
+    def __init__(self, records):
+        self.records = records
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def consume(self):
+        return None
+
+
+class MemorySession:
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute_write(self, fn, query, rows):
+        self.graph.write(query, rows)
+
+    def run(self, query, parameters=None, **kwargs):
+        if query.lstrip().upper().startswith("CREATE"):
+            self.graph.create(query)
+            return MemoryResult([])
+        return MemoryResult(self.graph.query(query, {**(parameters or {}), **kwargs}))
+
+
+class MemoryDriver:
+    def __init__(self, graph):
+        self.graph = graph
+
+    def session(self, **kwargs):
+        return MemorySession(self.graph)
+
+
+# One graph per process, shared by ingestion and the question pipeline
+GRAPH = MemoryGraph()
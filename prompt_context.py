@@ -0,0 +1,178 @@
+import os
+import re
+
+import numpy as np
+
+from embeddings import embed, similarities, tokenize
+
+# The variable part of the Cypher generation prompt. Instead of the whole schema and every example on every
+# call, the prompt gets
+#   - the part of the schema about the labels the question is about: the labels of the entities named in
+#     it, the labels its words point to ("skills" -> Technology, "who" -> Person) and the labels that link
+#     two of those when they have no relationship of their own. Relationships are kept when both ends are.
+#     A question that points to no label at all gets the whole schema
+#   - the CYPHER_EXAMPLES_K examples whose questions are most similar to it, from an embedding index over
+#     EXAMPLES. Examples that only use the kept labels come first
+# PROMPT_PRUNING=0 sends the whole schema and every example, as before.
+
+CYPHER_EXAMPLES_K = int(os.getenv("CYPHER_EXAMPLES_K", "3"))
+PROMPT_PRUNING = os.getenv("PROMPT_PRUNING", "1") != "0"
+
+# Question words -> the labels they are about
+LABEL_WORDS = {
+    "Person": {"who", "whom", "whose", "people", "person", "persons", "colleague", "colleagues", "developer",
+               "developers", "engineer", "engineers", "someone", "anyone", "member", "members", "employee",
+               "employees", "staff", "team", "expert", "experts"},
+    "Technology": {"skill", "skills", "skilled", "technology", "technologies", "tech", "stack", "know", "knows",
+                   "knowledge", "experience", "experienced", "expertise", "familiar", "tool", "tools", "language",
+                   "languages", "framework", "frameworks", "use", "uses", "used", "using"},
+    "Project": {"project", "projects", "worked", "work", "works", "working", "built", "build", "building",
+                "product", "products", "platform", "delivered"},
+    "Client": {"client", "clients", "customer", "customers", "industry", "industries", "company", "companies"},
+    "SlackMessage": {"message", "messages", "slack", "said", "say", "says", "talked", "talk", "mentioned",
+                     "mention", "mentions", "discussed", "wrote", "sent", "chat"},
+}
+
+# Few-shot examples for the Cypher generation prompt
+EXAMPLES = [
+    {"question": "Which people work on which projects?",
+     "cypher": "MATCH (pr:Project)-[:HAS_PEOPLE]->(p:Person)\nRETURN pr.name, p.name"},
+    {"question": "Which clients are the projects for?",
+     "cypher": "MATCH (pr:Project)-[:HAS_CLIENT]->(c:Client)\nRETURN pr.name, c.name"},
+    {"question": "Which projects has each client had?",
+     "cypher": "MATCH (c:Client)<-[:HAS_CLIENT]-(pr:Project)\nRETURN c.name, pr.name"},
+    {"question": "Which technologies are used in which projects?",
+     "cypher": "MATCH (pr:Project)-[:USES_TECH]->(t:Technology)\nRETURN pr.name, t.name"},
+    {"question": "What technologies do the people on each project know?",
+     "cypher": "MATCH (pr:Project)-[:HAS_PEOPLE]->(p:Person)-[:HAS_SKILLS]->(t:Technology)\nRETURN pr.name, t.name"},
+    {"question": "Show me some Slack messages",
+     "cypher": "MATCH (m:SlackMessage)\nRETURN m.text\nLIMIT 10"},
+    {"question": "Find Slack messages about the deadline",
+     "cypher": "CALL db.index.fulltext.queryNodes('slack_text', 'deadline') YIELD node AS m\n"
+               "WHERE toLower(m.text) CONTAINS 'deadline'\nRETURN m.text"},
+    {"question": "Who talked about the data migration?",
+     "cypher": "CALL db.index.fulltext.queryNodes('slack_text', 'data migration') YIELD node AS m\n"
+               "WHERE toLower(m.text) CONTAINS 'data migration'\nMATCH (p:Person)-[:SENT]->(m)\nRETURN p.name, m.text"},
+    {"question": "What did Sarah Johnson say on Slack?",
+     "cypher": "CALL db.index.fulltext.queryNodes('entity_names', 'sarah johnson') YIELD node AS p\n"
+               "WHERE p:Person AND toLower(p.name) CONTAINS 'sarah johnson'\nMATCH (p)-[:SENT]->(m:SlackMessage)\nRETURN m.text"},
+    {"question": "What skills does Liam Thompson have?",
+     "cypher": "CALL db.index.fulltext.queryNodes('entity_names', 'liam thompson') YIELD node AS p\n"
+               "WHERE p:Person AND toLower(p.name) CONTAINS 'liam thompson'\nMATCH (p)-[:HAS_SKILLS]->(t:Technology)\n"
+               "RETURN p.name, t.name"},
+    {"question": "Who knows Python?",
+     "cypher": "CALL db.index.fulltext.queryNodes('entity_names', 'python') YIELD node AS t\n"
+               "WHERE t:Technology AND toLower(t.name) CONTAINS 'python'\nMATCH (p:Person)-[:HAS_SKILLS]->(t)\n"
+               "RETURN p.name, t.name"},
+    {"question": "Which projects has Liam Thompson worked on?",
+     "cypher": "CALL db.index.fulltext.queryNodes('entity_names', 'liam thompson') YIELD node AS p\n"
+               "WHERE p:Person AND toLower(p.name) CONTAINS 'liam thompson'\nMATCH (pr:Project)-[:HAS_PEOPLE]->(p)\n"
+               "RETURN pr.name"},
+    {"question": "Who worked on the logistics platform?",
+     "cypher": "CALL db.index.fulltext.queryNodes('project_summaries', 'logistics platform') YIELD node AS pr\n"
+               "WHERE toLower(pr.name) CONTAINS 'logistics platform' OR toLower(pr.summary) CONTAINS 'logistics platform'\n"
+               "MATCH (pr)-[:HAS_PEOPLE]->(p:Person)\nRETURN pr.name, p.name"},
+    {"question": "Which technologies does the API Gateway project use?",
+     "cypher": "CALL db.index.fulltext.queryNodes('project_summaries', 'api gateway') YIELD node AS pr\n"
+               "WHERE toLower(pr.name) CONTAINS 'api gateway' OR toLower(pr.summary) CONTAINS 'api gateway'\n"
+               "MATCH (pr)-[:USES_TECH]->(t:Technology)\nRETURN pr.name, t.name"},
+    {"question": "Which clients do we have?",
+     "cypher": "MATCH (c:Client)\nRETURN c.name, c.industry"},
+    {"question": "Which projects did we do for AlphaCorp?",
+     "cypher": "CALL db.index.fulltext.queryNodes('entity_names', 'alphacorp') YIELD node AS c\n"
+               "WHERE c:Client AND toLower(c.name) CONTAINS 'alphacorp'\nMATCH (pr:Project)-[:HAS_CLIENT]->(c)\n"
+               "RETURN c.name, pr.name"},
+    {"question": "Which clients are in healthcare?",
+     "cypher": "MATCH (c:Client)\nWHERE toLower(c.industry) CONTAINS 'healthcare'\nRETURN c.name, c.industry"},
+]
+
+CYPHER_LABEL = re.compile(r":(\w+)\)")
+SLOT = re.compile(r"([a-z]+)slot\d+")
+
+
+def example_labels(cypher):
+    return set(CYPHER_LABEL.findall(cypher))
+
+
+def format_examples(examples):
+    return "\n\n".join(f"// {example['question']}\n{example['cypher']}" for example in examples)
+
+
+# The schema in the format GraphCypherQAChain gives the prompt
+def format_schema(structured_schema):
+    node_props = [f"{label} {{{', '.join(prop['property'] + ': ' + prop['type'] for prop in props)}}}"
+                  for label, props in structured_schema.get("node_props", {}).items()]
+    rel_props = [f"{rs_type} {{{', '.join(prop['property'] + ': ' + prop['type'] for prop in props)}}}"
+                 for rs_type, props in structured_schema.get("rel_props", {}).items()]
+    relationships = [f"(:{rel['start']})-[:{rel['type']}]->(:{rel['end']})"
+                     for rel in structured_schema.get("relationships", [])]
+    return "\n".join([
+        "Node properties are the following:",
+        ",".join(node_props),
+        "Relationship properties are the following:",
+        ",".join(rel_props),
+        "The relationships are the following:",
+        ",".join(relationships),
+    ])
+
+
+# Labels a question is about, from the entities masked in it and its words
+def question_labels(question, slots=()):
+    words = set(tokenize(question))
+    labels = {entity["label"] for entity in slots}
+    labels.update(label for label, label_words in LABEL_WORDS.items() if words & label_words)
+    return labels
+
+
+# The schema restricted to labels and the labels that link two of them, or None when nothing is left
+def prune_schema(structured_schema, labels):
+    relationships = structured_schema.get("relationships", [])
+    keep = set(labels) & set(structured_schema.get("node_props", {}))
+    if not keep:
+        return None
+    linked = {(rel["start"], rel["end"]) for rel in relationships} | {(rel["end"], rel["start"]) for rel in relationships}
+    neighbours = {}
+    for a, b in linked:
+        neighbours.setdefault(a, set()).add(b)
+    for a in list(keep):
+        for b in list(keep):
+            if a < b and (a, b) not in linked:
+                keep.update(neighbours.get(a, set()) & neighbours.get(b, set()))
+    kept_relationships = [rel for rel in relationships if rel["start"] in keep and rel["end"] in keep]
+    kept_types = {rel["type"] for rel in kept_relationships}
+    return {
+        "node_props": {label: props for label, props in structured_schema["node_props"].items() if label in keep},
+        "rel_props": {rs_type: props for rs_type, props in structured_schema.get("rel_props", {}).items()
+                      if rs_type in kept_types},
+        "relationships": kept_relationships,
+    }
+
+
+# Embedding index over the example questions
+class ExampleStore:
+    def __init__(self, examples=EXAMPLES):
+        self.examples = list(examples)
+        self.labels = [example_labels(example["cypher"]) for example in self.examples]
+        self.matrix = np.array([embed(example["question"]) for example in self.examples], dtype=np.float32)
+
+    # The k examples closest to the question, the ones within labels first when labels are given
+    def top_k(self, question, k=CYPHER_EXAMPLES_K, labels=None):
+        scores = similarities(embed(question), self.matrix)
+        order = sorted(range(len(self.examples)),
+                       key=lambda i: (labels is not None and not self.labels[i] <= labels, -scores[i]))
+        return [self.examples[i] for i in order[:k]]
+
+
+# {"schema", "examples"} for the Cypher generation prompt of a question. masked is the question with its
+# entities masked as mask_entities returns it, slots the masked entities
+def cypher_prompt_args(question, masked, slots, structured_schema, full_schema, store, pruning=PROMPT_PRUNING,
+                       k=CYPHER_EXAMPLES_K):
+    if not pruning:
+        return {"schema": full_schema, "examples": format_examples(store.examples)}
+    # "what skills does personslot1 have" -> "what skills does person have"
+    text = SLOT.sub(r"\1", masked)
+    labels = question_labels(text, slots)
+    pruned = prune_schema(structured_schema, labels)
+    if pruned is None:
+        return {"schema": full_schema, "examples": format_examples(store.top_k(text, k))}
+    return {"schema": format_schema(pruned), "examples": format_examples(store.top_k(text, k, set(pruned["node_props"])))}
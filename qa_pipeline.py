@@ -0,0 +1,442 @@
+import os
+import re
+import threading
+from functools import lru_cache
+from timeit import default_timer as timer
+
+from langchain_community.graphs import Neo4jGraph
+from langchain.chains import GraphCypherQAChain
+from langchain_community.chains.graph_qa.cypher import extract_cypher
+from langchain.prompts.prompt import PromptTemplate
+from langchain.chains.llm import LLMChain
+from langchain_ollama import OllamaLLM
+
+from answer_cache import AnswerCache
+from stream_reader import estimate_tokens
+from tracing import Trace, export_jsonl
+from intent_router import IntentRouter, ROUTER_THRESHOLD
+from cypher_cache import CypherTemplateCache, load_entity_vocabulary, entity_pattern, mask_entities, render
+from prompt_context import ExampleStore, cypher_prompt_args
+from result_budget import fetch_rows, qa_context, RESULT_PAGE_SIZE
+from expertise_index import ExpertiseIndex
+from graph_version import read_graph_version
+
+# Question answering over the knowledge graph, shared by every Streamlit session of main.py
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv("neo4j.env")
+
+# Initialize LLM. LLM_STUB=1 answers with canned Cypher and text instead, for offline benchmarks
+if os.getenv("LLM_STUB"):
+    from stub_llm import StubLLM
+    llm = StubLLM()
+else:
+    llm = OllamaLLM(model="llama3.2")
+
+#Neo4j configuration
+neo4j_url = os.getenv("NEO4J_CONNECTION_URL")
+neo4j_user = os.getenv("NEO4J_USER")
+neo4j_password = os.getenv("NEO4J_PASSWORD")
+# GRAPH_BACKEND=memory queries the in-process graph of memory_graph.py instead of Neo4j, for offline benchmarks
+GRAPH_BACKEND = os.getenv("GRAPH_BACKEND", "neo4j")
+
+# Seconds before the graph schema is introspected again; it only changes when the graph is re-ingested
+SCHEMA_TTL = float(os.getenv("SCHEMA_TTL", "600"))
+
+# EXPERTISE_INDEX=0 has the LLM write Cypher for expertise questions too instead of looking them up
+EXPERTISE_INDEX = os.getenv("EXPERTISE_INDEX", "1") != "0"
+
+# Expertise questions the index answers, matched on the question with its one entity masked: who knows a
+# technology, and what a person knows
+EXPERTS_QUESTIONS = [re.compile(pattern) for pattern in [
+    r"\b(who|whom|which (people|person|colleagues?|developers?|engineers?)|anyone|someone|people)\b.*"
+    r"\b(knows?|experience|experienced|expert|experts|expertise|skilled|skills?|good at|familiar|proficient|help|uses?|using)\b"
+    r".*\btechnologyslot1\b",
+    r"\b(experts?|specialists?) (in|on|for|with) technologyslot1\b",
+    r"\btechnologyslot1 (experts?|specialists?|people|developers?|engineers?)\b",
+]]
+# Only questions shaped like one about the person's skills: "what skills does X have", "which technologies
+# has X used", "X's skills", "the expertise of X", "what is X good at"
+SKILLS_QUESTIONS = [re.compile(pattern) for pattern in [
+    r"\b(what|which) (skills?|technologies|tech|tech stack|expertise) (does|do|did|has|have) personslot1 "
+    r"(have|has|know|use|used|bring)\b",
+    r"\bpersonslot1 s (skills?|skill set|technologies|tech stack|expertise)\b",
+    r"\b(skills?|skill set|technologies|tech stack|expertise) of personslot1\b",
+    r"\bwhat (is|are) personslot1 (good at|skilled in|experienced in|an expert in)\b",
+    r"\bwhat does personslot1 know$",
+]]
+# "who doesn't know Azure" or "which technologies has Liam Thompson never used" match the patterns above too,
+# but the index only knows who does. Negated questions go to the LLM
+NEGATION = re.compile(r"\b(not|never|without|lack|lacks|lacking|cannot)\b|n['’]t\b", re.IGNORECASE)
+# Nor is "what did Sarah Johnson say about the tools we use", which is about her Slack messages
+MESSAGES = re.compile(r"\b(messages?|slack|say|says|said|sent|send|posted|wrote)\b", re.IGNORECASE)
+
+# Classification prompt
+classification_prompt = PromptTemplate(
+    input_variables=["question"],
+    template="""
+You are a classifier that determines whether a user's question requires querying a Neo4j database.
+If the question is about people, projects, technologies, skills, or Slack messages in the workplace, respond with "QUERY".
+If the question is general, conversational, or doesn't require data lookup, respond with "NOQUERY".
+Only respond with "QUERY" or "NOQUERY".
+
+Question: {question}
+Answer:"""
+)
+classifier_chain = LLMChain(llm=llm, prompt=classification_prompt)
+
+# Cypher generation prompt
+cypher_generation_template = """
+You are an expert Neo4j Cypher translator who converts English to Cypher based on the Neo4j Schema provided, following the instructions below:
+
+DO NOT ANSWER WITH CONVERSATIONAL TEXT IT SHOULD ONLY BE CYPHER QUERIES
+
+1. Generate Cypher query compatible ONLY for Neo4j Version 5
+2. Do not use EXISTS, SIZE, or HAVING keywords in the cypher. Use alias when using the WITH keyword
+3. Use only Nodes and relationships mentioned in the schema
+4. Always look entities up through the full-text indexes instead of scanning every node: `entity_names` (name of Person, Project, Technology and Client), `project_summaries` (name and summary of Project) and `slack_text` (text of SlackMessage). Search for the lowercase words of the question without the characters + - ! ( ) : ^ [ ] " ~ * ? \\ /, and keep a case-insensitive check on the hits. Eg: to search for a Client, use `CALL db.index.fulltext.queryNodes('entity_names', 'neo4j') YIELD node AS client WHERE client:Client AND toLower(client.name) contains 'neo4j'`. To search for Slack Messages, use `CALL db.index.fulltext.queryNodes('slack_text', 'neo4j') YIELD node AS m WHERE toLower(m.text) contains 'neo4j'`.
+5. Never use relationships that are not mentioned in the given schema
+6. When asked about projects, search the `project_summaries` index and check both properties with the OR-operator, E.g, to find a logistics platform -project, use `CALL db.index.fulltext.queryNodes('project_summaries', 'logistics platform') YIELD node AS project WHERE toLower(project.summary) contains 'logistics platform' OR toLower(project.name) contains 'logistics platform'`.
+7. When writing `MATCH` or `OPTIONAL MATCH` clauses, always wrap nodes in parentheses. For example:
+    INVALID: OPTIONAL MATCH p<-[:HAS_SKILLS]-(t:Technology)
+    VALID:   OPTIONAL MATCH (p)<-[:HAS_SKILLS]-(t:Technology)
+
+   This applies to all directions of relationships:
+   - (a)-[:REL]->(b)
+   - (a)<-[:REL]-(b)
+   - (a)-[:REL]-(b)
+
+   Never leave a node unwrapped in a pattern.
+
+   8. Ensure all queries ALWAYS end with a RETURN clause like the examples below
+   9. if you are every refering to a name always search for it through the full-text index as in 4.
+
+schema: {schema}
+
+Use the following examples to guide your Cypher query generation:
+
+If you are going to Query for people's names make sure that for anywhere u are writing the persons name for the cypher query both their first name and last name's first letters are capitalized
+
+{examples}
+
+and do not return anything but the cypher query!
+
+
+
+
+
+
+Question: {question}
+"""
+
+
+
+
+cypher_prompt = PromptTemplate(
+    template=cypher_generation_template,
+    input_variables=["schema", "examples", "question"]
+)
+
+#QA Prompt
+qa_prompt = PromptTemplate(
+    input_variables=["context", "question"],
+    template="""
+You are an assistant that helps to form nice and human understandable answers based on the question: {question}.
+
+this is a response:
+{context}
+
+your job is to deliver this answer in a human readable way. 
+
+"""
+)
+
+
+
+# The graph client (and its driver pool) and the chain built on top of it are created once per process and
+# shared by all sessions. lru_cache rather than st.cache_resource, so scripts and benchmarks that import this
+# module outside of a Streamlit run share them too. The chain holds a copy of the schema, so it is rebuilt whenever the schema is refreshed.
+class GraphResources:
+    def __init__(self):
+        self.lock = threading.Lock()
+        if GRAPH_BACKEND == "memory":
+            from memory_graph import GRAPH
+            self.graph = GRAPH
+            self.graph.refresh_schema()
+        else:
+            self.graph = Neo4jGraph(url=neo4j_url, username=neo4j_user, password=neo4j_password)
+        self.chain = self.build_chain()
+        self.load_vocabulary()
+        self.refreshed_at = timer()
+        self.version = read_graph_version()
+
+    # Names of the entities in the graph, used to mask them in questions
+    def load_vocabulary(self):
+        self.vocabulary = load_entity_vocabulary(self.graph)
+        self.entity_pattern = entity_pattern(self.vocabulary)
+
+    def build_chain(self):
+        return GraphCypherQAChain.from_llm(
+            llm=llm,
+            graph=self.graph,
+            verbose=True,
+            return_intermediate_steps=True,
+            cypher_prompt=cypher_prompt,
+            qa_prompt=qa_prompt,
+            allow_dangerous_requests=True
+        )
+
+    # Re-introspect the schema and entity names when forced, when database_gen.py has changed the graph since,
+    # or when they are older than SCHEMA_TTL
+    def refresh_schema(self, force=False):
+        with self.lock:
+            version = read_graph_version()
+            if not force and version == self.version and timer() - self.refreshed_at < SCHEMA_TTL:
+                return False
+            self.graph.refresh_schema()
+            self.chain = self.build_chain()
+            self.load_vocabulary()
+            self.refreshed_at = timer()
+            self.version = version
+            return True
+
+
+@lru_cache(maxsize=None)
+def get_resources():
+    return GraphResources()
+
+
+@lru_cache(maxsize=None)
+def get_template_cache():
+    return CypherTemplateCache()
+
+
+@lru_cache(maxsize=None)
+def get_example_store():
+    return ExampleStore()
+
+
+# Reloads itself when database_gen.py has changed the graph
+@lru_cache(maxsize=None)
+def get_expertise_index():
+    return ExpertiseIndex()
+
+
+@lru_cache(maxsize=None)
+def get_router():
+    return IntentRouter()
+
+
+# Answers are shared between sessions, the same few questions get asked by everyone
+@lru_cache(maxsize=None)
+def get_answer_cache():
+    return AnswerCache()
+
+
+# The graph entities a question names, a cached answer is only reused for a question about the same ones
+def question_entities(question):
+    resources = get_resources()
+    return mask_entities(question, resources.vocabulary, resources.entity_pattern)[1]
+
+
+# Generate with the llm token by token, handing every token to on_token as it arrives.
+# Token counts are added to span when one is given
+def stream_llm(prompt, on_token=None, span=None):
+    parts = []
+    for token in llm.stream(prompt):
+        parts.append(token)
+        if on_token:
+            on_token(token)
+    if span is not None:
+        span["prompt_tokens"] = estimate_tokens(prompt)
+        span["output_tokens"] = len(parts)
+    return "".join(parts)
+
+
+# The database results as a plain list, for when there is no time to have the LLM phrase them
+def plain_answer(context, summary=None):
+    if not context:
+        return "I couldn't find anything in the knowledge graph for that."
+    lines = [", ".join(str(value) for value in row.values()) for row in context]
+    answer = "Here is what the knowledge graph has:\n" + "\n".join(f"- {line}" for line in lines)
+    return answer + (f"\n\n{summary}" if summary else "")
+
+
+# (entity, rows) when the question is an expertise question the index has an answer for, None otherwise
+def expertise_lookup(user_input):
+    if not EXPERTISE_INDEX or NEGATION.search(user_input) or MESSAGES.search(user_input):
+        return None
+    resources = get_resources()
+    masked, slots = mask_entities(user_input, resources.vocabulary, resources.entity_pattern)
+    if len(slots) != 1:
+        return None
+    entity = slots[0]
+    key = entity["id"] or entity["name"]
+    if entity["label"] == "Technology" and any(pattern.search(masked) for pattern in EXPERTS_QUESTIONS):
+        rows = get_expertise_index().experts(key, RESULT_PAGE_SIZE)
+    elif entity["label"] == "Person" and any(pattern.search(masked) for pattern in SKILLS_QUESTIONS):
+        rows = get_expertise_index().expertise(key, RESULT_PAGE_SIZE)
+    else:
+        return None
+    return (entity, rows) if rows else None
+
+
+# Answer text for the rows of the expertise index, without the LLM
+def expertise_answer(entity, rows):
+    lines = []
+    for row in rows:
+        reasons = ["lists it as a skill"] if row["skill"] else []
+        if row["projects"]:
+            reasons.append(f"{row['projects']} project{'s' if row['projects'] != 1 else ''} using it")
+        if row["mentions"]:
+            reasons.append(f"{row['mentions']} Slack message{'s' if row['mentions'] != 1 else ''} about it")
+        lines.append(f"- {row.get('person') or row.get('technology')}: {', '.join(reasons)}")
+    if entity["label"] == "Technology":
+        head = f"People who know {entity['name']}, best first:"
+    else:
+        head = f"What {entity['name']} knows, best first:"
+    return head + "\n" + "\n".join(lines)
+
+
+# One page of the results of a query the pipeline answered with, for paging through them in the UI
+def result_page(cypher, page, page_size=RESULT_PAGE_SIZE):
+    rows, _ = fetch_rows(get_resources().graph, cypher, skip=page * page_size, max_rows=page_size)
+    return rows
+
+
+# Query function. Runs the steps of GraphCypherQAChain one by one, each as a span of the trace.
+# Cypher comes from the template cache when a question of the same shape was answered before, and from
+# the LLM otherwise, prompted with the schema and examples relevant to the question (prompt_context.py). The answer is streamed to on_token; with plain=True the results are listed as they
+# are instead of being phrased by the LLM
+def query_graph(user_input, trace=None, on_token=None, plain=False):
+    trace = trace or Trace("query_graph")
+
+    with trace.span("setup"):
+        resources = get_resources()
+        resources.refresh_schema()
+        chain = resources.chain
+
+    templates = get_template_cache()
+    masked, slots = mask_entities(user_input, resources.vocabulary, resources.entity_pattern)
+    template = templates.get(masked, slots)
+    if template is not None:
+        with trace.span("cypher_template", entities=len(slots)):
+            generated_cypher, params = template
+    else:
+        with trace.span("cypher_generation") as span:
+            args = {"question": user_input, **cypher_prompt_args(
+                user_input, masked, slots, resources.graph.get_structured_schema, chain.graph_schema, get_example_store())}
+            span["prompt_tokens"] = estimate_tokens(chain.cypher_generation_chain.prompt.format(**args))
+            generated_cypher = chain.cypher_generation_chain.run(args)
+            span["output_tokens"] = estimate_tokens(generated_cypher)
+            generated_cypher = extract_cypher(generated_cypher)
+            params = {}
+
+    with trace.span("neo4j") as span:
+        rows, truncated = fetch_rows(resources.graph, generated_cypher, params) if generated_cypher else ([], False)
+        span.update(rows=len(rows), truncated=truncated)
+
+    # Only queries that ran and found something are worth reusing
+    if template is None and rows:
+        templates.put(masked, slots, generated_cypher)
+
+    context, summary = qa_context(user_input, rows, truncated)
+    if plain:
+        answer = plain_answer(context, summary)
+        if on_token:
+            on_token(answer)
+    else:
+        with trace.span("qa") as span:
+            qa_input = f"{context}\n{summary}" if summary else context
+            answer = stream_llm(qa_prompt.format(question=user_input, context=qa_input), on_token, span)
+
+    # Only the first page of the results is kept with the answer, the UI fetches the others when asked
+    return {
+        "query": user_input,
+        "result": answer,
+        "intermediate_steps": [{"query": render(generated_cypher, params)}, {"context": rows[:RESULT_PAGE_SIZE]}],
+        "more_results": truncated or len(rows) > RESULT_PAGE_SIZE,
+    }
+
+
+# The answer cache and expertise index lookups a question starts with, each as a span of trace. Returns the
+# question's entities, the cached response and the expertise (entity, rows), None when there is none
+def fast_path(user_input, trace):
+    with trace.span("answer_cache") as span:
+        entities = question_entities(user_input)
+        cached = get_answer_cache().get(user_input, entities)
+        span["hit"] = cached is not None
+    expertise = None
+    if cached is None:
+        with trace.span("expertise_index") as span:
+            expertise = expertise_lookup(user_input)
+            span["hit"] = expertise is not None
+    return {"entities": entities, "cached": cached, "expertise": expertise}
+
+
+# Answer one question from the chat: from the answer cache when it was asked before, from the expertise
+# index when it asks who knows a technology or what a person knows, otherwise classify it and either query
+# the graph or reply conversationally. The local router classifies the
+# question; the classifier LLM is only asked when the router isn't confident.
+# The answer is streamed to on_token as it is generated. Every stage is recorded as a span of trace, which
+# is exported once the question is answered; the response records the time to first token.
+# plain=True is the degraded mode used under load: graph results are listed without the QA LLM call, and
+# such answers aren't cached so the question gets a proper answer next time.
+# fast is what fast_path already found for the question, the scheduler looks before it queues a question
+def answer_question(user_input, trace=None, on_token=None, plain=False, fast=None):
+    trace = trace or Trace("question")
+    cache = get_answer_cache()
+    first_token = []
+
+    def emit(token):
+        if not first_token:
+            first_token.append(timer() - trace.start)
+        if on_token:
+            on_token(token)
+
+    try:
+        fast = fast or fast_path(user_input, trace)
+        entities, cached, expertise = fast["entities"], fast["cached"], fast["expertise"]
+        if cached is not None:
+            emit(cached["answer"])
+            return {**cached, "cached": True, "time_to_first_token": first_token[0]}
+
+        if expertise is not None:
+            classification, reason = "EXPERTISE", "expertise index"
+        else:
+            with trace.span("routing") as span:
+                classification, confidence, reason = get_router().route(user_input, get_resources().entity_pattern)
+                span.update(intent=classification, confidence=confidence, reason=reason)
+            if confidence < ROUTER_THRESHOLD:
+                with trace.span("classification") as span:
+                    classification = classifier_chain.run(user_input).strip().upper()
+                    span["intent"] = classification
+                    reason = "llm"
+        if classification == "EXPERTISE":
+            entity, rows = expertise
+            answer = expertise_answer(entity, rows)
+            emit(answer)
+            response = {"route": reason, "answer": answer, "cypher_query": "", "database_results": rows}
+        elif classification == "QUERY":
+            result = query_graph(user_input, trace, emit, plain)
+            intermediate_steps = result["intermediate_steps"]
+            response = {
+                "route": reason + (", plain" if plain else ""),
+                "answer": result["result"],
+                "cypher_query": intermediate_steps[0]["query"],
+                "database_results": intermediate_steps[1]["context"],
+                "more_results": result["more_results"],
+            }
+        else:
+            with trace.span("answer") as span:
+                answer = stream_llm(f"Respond conversationally to: {user_input}", emit, span)
+            response = {"route": reason, "answer": answer, "cypher_query": "", "database_results": ""}
+
+        if not plain:
+            cache.put(user_input, response, entities)
+        return {**response, "cached": False, "time_to_first_token": first_token[0] if first_token else None}
+    finally:
+        trace.attributes["time_to_first_token"] = first_token[0] if first_token else None
+        export_jsonl(trace.finish())
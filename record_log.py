@@ -0,0 +1,84 @@
+import os
+import json
+
+# Append-only log of the extraction results of an ingestion run, instead of an indented *_output.json per
+# input file and a list of every result in memory. Each record is one compact JSON line: the file it was
+# extracted from, that file's content hash and its entities and relationships. A record is appended as soon
+# as its file is extracted, and the write stage reads the records back one at a time.
+#
+# The offset index next to the log ({path}.idx) holds the byte offset up to which the records are committed,
+# i.e. written to the graph and the manifest. An interrupted run leaves its records after that offset, and
+# the next run takes them from there instead of extracting those files again. A run that finds nothing
+# uncommitted starts the log over, so it only holds the records of the current run.
+
+EXTRACTION_LOG_PATH = os.getenv("EXTRACTION_LOG_PATH", ".cache/extractions.jsonl")
+
+
+class RecordLog:
+    def __init__(self, path=EXTRACTION_LOG_PATH):
+        # A relative path is taken from where the log is opened, a later chdir doesn't move it
+        self.path = os.path.abspath(path)
+        self.index_path = f"{self.path}.idx"
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.committed = 0
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r") as f:
+                self.committed = json.load(f)["committed"]
+        self.repair()
+
+    # Cut off a record an interrupted append left half-written
+    def repair(self):
+        if not os.path.exists(self.path):
+            open(self.path, "wb").close()
+        with open(self.path, "rb+") as f:
+            size = f.seek(0, os.SEEK_END)
+            position = size
+            end = 0
+            while position > 0:
+                step = min(position, 1 << 16)
+                f.seek(position - step)
+                newline = f.read(step).rfind(b"\n")
+                if newline >= 0:
+                    end = position - step + newline + 1
+                    break
+                position -= step
+            if end != size:
+                f.truncate(end)
+        self.committed = min(self.committed, end)
+
+    def size(self):
+        return os.path.getsize(self.path)
+
+    # Returns the offset the record starts at
+    def append(self, record):
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        with open(self.path, "ab") as f:
+            offset = f.tell()
+            f.write(line.encode("utf-8"))
+        return offset
+
+    # Records from offset start up to offset end, read as they are asked for
+    def read(self, start=0, end=None):
+        with open(self.path, "rb") as f:
+            f.seek(start)
+            offset = start
+            for line in f:
+                if end is not None and offset >= end or not line.endswith(b"\n"):
+                    break
+                offset += len(line)
+                yield json.loads(line)
+
+    # Everything up to offset has made it into the graph
+    def commit(self, offset):
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"committed": offset}, f)
+        os.replace(tmp_path, self.index_path)
+        self.committed = offset
+
+    def reset(self):
+        open(self.path, "wb").close()
+        self.commit(0)
+
+    def stats(self):
+        return {"bytes": self.size(), "committed": self.committed}
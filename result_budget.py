@@ -0,0 +1,144 @@
+import os
+import re
+import json
+from collections import Counter
+
+import numpy as np
+
+from embeddings import embed, similarities
+
+# Guards between the generated Cypher and everything that uses its results. A question like "show me the
+# Slack messages" returns every message in the graph, which used to be read in full before the first ten
+# rows were kept. Now
+#   - a LIMIT is put on the query, so the database stops after RESULT_MAX_ROWS rows (one more, to know
+#     there were more), and a LIMIT the query has itself is kept when it is lower
+#   - rows are read from the driver as they arrive and reading stops once RESULT_MAX_ROWS rows or
+#     RESULT_MAX_BYTES bytes of them are in
+#   - the QA prompt gets at most QA_MAX_ROWS rows and QA_MAX_BYTES bytes. When there are more, the rows
+#     most similar to the question are picked and a summary of all of them (row count, distinct and most
+#     common values per column) is added
+#   - the UI pages through the full result with SKIP/LIMIT, one RESULT_PAGE_SIZE page at a time
+# Queries that can't be paged on the server (UNION, a RETURN inside a subquery) are still cut off by the
+# row and byte budgets while reading, and are paged by skipping rows on the client.
+
+RESULT_MAX_ROWS = int(os.getenv("RESULT_MAX_ROWS", "500"))
+RESULT_MAX_BYTES = int(os.getenv("RESULT_MAX_BYTES", "1000000"))
+RESULT_PAGE_SIZE = int(os.getenv("RESULT_PAGE_SIZE", "25"))
+RESULT_FETCH_SIZE = int(os.getenv("RESULT_FETCH_SIZE", "100"))
+QA_MAX_ROWS = int(os.getenv("QA_MAX_ROWS", "20"))
+QA_MAX_BYTES = int(os.getenv("QA_MAX_BYTES", "4000"))
+
+# SKIP and LIMIT at the end of the query, literal or parameter
+TAIL = re.compile(r"(?:\s+SKIP\s+(\d+|\$\w+))?(?:\s+LIMIT\s+(\d+|\$\w+))?\s*;?\s*$", re.I)
+RETURN = re.compile(r"\bRETURN\b", re.I)
+UNION = re.compile(r"\bUNION\b", re.I)
+# String literals and comments, to drop the comments without touching a '//' inside a string
+COMMENT = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|//[^\n]*|/\*.*?\*/", re.S)
+# Any SKIP or LIMIT of the final RETURN, to tell when TAIL couldn't read one ("LIMIT toInteger(5)")
+PAGING = re.compile(r"(?<![.$\w])(SKIP|OFFSET|LIMIT)\b", re.I)
+
+
+def strip_comments(cypher):
+    return COMMENT.sub(lambda match: match.group(0) if match.group(0)[0] in "'\"" else " ", cypher)
+
+
+def row_bytes(row):
+    return len(json.dumps(row, default=str))
+
+
+# The query with only the rows skip .. skip + limit of its result, within the SKIP and LIMIT it already
+# has. Returns the query unchanged when it can't be paged on the server and None when the page is empty.
+# The paged query is written without comments, a LIMIT appended after "// ..." would be commented out
+def paginate(cypher, skip, limit):
+    query = strip_comments(cypher).rstrip()
+    returns = list(RETURN.finditer(query))
+    if not returns or UNION.search(query) or "}" in query[returns[-1].end():]:
+        return cypher
+    tail = TAIL.search(query)
+    # A SKIP or LIMIT expression another LIMIT can't be appended to
+    if PAGING.search(query, returns[-1].end(), tail.start()):
+        return cypher
+    own_skip, own_limit = tail.groups()
+    # A parameter we can't see the value of
+    if own_skip and own_skip.startswith("$") or own_limit and own_limit.startswith("$"):
+        return cypher
+    if own_limit is not None:
+        limit = min(limit, int(own_limit) - skip)
+        if limit <= 0:
+            return None
+    skip += int(own_skip or 0)
+    return query[:tail.start()] + (f" SKIP {skip}" if skip else "") + f" LIMIT {limit}"
+
+
+# Rows of the query one at a time. Neo4j results are pulled from the server RESULT_FETCH_SIZE records at a
+# time, so a reader that stops early never holds the whole result
+def stream_records(graph, cypher, params=None):
+    driver = getattr(graph, "_driver", None)
+    if driver is None:
+        yield from graph.query(cypher, params or {})
+        return
+    from neo4j import Query
+    with driver.session(database=graph._database, fetch_size=RESULT_FETCH_SIZE) as session:
+        for record in session.run(Query(text=cypher, timeout=graph.timeout), params or {}):
+            yield record.data()
+
+
+# (rows, truncated) for the rows skip .. skip + max_rows of the query's result, read until max_rows rows or
+# max_bytes bytes are in. truncated is True when the result goes on after them
+def fetch_rows(graph, cypher, params=None, skip=0, max_rows=RESULT_MAX_ROWS, max_bytes=RESULT_MAX_BYTES):
+    paged = paginate(cypher, skip, max_rows + 1)
+    if paged is None:
+        return [], False
+    # Skipped on the client when the server couldn't page it
+    client_skip = skip if paged == cypher else 0
+    rows = []
+    size = 0
+    truncated = False
+    records = stream_records(graph, paged, params)
+    try:
+        for i, row in enumerate(records):
+            if i < client_skip:
+                continue
+            size += row_bytes(row)
+            if len(rows) >= max_rows or size > max_bytes and rows:
+                truncated = True
+                break
+            rows.append(row)
+    finally:
+        records.close()
+    return rows, truncated
+
+
+# Row count, distinct values and the most common values of every column, in a few lines
+def summarize(rows, truncated=False):
+    lines = [f"{len(rows)}{' or more' if truncated else ''} rows in total."]
+    for column in rows[0] if rows else []:
+        counts = Counter(str(row.get(column)) for row in rows)
+        common = [(value, count) for value, count in counts.most_common(5) if count > 1]
+        line = f"{column}: {len(counts)} distinct values"
+        if common:
+            line += ", most common " + ", ".join(f"{value[:60]} ({count})" for value, count in common)
+        lines.append(line)
+    return "\n".join(lines)
+
+
+# (rows, summary) to give the QA prompt: all rows when they fit in the budgets, otherwise the rows most
+# similar to the question that fit, with a summary of the whole result. summary is None when nothing was left out
+def qa_context(question, rows, truncated=False, max_rows=QA_MAX_ROWS, max_bytes=QA_MAX_BYTES):
+    if not truncated and len(rows) <= max_rows and sum(row_bytes(row) for row in rows) <= max_bytes:
+        return rows, None
+    matrix = np.array([embed(" ".join(str(value) for value in row.values())) for row in rows], dtype=np.float32)
+    scores = similarities(embed(question), matrix)
+    picked = []
+    size = 0
+    for i in sorted(range(len(rows)), key=lambda i: -scores[i]):
+        if len(picked) >= max_rows:
+            break
+        size += row_bytes(rows[i])
+        if size > max_bytes and picked:
+            break
+        picked.append(i)
+    # Keep the order the query returned them in
+    kept = [rows[i] for i in sorted(picked)]
+    summary = summarize(rows, truncated) + f"\nThe {len(kept)} rows most relevant to the question are listed."
+    return kept, summary
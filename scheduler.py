@@ -0,0 +1,207 @@
+import os
+import heapq
+import itertools
+import threading
+from functools import lru_cache
+from timeit import default_timer as timer
+
+from answer_cache import normalize
+from tracing import Trace
+from qa_pipeline import answer_question, fast_path
+
+# Process-wide scheduler for the questions of all Streamlit sessions. Every question that needs the LLM is
+# queued and answered by one of SCHEDULER_WORKERS threads, so the local Ollama server never gets more
+# concurrent requests than it can serve instead of every session calling it at once.
+#
+#   - coalescing: a question that is already queued or being answered (after normalization) is not asked
+#     again, the new asker follows the existing job and gets the same streamed answer
+#   - priority: lower runs first. A session that is already waiting for answers gets its next question
+#     queued behind the other sessions, so one busy user can't starve the rest
+#   - backpressure: with SCHEDULER_MAX_QUEUE questions waiting, new ones are refused with QueueFull right
+#     away instead of timing out after minutes
+#   - degradation: a job started while SCHEDULER_DEGRADE_AT or more questions are still waiting skips the
+#     QA LLM call and lists the graph results as they are, which roughly halves the LLM time per question
+# Questions the answer cache or the expertise index can answer skip the queue and are answered in the
+# caller's thread. Those lookups are done once, when the question is submitted: a job takes what they found
+# along, so a question that had a hit is answered from it and one that missed goes through the queue even
+# when the cache changes in the meantime.
+
+SCHEDULER_WORKERS = int(os.getenv("SCHEDULER_WORKERS", "2"))
+SCHEDULER_MAX_QUEUE = int(os.getenv("SCHEDULER_MAX_QUEUE", "32"))
+SCHEDULER_DEGRADE_AT = int(os.getenv("SCHEDULER_DEGRADE_AT", "8"))
+
+
+class QueueFull(Exception):
+    def __init__(self, waiting):
+        super().__init__(f"{waiting} questions are waiting")
+        self.waiting = waiting
+
+
+# One question being answered, followed by everyone who asked it. Tokens are kept so followers that join
+# late still get the whole answer
+class Job:
+    def __init__(self, question, key, session=None, priority=0):
+        self.question = question
+        self.key = key
+        self.session = session
+        self.priority = priority
+        self.trace = Trace("question", question=question)
+        self.condition = threading.Condition()
+        self.tokens = []
+        self.done = False
+        self.result = None
+        self.error = None
+        self.plain = False
+        self.followers = 1
+        self.queued_at = timer()
+        self.started_at = None
+        # what qa_pipeline.fast_path found for the question
+        self.fast = None
+
+    def append(self, token):
+        with self.condition:
+            self.tokens.append(token)
+            self.condition.notify_all()
+
+    def finish(self, result=None, error=None):
+        with self.condition:
+            self.result = result
+            self.error = error
+            self.done = True
+            self.condition.notify_all()
+
+    def queue_seconds(self):
+        return (self.started_at or timer()) - self.queued_at
+
+
+class QuestionScheduler:
+    def __init__(self, workers=SCHEDULER_WORKERS, max_queue=SCHEDULER_MAX_QUEUE, degrade_at=SCHEDULER_DEGRADE_AT):
+        self.max_queue = max_queue
+        self.degrade_at = degrade_at
+        self.lock = threading.Condition()
+        # heap of (priority, sequence, job)
+        self.queue = []
+        self.sequence = itertools.count()
+        # normalized question -> job, for every job that is queued or running
+        self.in_flight = {}
+        # session -> number of its jobs that are queued or running
+        self.sessions = {}
+        self.running = 0
+        self.completed = 0
+        self.coalesced = 0
+        self.rejected = 0
+        self.degraded = 0
+        self.cache_hits = 0
+        self.index_hits = 0
+        for i in range(workers):
+            threading.Thread(target=self.work, name=f"question-scheduler-{i}", daemon=True).start()
+
+    def submit(self, question, session=None, priority=0):
+        key = normalize(question)
+        with self.lock:
+            job = self.in_flight.get(key)
+            if job is not None:
+                job.followers += 1
+                self.coalesced += 1
+                return job
+
+        job = Job(question, key, session)
+        job.fast = fast_path(question, job.trace)
+        if job.fast["cached"] is not None or job.fast["expertise"] is not None:
+            with self.lock:
+                if job.fast["cached"] is not None:
+                    self.cache_hits += 1
+                else:
+                    self.index_hits += 1
+            self.run(job)
+            return job
+
+        with self.lock:
+            # Asked again while we were looking at the cache
+            queued = self.in_flight.get(key)
+            if queued is not None:
+                queued.followers += 1
+                self.coalesced += 1
+                return queued
+            if len(self.queue) >= self.max_queue:
+                self.rejected += 1
+                raise QueueFull(len(self.queue))
+            job.priority = priority + self.sessions.get(session, 0)
+            self.in_flight[key] = job
+            self.sessions[session] = self.sessions.get(session, 0) + 1
+            heapq.heappush(self.queue, (job.priority, next(self.sequence), job))
+            self.lock.notify()
+        return job
+
+    # 1 for the next job to run, 0 once it is running or done
+    def position(self, job):
+        with self.lock:
+            for i, (_, _, queued) in enumerate(sorted(self.queue)):
+                if queued is job:
+                    return i + 1
+        return 0
+
+    def work(self):
+        while True:
+            with self.lock:
+                while not self.queue:
+                    self.lock.wait()
+                _, _, job = heapq.heappop(self.queue)
+                self.running += 1
+                if len(self.queue) >= self.degrade_at:
+                    job.plain = True
+                    self.degraded += 1
+            try:
+                self.run(job)
+            finally:
+                with self.lock:
+                    self.running -= 1
+                    if self.in_flight.get(job.key) is job:
+                        del self.in_flight[job.key]
+                    self.sessions[job.session] -= 1
+                    if not self.sessions[job.session]:
+                        del self.sessions[job.session]
+
+    def run(self, job):
+        job.started_at = timer()
+        # The wait in the queue is part of the question's latency too
+        with job.trace.lock:
+            job.trace.spans.append({"name": "queue", "start": 0.0, "duration": round(job.started_at - job.trace.start, 6)})
+        try:
+            job.finish(result=answer_question(job.question, job.trace, on_token=job.append, plain=job.plain, fast=job.fast))
+        except Exception as e:
+            job.finish(error=e)
+        with self.lock:
+            self.completed += 1
+
+    # Follow a job as it goes: ("queued", position) every poll seconds while it waits, then ("token", text)
+    # for every token of the answer. Returns the response of answer_question, or raises its error
+    def follow(self, job, poll=0.25):
+        seen = 0
+        while True:
+            with job.condition:
+                if seen == len(job.tokens) and not job.done:
+                    job.condition.wait(poll)
+                tokens = job.tokens[seen:]
+                done = job.done
+            seen += len(tokens)
+            if not tokens and not done and job.started_at is None:
+                yield "queued", self.position(job)
+            for token in tokens:
+                yield "token", token
+            if done:
+                break
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+    def stats(self):
+        with self.lock:
+            return {"queued": len(self.queue), "running": self.running, "completed": self.completed,
+                    "coalesced": self.coalesced, "cache_hits": self.cache_hits, "index_hits": self.index_hits, "degraded": self.degraded,
+                    "rejected": self.rejected}
+
+
+@lru_cache(maxsize=None)
+def get_scheduler():
+    return QuestionScheduler()
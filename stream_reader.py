@@ -0,0 +1,77 @@
+import json
+
+# Incremental reader for large JSON message exports (the slack_messages files are one big JSON array).
+# Messages are decoded one at a time from a fixed-size read buffer and packed into chunks that fit a
+# token budget, so memory use depends on the chunk size rather than on the size of the export.
+
+READ_BLOCK = 1 << 16
+
+
+# Rough token count for budgeting prompts, about 4 characters per token for English text
+def estimate_tokens(text):
+    return len(text) // 4 + 1
+
+
+# Yield the elements of the top-level JSON array in path without loading the whole file
+def iter_json_array(path, block_size=READ_BLOCK):
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buffer = ""
+        pos = 0
+        eof = False
+        started = False
+        while True:
+            # Skip whitespace and the separators between elements
+            while pos < len(buffer) and (buffer[pos].isspace() or (started and buffer[pos] == ",")):
+                pos += 1
+            if pos == len(buffer):
+                if eof:
+                    raise ValueError(f"{path}: unexpected end of file inside JSON array")
+                buffer = f.read(block_size)
+                pos = 0
+                eof = not buffer
+                continue
+
+            if not started:
+                if buffer[pos] != "[":
+                    raise ValueError(f"{path}: expected a JSON array of messages")
+                started = True
+                pos += 1
+                continue
+            if buffer[pos] == "]":
+                return
+
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # The element continues past the buffer, read more and try again
+                if eof:
+                    raise
+                more = f.read(block_size)
+                eof = not more
+                buffer = buffer[pos:] + more
+                pos = 0
+                continue
+            yield item
+            pos = end
+            # Drop what has been decoded so the buffer doesn't grow with the file
+            if pos > block_size:
+                buffer = buffer[pos:]
+                pos = 0
+
+
+# Pack items into lists whose JSON rendering stays within token_budget. An item that is larger than the
+# budget on its own still gets a chunk of its own rather than being dropped.
+def pack_chunks(items, token_budget):
+    chunk = []
+    used = 0
+    for item in items:
+        tokens = estimate_tokens(json.dumps(item, indent=4))
+        if chunk and used + tokens > token_budget:
+            yield chunk
+            chunk = []
+            used = 0
+        chunk.append(item)
+        used += tokens
+    if chunk:
+        yield chunk
@@ -0,0 +1,119 @@
+import re
+
+from stream_reader import iter_json_array
+
+# Rule-based extraction for the sources that already have a fixed layout, so they don't need to go through
+# the LLM. The parsers return the same {"entities", "relationships"} objects as the extraction prompts and
+# follow the same id conventions, or None when a file doesn't match the expected layout so the caller can
+# fall back to the LLM.
+
+NON_ALNUM = re.compile(r"[^0-9A-Za-z]+")
+
+
+# "Machine Learning" -> "machineLearning", the id format the prompts ask for people and technologies
+def camel_case(name):
+    words = [word for word in NON_ALNUM.split(name) if word]
+    if not words:
+        return ""
+    return words[0].lower() + "".join(word[:1].upper() + word[1:].lower() for word in words[1:])
+
+
+# "AlphaCorp Customer Support Chatbot" -> "alphacorpcustomersupportchatbot", the id format for projects
+def project_id(name):
+    return NON_ALNUM.sub("", name).lower()
+
+
+def split_list(value):
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+# People profiles are blocks separated by blank lines:
+#   Full Name: Sarah Johnson            (or just the name on the first line)
+#   Skills: Machine Learning, Azure
+#   Projects: Project A, Project B      (or "Projects:" followed by "- Project" lines)
+def parse_people_profiles(text):
+    entities = {}
+    relationships = []
+
+    for block in re.split(r"\n\s*\n", text.strip()):
+        lines = [line.strip() for line in block.splitlines() if line.strip()]
+        if not lines:
+            continue
+        name = lines[0]
+        if name.lower().startswith("full name:"):
+            name = name.split(":", 1)[1].strip()
+        skills = []
+        projects = []
+        section = None
+        for line in lines[1:]:
+            key, _, value = line.partition(":")
+            if key.strip().lower() == "skills":
+                section = "skills"
+                skills.extend(split_list(value))
+            elif key.strip().lower() == "projects":
+                section = "projects"
+                projects.extend(split_list(value))
+            elif line.startswith("-") and section:
+                (skills if section == "skills" else projects).append(line.lstrip("- ").strip())
+            else:
+                # Anything else means this isn't the layout we know
+                return None
+        if section is None or not camel_case(name):
+            return None
+
+        person = camel_case(name)
+        entities[("Person", person)] = {"label": "Person", "id": person, "name": name}
+        for skill in skills:
+            tech = camel_case(skill)
+            if not tech:
+                continue
+            entities.setdefault(("Technology", tech), {"label": "Technology", "id": tech, "name": skill})
+            relationships.append(f"{person}|HAS_SKILLS|{tech}")
+        for project in projects:
+            prj = project_id(project)
+            if not prj:
+                continue
+            entities.setdefault(("Project", prj), {"label": "Project", "id": prj, "name": project})
+            relationships.append(f"{prj}|HAS_PEOPLE|{person}")
+
+    if not entities:
+        return None
+    return {"entities": list(entities.values()), "relationships": list(dict.fromkeys(relationships))}
+
+
+# Slack exports are a JSON array of {"id", "type", "user", "text"} messages; they are streamed so large
+# exports don't have to fit in memory
+def parse_slack_messages(messages):
+    entities = {}
+    relationships = []
+    for msg in messages:
+        if not isinstance(msg, dict) or not all(isinstance(msg.get(key), str) for key in ("id", "user", "text")):
+            return None
+        person = camel_case(msg["user"])
+        if not person:
+            return None
+        entities.setdefault(("Person", person), {"label": "Person", "id": person, "name": msg["user"]})
+        entities[("SlackMessage", msg["id"])] = {"label": "SlackMessage", "id": msg["id"], "text": msg["text"]}
+        relationships.append(f"{person}|SENT|{msg['id']}")
+
+    if not entities:
+        return None
+    return {"entities": list(entities.values()), "relationships": list(dict.fromkeys(relationships))}
+
+
+def parse_people_profiles_file(path):
+    with open(path, "r") as f:
+        return parse_people_profiles(f.read())
+
+
+def parse_slack_messages_file(path):
+    if not path.endswith(".json"):
+        return None
+    return parse_slack_messages(iter_json_array(path))
+
+
+# Parser for every data/ folder whose layout is fixed; other folders always go through the LLM
+STRUCTURED_PARSERS = {
+    "people_profiles": parse_people_profiles_file,
+    "slack_messages": parse_slack_messages_file,
+}
@@ -0,0 +1,140 @@
+import os
+import re
+import json
+import hashlib
+import threading
+import contextlib
+from time import sleep
+from types import SimpleNamespace
+
+from langchain_core.language_models.llms import LLM
+from langchain_core.outputs import GenerationChunk
+
+from stream_reader import estimate_tokens
+
+# Offline stand-ins for the models, used when LLM_STUB=1 is set. stub_chat replaces ollama.chat for
+# extraction and StubLLM replaces the OllamaLLM of the question pipeline. Both return deterministic, canned
+# output after a simulated delay so throughput and latency can be measured without a model server.
+
+# Simulated seconds per call, before the first token
+STUB_LATENCY = float(os.getenv("STUB_LLM_LATENCY", "0.5"))
+# Simulated seconds per streamed token of StubLLM
+STUB_TOKEN_LATENCY = float(os.getenv("STUB_LLM_TOKEN_LATENCY", "0"))
+# Simulated seconds per prompt token of StubLLM, the prefill of a real model grows with the prompt
+STUB_PREFILL_LATENCY = float(os.getenv("STUB_LLM_PREFILL_LATENCY", "0"))
+# Requests the simulated server works on at once, like OLLAMA_NUM_PARALLEL; others wait. 0 for no limit
+STUB_PARALLEL = int(os.getenv("STUB_LLM_PARALLEL", "0"))
+server = threading.BoundedSemaphore(STUB_PARALLEL) if STUB_PARALLEL else contextlib.nullcontext()
+
+
+def canned_extraction(prompt):
+    # Only the document part of the prompt decides the ids, so the same file always gives the same answer
+    text = prompt.split("Case Sheet:")[-1]
+    digest = hashlib.sha1(text.encode("utf-8")).hexdigest()[:8]
+
+    if "label:'SlackMessage'" in prompt:
+        return {
+            "entities": [
+                {"label": "Person", "id": f"person{digest}", "name": f"Person {digest}"},
+                {"label": "SlackMessage", "id": f"msg{digest}", "text": text.strip()[:200]},
+            ],
+            "relationships": [f"person{digest}|SENT|msg{digest}"],
+        }
+    if "label:'Client'" in prompt:
+        return {
+            "entities": [
+                {"label": "Project", "id": f"project{digest}", "name": f"Project {digest}", "summary": text.strip()[:200]},
+                {"label": "Technology", "id": "azure", "name": "Azure"},
+                {"label": "Client", "id": f"client{digest}", "name": f"Client {digest}", "industry": "Technology"},
+            ],
+            "relationships": [f"project{digest}|USES_TECH|azure", f"project{digest}|HAS_CLIENT|client{digest}"],
+        }
+    return {
+        "entities": [
+            {"label": "Person", "id": f"person{digest}", "name": f"Person {digest}"},
+            {"label": "Project", "id": f"project{digest}", "name": f"Project {digest}"},
+            {"label": "Technology", "id": "python", "name": "Python"},
+        ],
+        "relationships": [f"person{digest}|HAS_SKILLS|python", f"project{digest}|HAS_PEOPLE|person{digest}"],
+    }
+
+
+# Same call shape as ollama.chat; only reply.message.content and the token counts are filled in
+def stub_chat(model, messages, format=None, **kwargs):
+    with server:
+        sleep(STUB_LATENCY)
+    prompt = messages[-1]["content"]
+    content = json.dumps(canned_extraction(prompt))
+    return SimpleNamespace(model=model, message=SimpleNamespace(role="assistant", content=content),
+                           prompt_eval_count=len(prompt) // 4, eval_count=len(content) // 4)
+
+
+# Question shapes the canned Cypher understands, each with the query it answers with. {0} is the entity
+# from the question, lowercased. Every query is in the subset memory_graph.py can run
+CANNED_CYPHER = [
+    (re.compile(r"(?:skills|technologies) (?:does|do|did) (.+?) (?:have|know|use)"),
+     "CALL db.index.fulltext.queryNodes('entity_names', '{0}') YIELD node AS p "
+     "WHERE p:Person AND toLower(p.name) CONTAINS '{0}' MATCH (p)-[:HAS_SKILLS]->(t:Technology) RETURN p.name, t.name"),
+    (re.compile(r"who (?:knows|has experience with|has experience in|is skilled in|uses) (.+)"),
+     "CALL db.index.fulltext.queryNodes('entity_names', '{0}') YIELD node AS t "
+     "WHERE t:Technology AND toLower(t.name) CONTAINS '{0}' MATCH (p:Person)-[:HAS_SKILLS]->(t) RETURN p.name, t.name"),
+    (re.compile(r"who (?:worked|works|is working|was) on (.+)"),
+     "CALL db.index.fulltext.queryNodes('project_summaries', '{0}') YIELD node AS pr "
+     "WHERE toLower(pr.name) CONTAINS '{0}' OR toLower(pr.summary) CONTAINS '{0}' "
+     "MATCH (pr)-[:HAS_PEOPLE]->(p:Person) RETURN pr.name, p.name"),
+    (re.compile(r"(?:which|what) (?:technologies|tech) does (.+?) use"),
+     "CALL db.index.fulltext.queryNodes('project_summaries', '{0}') YIELD node AS pr "
+     "WHERE toLower(pr.name) CONTAINS '{0}' OR toLower(pr.summary) CONTAINS '{0}' "
+     "MATCH (pr)-[:USES_TECH]->(t:Technology) RETURN pr.name, t.name"),
+    (re.compile(r"messages (?:about|on|mentioning) (.+)"),
+     "CALL db.index.fulltext.queryNodes('slack_text', '{0}') YIELD node AS m "
+     "WHERE toLower(m.text) CONTAINS '{0}' RETURN m.text LIMIT 10"),
+]
+DEFAULT_CYPHER = "MATCH (pr:Project) RETURN pr.name LIMIT 10"
+
+
+def canned_cypher(question):
+    question = question.strip().lower().rstrip("?!. ")
+    for pattern, cypher in CANNED_CYPHER:
+        match = pattern.search(question)
+        if match:
+            return cypher.format(match.group(1).strip().replace("'", "\\'"))
+    return DEFAULT_CYPHER
+
+
+# Reply to one of the prompts of qa_pipeline.py, recognised by their wording
+def canned_reply(prompt):
+    if 'respond with "QUERY"' in prompt:
+        return "QUERY"
+    if "Cypher translator" in prompt:
+        return canned_cypher(prompt.rsplit("Question:", 1)[-1])
+    if "human understandable answers" in prompt:
+        context = prompt.split("this is a response:", 1)[-1].split("your job is", 1)[0].strip()
+        return f"Here is what the knowledge graph says: {context[:300]}"
+    return "Hello! Ask me who knows a technology, who worked on a project or what someone's skills are."
+
+
+# Same interface as OllamaLLM for invoke, run and stream
+class StubLLM(LLM):
+    latency: float = STUB_LATENCY
+    token_latency: float = STUB_TOKEN_LATENCY
+    prefill_latency: float = STUB_PREFILL_LATENCY
+
+    @property
+    def _llm_type(self):
+        return "stub"
+
+    def _call(self, prompt, stop=None, run_manager=None, **kwargs):
+        with server:
+            sleep(self.latency + self.prefill_latency * estimate_tokens(prompt))
+            return canned_reply(prompt)
+
+    def _stream(self, prompt, stop=None, run_manager=None, **kwargs):
+        with server:
+            sleep(self.latency + self.prefill_latency * estimate_tokens(prompt))
+            for token in re.findall(r"\S+\s*", canned_reply(prompt)):
+                sleep(self.token_latency)
+                chunk = GenerationChunk(text=token)
+                if run_manager:
+                    run_manager.on_llm_new_token(token, chunk=chunk)
+                yield chunk
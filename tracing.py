@@ -0,0 +1,111 @@
+import os
+import json
+import uuid
+import threading
+from time import time
+from contextlib import contextmanager
+from timeit import default_timer as timer
+
+# Per-stage latency spans. A Trace covers one question in the app or one ingestion run, and holds a span
+# for every stage (routing, Cypher generation, Neo4j, QA, extraction of a file, a write batch, ...) with
+# its duration and attributes such as token and row counts. Finished traces are appended to TRACE_PATH as
+# JSON lines and added to a process-wide summary that can be rendered in the OpenMetrics text format.
+
+TRACE_PATH = os.getenv("TRACE_PATH", ".cache/traces.jsonl")
+
+
+class Trace:
+    def __init__(self, name, **attributes):
+        self.id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.attributes = attributes
+        self.started_at = time()
+        self.start = timer()
+        self.end = None
+        self.spans = []
+        # Extraction workers add spans from several threads
+        self.lock = threading.Lock()
+
+    # Time the block as a span. The span dict is yielded so the block can add attributes to it
+    @contextmanager
+    def span(self, name, **attributes):
+        span = {"name": name, **attributes}
+        start = timer()
+        try:
+            yield span
+        except Exception as e:
+            span["error"] = str(e)
+            raise
+        finally:
+            span["start"] = round(start - self.start, 6)
+            span["duration"] = round(timer() - start, 6)
+            with self.lock:
+                self.spans.append(span)
+
+    # Total seconds per span name, in the order the stages first started
+    def durations(self):
+        totals = {}
+        with self.lock:
+            for span in sorted(self.spans, key=lambda span: span["start"]):
+                totals[span["name"]] = totals.get(span["name"], 0.0) + span["duration"]
+        return totals
+
+    def finish(self):
+        if self.end is None:
+            self.end = timer()
+            metrics.add(self)
+        return self
+
+    def to_dict(self):
+        with self.lock:
+            spans = sorted(self.spans, key=lambda span: span["start"])
+        return {
+            "trace": self.id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration": round((self.end or timer()) - self.start, 6),
+            "attributes": self.attributes,
+            "spans": spans,
+        }
+
+
+# Append a finished trace to the JSON lines file; an empty TRACE_PATH turns the export off
+def export_jsonl(trace, path=TRACE_PATH):
+    if not path:
+        return
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    line = json.dumps(trace.to_dict(), default=str)
+    with open(path, "a") as f:
+        f.write(line + "\n")
+
+
+# Count and total seconds of every (trace, span) name seen by this process
+class StageMetrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stages = {}
+
+    def add(self, trace):
+        with self.lock:
+            for name, seconds in trace.durations().items():
+                count, total = self.stages.get((trace.name, name), (0, 0.0))
+                self.stages[(trace.name, name)] = (count + 1, total + seconds)
+            count, total = self.stages.get((trace.name, "total"), (0, 0.0))
+            self.stages[(trace.name, "total")] = (count + 1, total + (trace.end - trace.start))
+
+    def to_openmetrics(self):
+        lines = [
+            "# TYPE wkw_stage_seconds summary",
+            "# HELP wkw_stage_seconds Time spent per pipeline stage.",
+        ]
+        with self.lock:
+            for (trace, stage), (count, total) in sorted(self.stages.items()):
+                labels = f'trace="{trace}",stage="{stage}"'
+                lines.append(f"wkw_stage_seconds_count{{{labels}}} {count}")
+                lines.append(f"wkw_stage_seconds_sum{{{labels}}} {total:.6f}")
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+metrics = StageMetrics()